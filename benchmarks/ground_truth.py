@@ -0,0 +1,175 @@
+import json
+import math
+import os
+from collections import Counter
+from typing import Dict, Iterator, List
+import numpy as np
+from synthetic_corpus import shard_file
+from rag_index import BM25_K1, BM25_B
+from rag_utils import EXAM_KEYWORDS, WORD_RE
+
+# RAGSystem's load order, which is what chunk positions refer to
+SHARD_ORDER = [str(p) for p in range(1, 10)] + ["exam_info"]
+# the scorers ground truth can be taken against (see load_truth)
+TRUTH_SCORERS = ("bm25", "overlap")
+
+def iter_corpus(corpus_dir: str) -> Iterator[Dict]:
+    """every chunk of a synthetic corpus in load order, one shard in memory at a time"""
+    for name in SHARD_ORDER:
+        path = shard_file(corpus_dir, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            chunks = json.load(f)
+        yield from chunks
+        del chunks
+
+def boost_masks(query: str, period_bits: np.ndarray, is_exam: np.ndarray) -> List[np.ndarray]:
+    """the 1.5x period and exam info boosts that apply to a query, as chunk masks"""
+    query_lower = query.lower()
+    masks = []
+    bits = sum(1 << i for i in range(1, 10) if f"period {i}" in query_lower)
+    if bits:
+        masks.append((period_bits & bits) != 0)
+    if any(keyword in query_lower for keyword in EXAM_KEYWORDS):
+        masks.append(is_exam)
+    return masks
+
+class ExhaustiveScorer:
+    """brute-force bm25 ground truth: every chunk is scored for every query
+
+    no inverted index is involved: one pass over the corpus counts, per chunk,
+    the query-set terms and the chunk length, then each query is scored against
+    all chunks and fully sorted (ties go to the lower chunk position, which is
+    RAGSystem's load order)
+    """
+    def __init__(self, corpus_dir: str, queries: List[str]):
+        self.query_terms = [set(WORD_RE.findall(q.lower())) for q in queries]
+        vocabulary = set().union(*self.query_terms) if self.query_terms else set()
+
+        lengths, period_titles, is_exam = [], [], []
+        tf_rows = {term: ([], []) for term in vocabulary}  # term -> (chunk positions, term freqs)
+        position = 0
+        for chunk in iter_corpus(corpus_dir):
+            words = WORD_RE.findall(chunk["text"].lower())
+            lengths.append(len(words))
+            for term, tf in Counter(w for w in words if w in vocabulary).items():
+                tf_rows[term][0].append(position)
+                tf_rows[term][1].append(tf)
+            metadata = chunk.get("metadata", {})
+            period_titles.append(metadata.get("period_title", "").lower())
+            is_exam.append(metadata.get("section") == "Exam Information")
+            position += 1
+
+        self.num_docs = position
+        self.lengths = np.array(lengths, dtype=np.float64)
+        avg_length = float(self.lengths.mean()) if position else 1.0
+        self.norms = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths / (avg_length or 1.0))
+        self.period_bits = np.array([sum(1 << i for i in range(1, 10) if f"period {i}" in t) for t in period_titles], dtype=np.int64)
+        self.is_exam = np.array(is_exam, dtype=bool)
+        self.tf_rows = {term: (np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float64)) for term, (docs, tfs) in tf_rows.items()}
+
+    def scores(self, query: str, terms: set) -> np.ndarray:
+        """bm25 score of every chunk for the query, boosts applied"""
+        scores = np.zeros(self.num_docs, dtype=np.float64)
+        for term in terms:
+            docs, tfs = self.tf_rows[term]
+            if not len(docs):
+                continue
+            idf = math.log(1 + (self.num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (BM25_K1 + 1) / (tfs + self.norms[docs])
+        for mask in boost_masks(query, self.period_bits, self.is_exam):
+            scores = np.where(mask, scores * 1.5, scores)
+        return scores
+
+    def top_k(self, query_index: int, query: str, k: int) -> List[int]:
+        scores = self.scores(query, self.query_terms[query_index])
+        order = np.lexsort((np.arange(self.num_docs), -scores))[:k]
+        return [int(i) for i in order if scores[i] > 0]
+
+class OverlapScorer:
+    """the keyword-overlap scorer get_relevant_chunks used before bm25, run exhaustively
+
+    a chunk scores one point per query word among its words plus one per query
+    word found anywhere in its lowercased text (so "tax" also hits "taxation"),
+    with the same 1.5x boosts; ties keep load order, like its stable sort did.
+    a query word is all word characters, so it can only occur inside a single
+    word of the text: substring hits are worked out once per distinct chunk
+    word instead of scanning every text for every query word
+    """
+    def __init__(self, corpus_dir: str, queries: List[str]):
+        self.query_terms = [set(WORD_RE.findall(q.lower())) for q in queries]
+        vocabulary = set().union(*self.query_terms) if self.query_terms else set()
+        longest = max(map(len, vocabulary), default=0)
+        contained = {}  # chunk word -> query-set terms that are substrings of it
+
+        word_rows = {term: [] for term in vocabulary}       # chunks with the term as a word
+        substring_rows = {term: [] for term in vocabulary}  # chunks with the term anywhere in the text
+        period_titles, is_exam = [], []
+        position = 0
+        for chunk in iter_corpus(corpus_dir):
+            words = set(WORD_RE.findall(chunk["text"].lower()))
+            hits = set()
+            for word in words:
+                if word not in contained:
+                    contained[word] = {word[i:j] for i in range(len(word))
+                                       for j in range(i + 1, min(len(word), i + longest) + 1)} & vocabulary
+                hits |= contained[word]
+            for term in hits:
+                substring_rows[term].append(position)
+            for term in words & vocabulary:
+                word_rows[term].append(position)
+            metadata = chunk.get("metadata", {})
+            period_titles.append(metadata.get("period_title", "").lower())
+            is_exam.append(metadata.get("section") == "Exam Information")
+            position += 1
+
+        self.num_docs = position
+        self.period_bits = np.array([sum(1 << i for i in range(1, 10) if f"period {i}" in t) for t in period_titles], dtype=np.int64)
+        self.is_exam = np.array(is_exam, dtype=bool)
+        self.word_rows = {term: np.array(rows, dtype=np.int64) for term, rows in word_rows.items()}
+        self.substring_rows = {term: np.array(rows, dtype=np.int64) for term, rows in substring_rows.items()}
+
+    def scores(self, query: str, terms: set) -> np.ndarray:
+        """keyword-overlap score of every chunk for the query, boosts applied"""
+        scores = np.zeros(self.num_docs, dtype=np.float64)
+        for term in terms:
+            scores[self.word_rows[term]] += 1
+            scores[self.substring_rows[term]] += 1
+        for mask in boost_masks(query, self.period_bits, self.is_exam):
+            scores = np.where(mask, scores * 1.5, scores)
+        return scores
+
+    def top_k(self, query_index: int, query: str, k: int) -> List[int]:
+        scores = self.scores(query, self.query_terms[query_index])
+        order = np.lexsort((np.arange(self.num_docs), -scores))[:k]
+        return [int(i) for i in order if scores[i] > 0]
+
+def truth_file(corpus_dir: str, queries: List[str], k: int, scorer: str = "bm25") -> str:
+    prefix = "truth" if scorer == "bm25" else f"truth_{scorer}"
+    return os.path.join(corpus_dir, f"{prefix}_{len(queries)}_{k}.json")
+
+def load_truth(corpus_dir: str, queries: List[str], k: int, scorer: str = "bm25") -> List[List[int]]:
+    """top k chunk positions per query from an exhaustive scorer, cached next to the corpus
+
+    scorer is "bm25" (ExhaustiveScorer) or "overlap" (OverlapScorer, the pre-bm25 ranking)
+    """
+    if scorer not in TRUTH_SCORERS:
+        raise ValueError(f"scorer must be one of {TRUTH_SCORERS}")
+    path = truth_file(corpus_dir, queries, k, scorer)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached["queries"] == queries:
+            return cached["top_k"]
+
+    exhaustive = ExhaustiveScorer(corpus_dir, queries) if scorer == "bm25" else OverlapScorer(corpus_dir, queries)
+    truth = [exhaustive.top_k(i, q, k) for i, q in enumerate(queries)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"queries": queries, "top_k": truth}, f)
+    return truth
+
+def recall_at_k(results: List[List[int]], truth: List[List[int]]) -> Dict[str, float]:
+    """mean share of each query's true top k that was retrieved (queries with no true hits are skipped)"""
+    recalls = [len(set(got) & set(want)) / len(want) for got, want in zip(results, truth) if want]
+    return {"recall": float(np.mean(recalls)) if recalls else None, "queries_scored": len(recalls)}
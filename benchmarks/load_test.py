@@ -0,0 +1,303 @@
+"""end-to-end load test of the tutor loop against the mock groq server
+
+each simulated student is a real `python main/loop.py` process (own working
+dir, so own memory/cache files) driven through stdin: it waits for each input
+prompt, types the next scripted line and times how long the loop takes to ask
+for input again. api calls are counted from every student's llm metrics log
+
+    python benchmarks/load_test.py --students 8 --rounds 2 --latency 0.4 --rate-limit 0.05
+    python benchmarks/load_test.py --students 4 --script my_sessions.json --env GROQ_STREAM=0
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from mock_groq import MockGroqServer, config_args, config_from_args
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+LOOP_PY = os.path.join(os.path.dirname(BENCH_DIR), "main", "loop.py")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# every input() prompt in loop.py ends with one of these
+PROMPTS = [
+    "Your question: ",
+    "Do you have any follow-up questions? (yes/no): ",
+    "Your follow-up question: ",
+    "(or 'exit'/'problems'): ",
+    "(or press Enter for a general question): ",
+    "'hint' for a hint): ",
+]
+STEP_TIMEOUT = 180.0
+
+CHAT_QUESTIONS = [
+    "What caused the French and Indian War?",
+    "Why did colonists object to the Stamp Act?",
+    "How did the Missouri Compromise try to settle the slavery question?",
+    "What were the main goals of Reconstruction?",
+    "How did the Progressive Era change the role of government?",
+    "What was the policy of containment in Period 8?",
+]
+FOLLOW_UPS = [
+    "How did that lead to the American Revolution?",
+    "Can you give an example the AP exam might use?",
+    "What were the long-term effects?",
+]
+TOPICS = ["", "Political developments", "Economic changes", "Key events", "Important figures"]
+
+def default_script(rng: random.Random) -> List[Dict]:
+    """one chat conversation with follow-ups, then one practice question with a hint
+
+    menu steps (yes/no, picking a period, ...) are timed too but are not turns
+    """
+    return [
+        {"kind": "chat_question", "input": rng.choice(CHAT_QUESTIONS)},
+        {"kind": "follow_up_prompt", "input": "yes", "turn": False},
+        {"kind": "chat_follow_up", "input": rng.choice(FOLLOW_UPS)},
+        {"kind": "follow_up_prompt", "input": "yes", "turn": False},
+        {"kind": "chat_follow_up", "input": rng.choice(FOLLOW_UPS)},
+        {"kind": "end_conversation", "input": "no", "turn": False},
+        {"kind": "enter_practice", "input": "practice", "turn": False},
+        {"kind": "pick_period", "input": str(rng.randint(1, 9)), "turn": False},
+        {"kind": "practice_question", "input": rng.choice(TOPICS)},
+        {"kind": "hint", "input": "hint"},
+        {"kind": "answer", "input": rng.choice("ABCD")},
+        {"kind": "leave_practice", "input": "exit", "turn": False},
+    ]
+
+def load_script(path: str) -> List[Dict]:
+    """a session script: json list of {"kind", "input", "turn" (default true)} steps, replayed once per round"""
+    with open(path, 'r', encoding='utf-8') as f:
+        steps = json.load(f)
+    for step in steps:
+        if "kind" not in step or "input" not in step:
+            raise ValueError(f"script steps need a kind and an input: {step}")
+    return steps
+
+class Student:
+    """one loop.py process and the timings of every step it was driven through"""
+    def __init__(self, number: int, work_dir: str, env: Dict[str, str], step_timeout: float = STEP_TIMEOUT):
+        self.number = number
+        self.work_dir = work_dir
+        self.metrics_file = os.path.join(work_dir, "llm_metrics.jsonl")
+        self.env = dict(env, LLM_METRICS_FILE=self.metrics_file)
+        self.step_timeout = step_timeout
+        self.output = ""
+        self.cond = threading.Condition()
+        self.proc = None
+        self.steps = []  # {"kind", "turn", "start", "end", "seconds", "ok"}
+
+    def start(self):
+        self.proc = subprocess.Popen([sys.executable, "-u", LOOP_PY], cwd=self.work_dir, env=self.env,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        threading.Thread(target=self.read_output, daemon=True).start()
+
+    def read_output(self):
+        while True:
+            data = os.read(self.proc.stdout.fileno(), 65536)
+            with self.cond:
+                if not data:
+                    self.output += "\0"  # eof marker
+                    self.cond.notify_all()
+                    return
+                self.output += data.decode('utf-8', errors='replace')
+                self.cond.notify_all()
+
+    def wait_for_prompt(self, since: int) -> bool:
+        """block until loop.py asks for input (or exits) after output position since"""
+        deadline = time.monotonic() + self.step_timeout
+        with self.cond:
+            while True:
+                # background threads may print after the prompt, so it need not be the last thing out
+                tail = self.output[since:]
+                if any(p in tail for p in PROMPTS):
+                    return True
+                if tail.endswith("\0"):
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+
+    def step(self, kind: str, text: Optional[str], turn: bool = True) -> bool:
+        """send one line (None = nothing, just wait) and time it until the next prompt"""
+        with self.cond:
+            since = len(self.output)
+        start = time.time()
+        if text is not None:
+            self.proc.stdin.write((text + "\n").encode('utf-8'))
+            self.proc.stdin.flush()
+        ok = self.wait_for_prompt(since)
+        end = time.time()
+        self.steps.append({"kind": kind, "turn": turn, "start": start, "end": end, "seconds": end - start, "ok": ok})
+        return ok
+
+    def run(self, script: List[Dict], rounds: int):
+        self.start()
+        try:
+            if not self.step("startup", None, turn=False):
+                return
+            for _ in range(rounds):
+                for step in script:
+                    if not self.step(step["kind"], step["input"], step.get("turn", True)):
+                        return
+            # exit flushes the memory worker, time it until the process is gone
+            start = time.time()
+            self.proc.stdin.write(b"exit\n")
+            self.proc.stdin.flush()
+            self.proc.wait(timeout=self.step_timeout)
+            end = time.time()
+            self.steps.append({"kind": "exit", "turn": False, "start": start, "end": end, "seconds": end - start, "ok": True})
+        except (OSError, subprocess.TimeoutExpired) as e:
+            now = time.time()
+            self.steps.append({"kind": "error", "turn": False, "start": now, "end": now, "seconds": 0.0, "ok": False, "error": str(e)})
+        finally:
+            if self.proc.poll() is None:
+                self.proc.kill()
+                self.proc.wait()
+
+    def llm_calls(self) -> List[Dict]:
+        if not os.path.exists(self.metrics_file):
+            return []
+        with open(self.metrics_file, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+def latency_stats(seconds: List[float]) -> Dict:
+    values = np.array(seconds) * 1000
+    return {
+        "count": len(values),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+        "max_ms": float(values.max()),
+    }
+
+def summarize(students: List[Student], wall_seconds: float, mock_stats: Dict) -> Dict:
+    """per step kind latency and api calls; calls made while a step was in flight count towards it"""
+    by_kind = {}
+    turn_seconds = []
+    failed = 0
+    total_api_calls = 0
+    for student in students:
+        # only real requests (not cache hits, not calls the rate limiter shed)
+        calls = [c for c in student.llm_calls() if not c["cached"] and not c["shed"]]
+        total_api_calls += len(calls)
+        for step in student.steps:
+            if not step["ok"]:
+                failed += 1
+                continue
+            in_step = [c for c in calls if step["start"] <= c["time"] <= step["end"]]
+            entry = by_kind.setdefault(step["kind"], {"seconds": [], "api_calls": [], "purposes": {}})
+            entry["seconds"].append(step["seconds"])
+            if step["turn"]:
+                turn_seconds.append(step["seconds"])
+            entry["api_calls"].append(len(in_step))
+            for call in in_step:
+                entry["purposes"][call["purpose"]] = entry["purposes"].get(call["purpose"], 0) + 1
+
+    kinds = {}
+    for kind, entry in by_kind.items():
+        kinds[kind] = dict(latency_stats(entry["seconds"]),
+                           api_calls_per_step=float(np.mean(entry["api_calls"])),
+                           api_calls_by_purpose=entry["purposes"])
+    turns = len(turn_seconds)
+    return {
+        "students": len(students),
+        "wall_seconds": wall_seconds,
+        "failed_steps": failed,
+        "turns": turns,
+        "api_calls": total_api_calls,
+        "api_calls_per_turn": total_api_calls / turns if turns else None,
+        "turn_latency": latency_stats(turn_seconds) if turns else None,
+        "mock": mock_stats,
+        "steps": kinds,
+    }
+
+def print_summary(summary: Dict):
+    print(f"\n{summary['students']} students, {summary['turns']} turns in {summary['wall_seconds']:.1f}s, "
+          f"{summary['failed_steps']} failed steps")
+    print(f"API calls: {summary['api_calls']} ({summary['api_calls_per_turn'] or 0:.2f} per turn), "
+          f"mock saw {summary['mock']['requests']} requests, {summary['mock']['rate_limited']} answered 429")
+    if summary["turn_latency"]:
+        latency = summary["turn_latency"]
+        print(f"Turn latency: p50 {latency['p50_ms']:.0f}ms, p95 {latency['p95_ms']:.0f}ms, p99 {latency['p99_ms']:.0f}ms")
+    print(f"\n{'step':<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls/step':>12}")
+    for kind, stats in summary["steps"].items():
+        print(f"{kind:<20}{stats['count']:>7}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}"
+              f"{stats['p99_ms']:>10.0f}{stats['api_calls_per_step']:>12.2f}")
+
+def run_load_test(students: int, rounds: int, script: Optional[List[Dict]], mock: MockGroqServer,
+                  app_env: Dict[str, str], work_dir: str, seed: int = 0, step_timeout: float = STEP_TIMEOUT) -> Dict:
+    env = dict(os.environ)
+    env.update({
+        "GROQ_API_URL": mock.url,
+        "GROQ_API_KEY": "mock-key",
+        "LLM_LOG_VERBOSITY": "0",  # calls still go to the metrics log
+    })
+    env.update(app_env)
+
+    runners = []
+    for number in range(students):
+        student_dir = os.path.join(work_dir, f"student_{number}")
+        os.makedirs(student_dir, exist_ok=True)
+        student_script = script or default_script(random.Random(seed * 1000 + number))
+        runners.append((Student(number, student_dir, env, step_timeout), student_script))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=student.run, args=(student_script, rounds), daemon=True)
+               for student, student_script in runners]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize([student for student, _ in runners], time.perf_counter() - start, mock.stats())
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test loop.py with simulated students against a mock groq api")
+    parser.add_argument("--students", type=int, default=4, help="concurrent simulated students")
+    parser.add_argument("--rounds", type=int, default=1, help="times each student replays the session script")
+    parser.add_argument("--script", default=None, help="json session script (default: chat + practice session)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra environment for loop.py")
+    parser.add_argument("--step-timeout", type=float, default=STEP_TIMEOUT)
+    parser.add_argument("--work-dir", default=None, help="where student working dirs go (default: a temp dir)")
+    parser.add_argument("--output", default=None, help="results json (default: results/load_<time>.json)")
+    config_args(parser)
+    args = parser.parse_args()
+
+    app_env = {}
+    for item in args.env:
+        key, _, value = item.partition("=")
+        app_env[key] = value
+    script = load_script(args.script) if args.script else None
+
+    mock = MockGroqServer(**config_from_args(args)).start()
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="loop_load_test_")
+    print(f"Mock groq api at {mock.url}, students working in {work_dir}")
+    try:
+        summary = run_load_test(args.students, args.rounds, script, mock, app_env, work_dir, args.seed, args.step_timeout)
+    finally:
+        mock.stop()
+    print_summary(summary)
+
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "config": {"students": args.students, "rounds": args.rounds, "script": args.script,
+                   "env": app_env, "mock": config_from_args(args)},
+        "summary": summary,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+if __name__ == "__main__":
+    main()
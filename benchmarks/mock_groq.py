@@ -0,0 +1,262 @@
+"""local stand-in for the groq chat completions api
+
+answers with canned tutor text shaped like what loop.py expects for each kind
+of request (question batches that parse, learning patterns, summaries, hints),
+with configurable latency, streaming speed and injected 429s
+
+    python benchmarks/mock_groq.py --port 8099 --latency 0.4 --rate-limit 0.05
+    GROQ_API_URL=http://127.0.0.1:8099/openai/v1/chat/completions python main/loop.py
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+DEFAULT_CONFIG = {
+    "latency": 0.3,          # seconds before a response (or the first streamed token)
+    "jitter": 0.2,           # +/- share of random variation on every delay
+    "token_interval": 0.01,  # seconds between streamed tokens
+    "response_words": 120,   # length of free-text answers
+    "rate_limit": 0.0,       # share of requests answered with a 429
+    "retry_after": 1.0,      # Retry-After sent with injected 429s
+    "pattern_share": 0.5,    # share of pattern analyses that report a difficulty
+    "seed": 0,
+}
+
+COUNT_RE = re.compile(r'Generate (\d+) different')
+PERIOD_RE = re.compile(r'(Period \d+)')
+FILLER = ("the colonies expanded trade across the atlantic while british policy after the seven years war "
+          "tightened control through new taxes and the proclamation line which colonists resented and "
+          "debated in assemblies and pamphlets before organized resistance grew").split()
+CONCEPTS = ["the Proclamation of 1763", "salutary neglect", "the Stamp Act crisis", "Federalist arguments",
+            "the Missouri Compromise", "Reconstruction amendments", "Progressive Era reforms", "containment policy"]
+
+def request_kind(messages: List[Dict]) -> str:
+    """which loop.py call this is, from its system prompt"""
+    system = " ".join(m["content"] for m in messages if m["role"] == "system").lower()
+    if "creating exam-style questions" in system:
+        return "questions"
+    if "identifying learning patterns" in system:
+        return "pattern"
+    if "summarizing a student's learning patterns" in system:
+        return "memory_summary"
+    if "summarizing an ap us history tutoring conversation" in system:
+        return "conversation_summary"
+    if "providing hints" in system:
+        return "hint"
+    if "providing concise feedback" in system:
+        return "feedback"
+    return "chat"
+
+def fake_question(rng: random.Random, period: str, n: int) -> str:
+    answer = rng.choice("ABCD")
+    concept = rng.choice(CONCEPTS)
+    return "\n\n".join([
+        f"QUESTION:\nWhich development best explains {concept} in {period} (question {n})?",
+        "OPTIONS:\nA) Expanding transatlantic trade\nB) British imperial reform\nC) Religious revival\nD) Westward settlement",
+        f"ANSWER:\n{answer}",
+        f"EXPLANATION:\n{concept} followed from changing imperial policy. Option {answer} captures that shift.",
+        f"HISTORICAL CONTEXT:\nThe period saw sustained conflict over {concept}.",
+        "AP RELEVANCE:\nA common short-answer and multiple-choice theme.",
+    ])
+
+def fake_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(FILLER) for _ in range(words)).capitalize() + "."
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """doesnt print a traceback every time a client drops its keep-alive connection"""
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class MockGroqServer:
+    """threaded http server speaking the chat completions protocol (json and sse)"""
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **config):
+        self.config = dict(DEFAULT_CONFIG, **config)
+        self.rng = random.Random(self.config["seed"])
+        self.lock = threading.Lock()
+        self.counts = {}  # kind -> {"requests", "rate_limited", "streamed"}
+        self.server = QuietHTTPServer((host, port), self.handler_class())
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/openai/v1/chat/completions"
+
+    def start(self) -> "MockGroqServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-groq", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def delay(self, seconds: float) -> float:
+        with self.lock:
+            spread = self.rng.uniform(-self.config["jitter"], self.config["jitter"])
+        return max(0.0, seconds * (1 + spread))
+
+    def count(self, kind: str, field: str):
+        with self.lock:
+            counts = self.counts.setdefault(kind, {"requests": 0, "rate_limited": 0, "streamed": 0})
+            counts[field] += 1
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {"by_kind": {k: dict(v) for k, v in self.counts.items()},
+                    "requests": sum(v["requests"] for v in self.counts.values()),
+                    "rate_limited": sum(v["rate_limited"] for v in self.counts.values())}
+
+    def completion(self, kind: str, messages: List[Dict]) -> str:
+        prompt = messages[-1]["content"]
+        with self.lock:
+            rng = random.Random(self.rng.random())
+        if kind == "questions":
+            count_match = COUNT_RE.search(prompt)
+            period_match = PERIOD_RE.search(prompt)
+            count = int(count_match.group(1)) if count_match else 1
+            period = period_match.group(1) if period_match else "this period"
+            return "\n===\n".join(fake_question(rng, period, n + 1) for n in range(count))
+        if kind == "pattern":
+            if rng.random() >= self.config["pattern_share"]:
+                return ""
+            return f"User has shown difficulty with: {rng.choice(CONCEPTS)}."
+        if kind == "memory_summary":
+            return f"User has shown difficulty with: {rng.choice(CONCEPTS)}."
+        if kind == "conversation_summary":
+            return fake_text(rng, 60)
+        if kind in ("hint", "feedback"):
+            return fake_text(rng, 30)
+        return fake_text(rng, self.config["response_words"])
+
+    def handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status: int, payload: Dict, headers: Dict = None):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_chunk(self, data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    self.send_json(200, mock.stats())
+                else:
+                    self.send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                if not self.path.endswith("/chat/completions"):
+                    self.send_json(404, {"error": {"message": "not found"}})
+                    return
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                except ValueError:
+                    # a student process that exits mid-request leaves a truncated body
+                    self.send_json(400, {"error": {"message": "invalid json body"}})
+                    return
+                messages = request.get("messages") or []
+                kind = request_kind(messages)
+                mock.count(kind, "requests")
+
+                with mock.lock:
+                    limited = mock.rng.random() < mock.config["rate_limit"]
+                if limited:
+                    mock.count(kind, "rate_limited")
+                    self.send_json(429, {"error": {"message": "Rate limit reached", "type": "tokens"}},
+                                   {"Retry-After": str(mock.config["retry_after"])})
+                    return
+
+                text = mock.completion(kind, messages)
+                usage = usage_block(messages, text)
+                time.sleep(mock.delay(mock.config["latency"]))
+                if request.get("stream"):
+                    mock.count(kind, "streamed")
+                    self.stream(request, text, usage)
+                else:
+                    self.send_json(200, {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "model": request.get("model"),
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    })
+
+            def stream(self, request: Dict, text: str, usage: Dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(stream_tokens(text)):
+                    if i:
+                        time.sleep(mock.delay(mock.config["token_interval"]))
+                    event = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": request.get("model"),
+                             "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                    self.send_chunk(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                final = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": request.get("model"),
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+                self.send_chunk(f"data: {json.dumps(final)}\n\n".encode('utf-8'))
+                self.send_chunk(b"data: [DONE]\n\n")
+                self.send_chunk(b"")
+
+        return Handler
+
+def stream_tokens(text: str) -> List[str]:
+    """split text into word-sized deltas that join back into the text"""
+    words = text.split(" ")
+    return [words[0]] + [" " + w for w in words[1:]] if words else []
+
+def usage_block(messages: List[Dict], text: str) -> Dict:
+    prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+    completion_tokens = len(text) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+def config_args(parser: argparse.ArgumentParser):
+    """add the mock's settings as command line flags"""
+    parser.add_argument("--latency", type=float, default=DEFAULT_CONFIG["latency"], help="seconds to first byte")
+    parser.add_argument("--jitter", type=float, default=DEFAULT_CONFIG["jitter"], help="+/- share of random delay variation")
+    parser.add_argument("--token-interval", type=float, default=DEFAULT_CONFIG["token_interval"], help="seconds between streamed tokens")
+    parser.add_argument("--response-words", type=int, default=DEFAULT_CONFIG["response_words"], help="words in a chat answer")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_CONFIG["rate_limit"], help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=DEFAULT_CONFIG["retry_after"], help="Retry-After seconds on 429s")
+    parser.add_argument("--pattern-share", type=float, default=DEFAULT_CONFIG["pattern_share"], help="share of pattern analyses that find one")
+    parser.add_argument("--seed", type=int, default=DEFAULT_CONFIG["seed"])
+
+def config_from_args(args: argparse.Namespace) -> Dict:
+    return {key: getattr(args, key) for key in DEFAULT_CONFIG}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock groq chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    config_args(parser)
+    args = parser.parse_args()
+    mock = MockGroqServer(args.host, args.port, **config_from_args(args))
+    print(f"Mock groq api at {mock.url} (stats at GET .../stats)")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
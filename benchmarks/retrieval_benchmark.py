@@ -0,0 +1,300 @@
+"""retrieval benchmark for RAGSystem on synthetic corpora
+
+every (corpus size, retrieval mode, load path) case runs in its own process so
+load time and peak rss are measured cold. recall@k is taken against two
+brute-force scorers in ground_truth.py: bm25 (recall), so a faster
+index/backend has to hold up on quality as well as speed, and the keyword
+overlap scorer retrieval used before bm25 (overlap_recall), which shows how far
+the bm25 ranking moved from the one it replaced
+
+the app modules in main/ import each other by bare name, so main/ goes on
+PYTHONPATH (the per-case child processes inherit it):
+
+    PYTHONPATH=main python benchmarks/retrieval_benchmark.py --sizes 1000,10000 --modes keyword,hybrid
+    PYTHONPATH=main python benchmarks/retrieval_benchmark.py --baseline benchmarks/results/<earlier run>.json
+    PYTHONPATH=main python benchmarks/retrieval_benchmark.py --compare <old>.json <new>.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from synthetic_corpus import generate_corpus, generate_queries, QUERY_COUNT
+from ground_truth import load_truth, recall_at_k, truth_file
+from rag_utils import RAGSystem, RETRIEVAL_MODES
+from rag_index import SNAPSHOT_FILE
+from dense_index import DENSE_SNAPSHOT_FILE
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, "data")        # generated corpora (not committed)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# build = index built from the chunk json, snapshot = mapped from a saved index snapshot
+LOAD_PATHS = ("build", "snapshot")
+TOP_K = 3  # get_relevant_chunks default
+WARMUP_QUERIES = 5
+CASE_TIMEOUT = 2 * 60 * 60
+
+# (name, higher is better) for the metrics compared between runs
+COMPARED_METRICS = [
+    ("load_seconds", False),
+    ("peak_rss_mb", False),
+    ("latency_p50_ms", False),
+    ("latency_p99_ms", False),
+    ("batch_qps", True),
+    ("recall", True),
+    ("overlap_recall", True),
+]
+
+def current_rss_mb() -> Optional[float]:
+    """resident set size right now (None where there is no /proc)"""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macos, kilobytes on linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def chunk_positions(rag: RAGSystem, chunks: List[Dict]) -> List[int]:
+    """load-order positions of returned chunk dicts (synthetic chunk_ids are positions within a shard)"""
+    starts = {name: start for name, start, _ in rag.index.shards}
+    positions = []
+    for chunk in chunks:
+        metadata = chunk["metadata"]
+        shard = "exam_info" if metadata.get("section") == "Exam Information" else metadata["period"]
+        positions.append(starts[shard] + metadata["chunk_id"])
+    return positions
+
+def run_case(spec: Dict) -> Dict:
+    """load one RAGSystem and measure it (runs in the child process)"""
+    with open(spec["queries_file"], 'r', encoding='utf-8') as f:
+        queries = json.load(f)
+    with open(spec["truth_file"], 'r', encoding='utf-8') as f:
+        truth = json.load(f)["top_k"]
+    with open(spec["overlap_truth_file"], 'r', encoding='utf-8') as f:
+        overlap_truth = json.load(f)["top_k"]
+    top_k = spec["top_k"]
+
+    start = time.perf_counter()
+    rag = RAGSystem(base_dir=spec["corpus_dir"], use_snapshot=spec["load"] == "snapshot", retrieval_mode=spec["mode"])
+    load_seconds = time.perf_counter() - start
+    if spec.get("prepare"):
+        return {"status": "prepared"}
+    rss_after_load = current_rss_mb()
+
+    for query in queries[:WARMUP_QUERIES]:
+        rag.get_relevant_chunks(query, top_k)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        rag.get_relevant_chunks(query, top_k)
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+
+    # recall from the same search path, outside the timed loop
+    results = [[idx for idx, _ in rag.search(query, top_k)] for query in queries]
+    result = {
+        "status": "ok",
+        "num_docs": len(rag.chunks),
+        "load_seconds": load_seconds,
+        "rss_after_load_mb": rss_after_load,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "latency_mean_ms": float(latencies_ms.mean()),
+        "single_qps": len(queries) / sum(latencies),
+        **recall_at_k(results, truth),
+        "overlap_recall": recall_at_k(results, overlap_truth)["recall"],
+    }
+
+    # the batch path only does keyword scoring
+    if spec["mode"] == "keyword":
+        start = time.perf_counter()
+        batch = rag.get_relevant_chunks_batch(queries, top_k)
+        batch_seconds = time.perf_counter() - start
+        result["batch_qps"] = len(queries) / batch_seconds
+        result["batch_recall"] = recall_at_k([chunk_positions(rag, chunks) for chunks in batch], truth)["recall"]
+    else:
+        result["batch_qps"] = None
+        result["batch_recall"] = None
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def run_child(spec: Dict, timeout: float = CASE_TIMEOUT) -> Dict:
+    """run_case in a fresh interpreter; failures (oom, timeout, exceptions) become a failed result"""
+    try:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+                              capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"status": "failed", "error": f"timed out after {timeout}s"}
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        error = (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]
+        return {"status": "failed", "error": error, "exit_code": proc.returncode}
+    return json.loads(lines[-1])
+
+def remove_snapshots(corpus_dir: str):
+    for name in (SNAPSHOT_FILE, DENSE_SNAPSHOT_FILE):
+        path = os.path.join(corpus_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+def environment() -> Dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def run_benchmark(sizes: List[int], modes: List[str], loads: List[str], top_k: int = TOP_K,
+                  query_count: int = QUERY_COUNT, seed: int = 0, data_dir: str = DATA_DIR) -> Dict:
+    """every size x mode x load case, plus the corpus/ground-truth setup times"""
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": {"sizes": sizes, "modes": modes, "loads": loads, "top_k": top_k, "queries": query_count, "seed": seed},
+        "results": [],
+    }
+    for size in sizes:
+        corpus_dir = os.path.join(data_dir, f"corpus_{size}_{seed}")
+        print(f"\n== {size} chunks ({corpus_dir})")
+        start = time.perf_counter()
+        generate_corpus(corpus_dir, size, seed)
+        queries = generate_queries(corpus_dir, query_count, seed)
+        setup_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        load_truth(corpus_dir, queries, top_k)
+        truth_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        load_truth(corpus_dir, queries, top_k, "overlap")
+        overlap_truth_seconds = time.perf_counter() - start
+        print(f"corpus + queries {setup_seconds:.1f}s, brute-force ground truth {truth_seconds:.1f}s "
+              f"(keyword overlap {overlap_truth_seconds:.1f}s)")
+
+        for mode in modes:
+            for load in loads:
+                spec = {
+                    "corpus_dir": corpus_dir,
+                    "mode": mode,
+                    "load": load,
+                    "top_k": top_k,
+                    "queries_file": os.path.join(corpus_dir, f"queries_{query_count}_{seed}.json"),
+                    "truth_file": truth_file(corpus_dir, queries, top_k),
+                    "overlap_truth_file": truth_file(corpus_dir, queries, top_k, "overlap"),
+                }
+                remove_snapshots(corpus_dir)
+                if load == "snapshot":
+                    # write the snapshot in a throwaway process, then time mapping it
+                    prepared = run_child(dict(spec, prepare=True))
+                    if prepared["status"] != "prepared":
+                        result = prepared
+                    else:
+                        result = run_child(spec)
+                else:
+                    result = run_child(spec)
+                row = {"num_chunks": size, "mode": mode, "load": load, "ground_truth_seconds": truth_seconds, **result}
+                report["results"].append(row)
+                print(format_row(row))
+        remove_snapshots(corpus_dir)
+    return report
+
+def format_row(row: Dict) -> str:
+    label = f"{row['num_chunks']:>9} {row['mode']:<8} {row['load']:<8}"
+    if row["status"] != "ok":
+        return f"{label} FAILED: {row.get('error')}"
+    batch = f"{row['batch_qps']:.0f} q/s" if row["batch_qps"] is not None else "n/a"
+    return (f"{label} load {row['load_seconds']:.2f}s, peak rss {row['peak_rss_mb']:.0f}MB, "
+            f"p50 {row['latency_p50_ms']:.2f}ms, p99 {row['latency_p99_ms']:.2f}ms, batch {batch}, "
+            f"recall@k {row['recall']:.3f} (keyword overlap {row['overlap_recall']:.3f})")
+
+def compare_reports(baseline: Dict, current: Dict) -> List[Dict]:
+    """current / baseline ratio of each metric for the cases both runs have"""
+    old = {(r["num_chunks"], r["mode"], r["load"]): r for r in baseline["results"] if r["status"] == "ok"}
+    rows = []
+    for row in current["results"]:
+        key = (row["num_chunks"], row["mode"], row["load"])
+        if row["status"] != "ok" or key not in old:
+            continue
+        diff = {"num_chunks": key[0], "mode": key[1], "load": key[2]}
+        for metric, _ in COMPARED_METRICS:
+            before, after = old[key].get(metric), row.get(metric)
+            diff[metric] = {"baseline": before, "current": after,
+                            "ratio": after / before if before and after is not None else None}
+        rows.append(diff)
+    return rows
+
+def print_comparison(rows: List[Dict]):
+    print("\nCompared with the baseline (current / baseline):")
+    for row in rows:
+        parts = []
+        for metric, higher_is_better in COMPARED_METRICS:
+            ratio = row[metric]["ratio"]
+            if ratio is None:
+                continue
+            better = ratio > 1 if higher_is_better else ratio < 1
+            parts.append(f"{metric} {ratio:.2f}x{'' if ratio == 1 else (' better' if better else ' worse')}")
+        print(f"- {row['num_chunks']} {row['mode']} {row['load']}: " + ", ".join(parts))
+
+def load_report(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAGSystem retrieval on synthetic corpora")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="comma separated corpus sizes in chunks")
+    parser.add_argument("--modes", default="keyword", help=f"comma separated retrieval modes {RETRIEVAL_MODES}")
+    parser.add_argument("--loads", default=",".join(LOAD_PATHS), help=f"comma separated load paths {LOAD_PATHS}")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--queries", type=int, default=QUERY_COUNT, help="queries per corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=DATA_DIR, help="where generated corpora are cached")
+    parser.add_argument("--output", default=None, help="results json (default: results/retrieval_<time>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results json to compare this run against")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="only compare two results files")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(json.loads(args.child))))
+        return
+    if args.compare:
+        print_comparison(compare_reports(load_report(args.compare[0]), load_report(args.compare[1])))
+        return
+
+    modes = args.modes.split(",")
+    loads = args.loads.split(",")
+    for mode in modes:
+        if mode not in RETRIEVAL_MODES:
+            parser.error(f"unknown mode {mode}")
+    for load in loads:
+        if load not in LOAD_PATHS:
+            parser.error(f"unknown load path {load}")
+
+    report = run_benchmark([int(s) for s in args.sizes.split(",")], modes, loads, args.top_k, args.queries, args.seed, args.data_dir)
+    if args.baseline:
+        report["comparison"] = compare_reports(load_report(args.baseline), report)
+        print_comparison(report["comparison"])
+
+    output = args.output or os.path.join(RESULTS_DIR, f"retrieval_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import json
+import os
+from typing import Dict, List
+import numpy as np
+
+# synthetic corpora in the same layout process_ced.py writes (and RAGSystem reads):
+#   <dir>/period{N}_data/period_{N}_chunks.json, <dir>/exam_info_data/exam_info_chunks.json
+NUM_PERIODS = 9
+EXAM_INFO_SHARE = 0.02     # fraction of chunks that are exam info
+
+VOCAB_SIZE = 50_000        # zipf-distributed background vocabulary
+ZIPF_EXPONENT = 1.1
+TOPIC_WORDS = 400          # words each period (and exam info) leans on
+TOPIC_SHARE = 0.3          # fraction of a chunk's words drawn from its topic
+WORDS_PER_CHUNK = 80       # mean words per chunk (process_ced chunks are ~500 characters)
+WORDS_PER_SENTENCE = 12
+
+SYLLABLES = ["ab", "al", "am", "an", "ar", "ba", "be", "bo", "ca", "ce", "co", "da", "de", "di", "el", "en",
+             "er", "fa", "fe", "ga", "ge", "ha", "he", "in", "is", "la", "le", "li", "lo", "ma", "me", "mi",
+             "mo", "na", "ne", "no", "or", "pa", "pe", "ra", "re", "ri", "ro", "sa", "se", "so", "ta", "te",
+             "ti", "to", "un", "va", "ve", "wa"]
+SEED_WORDS = ["colonial", "british", "parliament", "tax", "trade", "native", "settlement", "revolution",
+              "proclamation", "westward", "constitution", "federalist", "slavery", "abolition", "reconstruction",
+              "industrial", "railroad", "immigration", "progressive", "suffrage", "depression", "deal", "war",
+              "treaty", "containment", "civil", "rights", "movement", "reform", "market", "republic", "congress"]
+EXAM_KEYWORD_QUERIES = ["exam", "score", "rubric", "format", "dbq", "saq", "leq"]
+
+QUERY_COUNT = 200
+QUERY_TERMS = (2, 6)       # words per query, inclusive range
+
+def build_vocabulary(size: int = VOCAB_SIZE, seed: int = 0) -> List[str]:
+    """seed words first (most frequent), then unique pseudo-words made of syllables"""
+    rng = np.random.default_rng(seed)
+    words = list(SEED_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES, size=rng.integers(2, 5)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+def zipf_probabilities(size: int, exponent: float = ZIPF_EXPONENT) -> np.ndarray:
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+def shard_sizes(num_chunks: int) -> Dict[str, int]:
+    """chunk count per shard name ("1".."9", "exam_info"), summing to num_chunks"""
+    exam = max(1, int(num_chunks * EXAM_INFO_SHARE))
+    per_period, extra = divmod(num_chunks - exam, NUM_PERIODS)
+    sizes = {str(p): per_period + (1 if p <= extra else 0) for p in range(1, NUM_PERIODS + 1)}
+    sizes["exam_info"] = exam
+    return sizes
+
+def chunk_texts(rng: np.random.Generator, vocab: np.ndarray, background: np.ndarray, topic: np.ndarray, count: int) -> List[str]:
+    """count chunk texts mixing background zipf words with the shard's topic words"""
+    lengths = np.maximum(8, rng.poisson(WORDS_PER_CHUNK, size=count))
+    total = int(lengths.sum())
+    from_topic = rng.random(total) < TOPIC_SHARE
+    ids = rng.choice(len(vocab), size=total, p=background)
+    ids[from_topic] = rng.choice(topic, size=int(from_topic.sum()))
+    words = vocab[ids]
+
+    texts = []
+    start = 0
+    for length in lengths:
+        chunk = words[start:start + length]
+        start += length
+        sentences = [" ".join(chunk[i:i + WORDS_PER_SENTENCE]) for i in range(0, length, WORDS_PER_SENTENCE)]
+        texts.append(". ".join(s.capitalize() for s in sentences) + ".")
+    return texts
+
+def shard_file(corpus_dir: str, name: str) -> str:
+    if name == "exam_info":
+        return os.path.join(corpus_dir, "exam_info_data", "exam_info_chunks.json")
+    return os.path.join(corpus_dir, f"period{name}_data", f"period_{name}_chunks.json")
+
+def generate_corpus(out_dir: str, num_chunks: int, seed: int = 0) -> Dict[str, int]:
+    """write a num_chunks corpus under out_dir (skipped if it is already there), returning shard sizes"""
+    sizes = shard_sizes(num_chunks)
+    marker = os.path.join(out_dir, "corpus.json")
+    if os.path.exists(marker):
+        with open(marker, 'r', encoding='utf-8') as f:
+            if json.load(f) == {"num_chunks": num_chunks, "seed": seed, "shards": sizes}:
+                return sizes
+    # queries and ground truth cached for an older corpus no longer apply
+    if os.path.isdir(out_dir):
+        for name in os.listdir(out_dir):
+            if name.startswith(("queries_", "truth_")):
+                os.remove(os.path.join(out_dir, name))
+
+    rng = np.random.default_rng(seed)
+    vocab = np.array(build_vocabulary(seed=seed))
+    background = zipf_probabilities(len(vocab))
+    timestamp = "2025-01-01T00:00:00"
+    for name, count in sizes.items():
+        # each shard gets its own slice of mid-frequency words as its topic
+        topic = rng.choice(np.arange(100, len(vocab) // 4), size=TOPIC_WORDS, replace=False)
+        texts = chunk_texts(rng, vocab, background, topic, count)
+        if name == "exam_info":
+            metadata = {"section": "Exam Information", "source": "AP US History Exam Information"}
+            # exam questions should find these through the exam keywords
+            texts = [f"{EXAM_KEYWORD_QUERIES[i % len(EXAM_KEYWORD_QUERIES)]} {text}" for i, text in enumerate(texts)]
+        else:
+            metadata = {"period": name, "period_title": f"Period {name}", "source": f"AP US History Period {name}"}
+        chunks = [
+            {"text": text, "metadata": dict(metadata, chunk_id=i, timestamp=timestamp)}
+            for i, text in enumerate(texts)
+        ]
+        path = shard_file(out_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(chunks, f)
+
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump({"num_chunks": num_chunks, "seed": seed, "shards": sizes}, f)
+    return sizes
+
+def generate_queries(corpus_dir: str, count: int = QUERY_COUNT, seed: int = 0) -> List[str]:
+    """student-style queries built from words of randomly picked chunks
+
+    most are plain keyword queries; some name the chunk's period (period boost)
+    and some are about the exam (exam info boost)
+    """
+    path = os.path.join(corpus_dir, f"queries_{count}_{seed}.json")
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    with open(os.path.join(corpus_dir, "corpus.json"), 'r', encoding='utf-8') as f:
+        sizes = json.load(f)["shards"]
+    rng = np.random.default_rng(seed + 1)
+    names = list(sizes)
+    weights = np.array([sizes[n] for n in names], dtype=np.float64)
+    picks = rng.choice(len(names), size=count, p=weights / weights.sum())
+
+    # one shard in memory at a time
+    queries = [None] * count
+    for shard, name in enumerate(names):
+        positions = np.nonzero(picks == shard)[0]
+        if not len(positions):
+            continue
+        with open(shard_file(corpus_dir, name), 'r', encoding='utf-8') as f:
+            chunks = json.load(f)
+        for i in positions:
+            words = chunks[int(rng.integers(len(chunks)))]["text"].lower().replace(".", "").split()
+            size = min(len(words), int(rng.integers(QUERY_TERMS[0], QUERY_TERMS[1] + 1)))
+            query_words = [str(w) for w in rng.choice(words, size=size, replace=False)]
+            if name == "exam_info":
+                query_words.insert(0, "how is the exam")
+            elif i % 4 == 1:
+                query_words.append(f"in period {name}")
+            queries[i] = " ".join(query_words)
+        del chunks
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(queries, f)
+    return queries
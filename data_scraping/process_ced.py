@@ -1,71 +1,234 @@
 import os
 import json
-from typing import List, Dict
+import argparse
+import hashlib
+from collections import deque
+from itertools import chain, groupby
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator
 import re
 from datetime import datetime
 import PyPDF2
 
+PDF_DIR = "/Users/RyanWorks/downloads"
+DATA_DIR = "/Users/RyanWorks/desktop/ap-data-by-period"
+
+# content hashes of already-ingested pdfs, so unchanged ones are skipped on re-runs
+MANIFEST_FILE = os.path.join(DATA_DIR, "ingest_manifest.json")
+
+# pages handed to one worker at a time
+PAGES_PER_TASK = 8
+# page ranges submitted but not yet consumed, per worker (bounds the extracted pages held in memory)
+TASKS_IN_FLIGHT_PER_WORKER = 2
+
+# chunk file formats: compact "jsonl" (text lines + interned metadata/offset index) or legacy pretty "json"
+CHUNK_FORMATS = ("jsonl", "json")
+CHUNK_STORE_VERSION = 1
+
+# page cleaning pipeline, compiled once
+WEIRD_CHARS_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\xff]')
+STUCK_WORDS_RE = re.compile(r'([a-z])([A-Z])')
+MISSING_SPACE_RE = re.compile(r'([.,!?])([A-Za-z])')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# chunking patterns
+HEADING_START_RE = re.compile(r'[A-Z]')
+HEADING_RUN_RE = re.compile(r'[A-Za-z\s]*')
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+PERIOD_NUM_RE = re.compile(r'p(\d+)')
+PERIOD_TITLE_RE = re.compile(r'Period \d+:\s*([^\n]+)')
+
+def clean_page_text(page_text: str) -> str:
+    """clean up the raw text pypdf2 pulls out of one page"""
+    # clean up weird chars and spaces
+    page_text = WEIRD_CHARS_RE.sub('', page_text)
+    # add spaces between words that are stuck together
+    page_text = STUCK_WORDS_RE.sub(r'\1 \2', page_text)
+    # add spaces after periods and commas
+    page_text = MISSING_SPACE_RE.sub(r'\1 \2', page_text)
+    # fix extra spaces
+    page_text = WHITESPACE_RE.sub(' ', page_text)
+    return page_text
+
+def starts_subsection(page: str, following: Iterable[str]) -> bool:
+    """does this page open with a 'Heading:' label
+
+    same test as the old r'\n(?=[A-Z][A-Za-z\s]+:)' split on the joined text: a
+    label made only of letters/spaces can run past the end of the page, so the
+    following pages are only pulled in when that actually happens
+    """
+    if not HEADING_START_RE.match(page):
+        return False
+    end = HEADING_RUN_RE.match(page, 1).end()
+    if end < len(page):
+        return page[end] == ':' and end > 1
+    # the run reaches the end of the page and carries on through the newline
+    for next_page in following:
+        end = HEADING_RUN_RE.match(next_page).end()
+        if end < len(next_page):
+            return next_page[end] == ':'
+    return False
+
+def extract_pages(pdf_path: str, start: int, stop: int) -> List[str]:
+    """extract and clean pages [start, stop) of a pdf (runs inside pool workers)"""
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [clean_page_text(pdf_reader.pages[i].extract_text()) for i in range(start, stop)]
+
+def count_pages(pdf_path: str) -> int:
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def submit_windowed(pool: ProcessPoolExecutor, tasks: Iterable[Tuple], window: int) -> Iterator[Tuple]:
+    """submit (tag, (fn, *args)) tasks lazily, yielding (tag, future) in order with at most window outstanding
+
+    a new task is only submitted when the consumer takes a future, so finished
+    results never pile up ahead of the code writing them out
+    """
+    in_flight = deque()
+    for tag, task in tasks:
+        in_flight.append((tag, pool.submit(*task)))
+        if len(in_flight) >= window:
+            yield in_flight.popleft()
+    while in_flight:
+        yield in_flight.popleft()
+
+def file_sha256(path: str) -> str:
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 class PeriodProcessor:
-    def __init__(self, period_file: str, output_dir: str = "period_data"):
+    def __init__(self, period_file: str, output_dir: str = "period_data", chunk_format: str = "jsonl"):
+        if chunk_format not in CHUNK_FORMATS:
+            raise ValueError(f"chunk_format must be one of {CHUNK_FORMATS}")
         self.period_file = period_file
         self.output_dir = output_dir
+        self.chunk_format = chunk_format
         self.chunks = []
         
+        # period number from the filename and the run timestamp, worked out once per processor
+        period_match = PERIOD_NUM_RE.search(period_file)
+        self.period = period_match.group(1) if period_match else "Unknown"
+        self.run_timestamp = datetime.now().isoformat()
+        
         # make output dir if it doesnt exist
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
     
-    def read_period(self) -> str:
-        """read the period pdf file"""
+    def iter_pages(self) -> Iterator[str]:
+        """yield the cleaned text of each page, one page in memory at a time"""
         try:
-            text = ""
             with open(self.period_file, 'rb') as file:
-                # create pdf reader
                 pdf_reader = PyPDF2.PdfReader(file)
-                
-                # get text from each page
                 for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    # clean up weird chars and spaces
-                    page_text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\xff]', '', page_text)
-                    # add spaces between words that are stuck together
-                    page_text = re.sub(r'([a-z])([A-Z])', r'\1 \2', page_text)
-                    # add spaces after periods and commas
-                    page_text = re.sub(r'([.,!?])([A-Za-z])', r'\1 \2', page_text)
-                    # fix extra spaces
-                    page_text = re.sub(r'\s+', ' ', page_text)
-                    text += page_text + "\n"
-            
-            return text
-                
+                    yield clean_page_text(page.extract_text())
         except Exception as e:
             print(f"Error reading period file: {str(e)}")
             raise
+
+    def read_period(self, pool: Optional[ProcessPoolExecutor] = None) -> str:
+        """read the period pdf file (pages are extracted in parallel if a process pool is given)"""
+        if pool is None:
+            pages = self.iter_pages()
+        else:
+            window = TASKS_IN_FLIGHT_PER_WORKER * (os.cpu_count() or 1)
+            tasks = ((None, (extract_pages, self.period_file, start, stop)) for start, stop in self.page_ranges())
+            pages = (page for _, future in submit_windowed(pool, tasks, window) for page in future.result())
+        return "".join(page + "\n" for page in pages)
+
+    def page_ranges(self) -> List[Tuple[int, int]]:
+        """[start, stop) page ranges of this pdf, one per extraction task"""
+        num_pages = count_pages(self.period_file)
+        return [(start, min(start + PAGES_PER_TASK, num_pages)) for start in range(0, num_pages, PAGES_PER_TASK)]
     
     def split_into_chunks(self, text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
         """split text into overlapping chunks"""
-        # split by subsections
-        subsections = re.split(r'\n(?=[A-Z][A-Za-z\s]+:)', text)
-        
-        chunks = []
+        pages = text.split("\n")
+        if text.endswith("\n"):
+            pages.pop()
+        return list(self.iter_chunks(pages, chunk_size, overlap))
         
-        for subsection in subsections:
-            # clean the text
-            subsection = subsection.strip()
-            if not subsection:
-                continue
+    def iter_subsections(self, pages: Iterable[str]) -> Iterator[Iterator[str]]:
+        """group pages into subsections; a new one starts at each page opening with a 'Heading:' label
+
+        each subsection is itself a generator of its pages, so nothing is buffered
+        beyond the (rare) pages needed to look past a page-spanning label
+        """
+        pages = iter(pages)
+        lookahead = deque()
+
+        def next_page():
+            return lookahead.popleft() if lookahead else next(pages, None)
+
+        def following_pages():
+            i = 0
+            while True:
+                if i == len(lookahead):
+                    page = next(pages, None)
+                    if page is None:
+                        return
+                    lookahead.append(page)
+                yield lookahead[i]
+                i += 1
+
+        def subsection_pages(first_page):
+            nonlocal current
+            yield first_page
+            current = next_page()
+            while current is not None and not starts_subsection(current, following_pages()):
+                yield current
+                current = next_page()
+
+        current = next_page()
+        while current is not None:
+            subsection = subsection_pages(current)
+            yield subsection
+            # drain whatever the consumer didnt read so the next subsection starts in the right place
+            for _ in subsection:
+                pass
+
+    def iter_sentences(self, pieces: Iterable[str]) -> Iterator[str]:
+        """split a stream of text pieces into sentences, carrying partial sentences across pieces"""
+        pending = ""
+        for piece in pieces:
+            pending += piece
+            sentences = SENTENCE_SPLIT_RE.split(pending)
+            # the last piece may continue on the next page
+            pending = sentences.pop()
+            yield from sentences
+        yield pending
+
+    def iter_chunks(self, pages: Iterable[str], chunk_size: int = 500, overlap: int = 100) -> Iterator[str]:
+        """stream overlapping chunks out of a stream of cleaned pages
+
+        same chunks as joining the pages with newlines and splitting by subsection
+        and sentence, but only one page plus the current chunk window is held
+        """
+        for subsection in self.iter_subsections(pages):
+            # buffer the subsection only while it could still fit in a single chunk
+            buffered = next(subsection)
+            if len(buffered.strip()) <= chunk_size:
+                for page in subsection:
+                    buffered += "\n" + page
+                    if len(buffered.strip()) > chunk_size:
+                        break
             
             # if subsection is small enough, keep it as one chunk
-            if len(subsection) <= chunk_size:
-                chunks.append(subsection)
+            if len(buffered.strip()) <= chunk_size:
+                if buffered.strip():
+                    yield buffered.strip()
                 continue
             
             # otherwise split into smaller chunks with overlap
-            sentences = re.split(r'(?<=[.!?])\s+', subsection)
             current_chunk = []
             current_size = 0
+            rest = ("\n" + page for page in subsection)
             
-            for sentence in sentences:
+            for sentence in self.iter_sentences(chain([buffered], rest)):
                 sentence = sentence.strip()
                 if not sentence:
                     continue
@@ -73,7 +236,7 @@ class PeriodProcessor:
                 # if adding this sentence would make chunk too big
                 # save current chunk and start new one
                 if current_size + len(sentence) > chunk_size and current_chunk:
-                    chunks.append(' '.join(current_chunk))
+                    yield ' '.join(current_chunk)
                     # keep last few sentences for overlap
                     overlap_sentences = current_chunk[-2:]  # keep last 2 sentences
                     current_chunk = overlap_sentences
@@ -84,18 +247,15 @@ class PeriodProcessor:
             
             # add any leftover sentences as final chunk
             if current_chunk:
-                chunks.append(' '.join(current_chunk))
+                yield ' '.join(current_chunk)
         
-        return chunks
     
     def process_chunk(self, chunk: str, index: int) -> Dict:
         """process a single chunk into structured format"""
-        # get period number from filename
-        period_match = re.search(r'p(\d+)', self.period_file)
-        period = period_match.group(1) if period_match else "Unknown"
+        period = self.period
         
         # try to get period title from chunk
-        period_title_match = re.search(r'Period \d+:\s*([^\n]+)', chunk)
+        period_title_match = PERIOD_TITLE_RE.search(chunk)
         period_title = period_title_match.group(1).strip() if period_title_match else f"Period {period}"
         
         # create metadata
@@ -103,7 +263,7 @@ class PeriodProcessor:
             "chunk_id": index,
             "period": period,
             "period_title": period_title,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self.run_timestamp,
             "source": f"AP US History Period {period}"
         }
         
@@ -112,32 +272,93 @@ class PeriodProcessor:
             "metadata": metadata
         }
     
-    def save_chunks(self, chunks: List[Dict]):
-        """save processed chunks to json files"""
-        # get period number from filename
-        period_match = re.search(r'p(\d+)', self.period_file)
-        period = period_match.group(1) if period_match else "Unknown"
-        
-        # save chunks to a single file
-        output_file = os.path.join(self.output_dir, f"period_{period}_chunks.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(chunks, f, indent=2)
-
-    def process(self):
-        """main processing function"""
-        print(f"Reading period file: {self.period_file}")
-        text = self.read_period()
-        
-        print("Splitting into chunks...")
-        raw_chunks = self.split_into_chunks(text)
+    def output_stem(self) -> str:
+        return os.path.join(self.output_dir, f"period_{self.period}_chunks")
+
+    def output_file(self) -> str:
+        """path of the chunk file this processor writes"""
+        return f"{self.output_stem()}.{self.chunk_format}"
         
-        print("Processing chunks...")
-        processed_chunks = [self.process_chunk(chunk, i) for i, chunk in enumerate(raw_chunks)]
+    def save_chunks(self, chunks: Iterable[Dict]) -> int:
+        """save processed chunks in the configured format; returns the number of chunks"""
+        if self.chunk_format == "jsonl":
+            return self.save_compact_chunks(chunks)
+        return self.save_json_chunks(chunks)
+
+    def save_compact_chunks(self, chunks: Iterable[Dict]) -> int:
+        """save chunks as one json text string per line plus a metadata/offset index
+
+        metadata is interned into a small table: the per-chunk fields (chunk_id,
+        timestamp) are stored as null and rebuilt on read, so a shard with one
+        period title keeps a single metadata row no matter how many chunks it has
+        """
+        text_file = self.output_file()
+        meta_file = f"{self.output_stem()}.meta.json"
+        offsets = [0]
+        table, table_ids, rows = [], {}, []
+        with open(text_file + ".tmp", 'wb') as f:
+            for chunk in chunks:
+                line = (json.dumps(chunk["text"]) + "\n").encode('utf-8')
+                f.write(line)
+                offsets.append(offsets[-1] + len(line))
+
+                metadata = dict(chunk["metadata"])
+                for field in ("chunk_id", "timestamp"):
+                    if field in metadata:
+                        metadata[field] = None
+                key = json.dumps(metadata)
+                if key not in table_ids:
+                    table_ids[key] = len(table)
+                    table.append(metadata)
+                rows.append(table_ids[key])
+
+        meta = {
+            "version": CHUNK_STORE_VERSION,
+            "count": len(rows),
+            "timestamp": self.run_timestamp,
+            "table": table,
+            "rows": rows,
+            "offsets": offsets,
+        }
+        with open(meta_file + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(text_file + ".tmp", text_file)
+        os.replace(meta_file + ".tmp", meta_file)
+        return len(rows)
+
+    def save_json_chunks(self, chunks: Iterable[Dict]) -> int:
+        """save processed chunks to json files, writing each chunk as it arrives
+
+        output matches json.dump(chunks, f, indent=2); returns the number of chunks
+        """
+        # save chunks to a single file (via a temp file so readers never see a partial one)
+        output_file = self.output_file()
+        tmp_file = output_file + ".tmp"
+        count = 0
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write("[\n  " if count == 0 else ",\n  ")
+                f.write(json.dumps(chunk, indent=2).replace("\n", "\n  "))
+                count += 1
+            f.write("\n]" if count else "[]")
+        os.replace(tmp_file, output_file)
+        return count
+
+    def process(self, pages: Optional[Iterable[str]] = None):
+        """main processing function (pass pages to skip reading the pdf again)
+
+        pages -> chunks -> chunk dicts -> file all run as one generator pipeline
+        """
+        if pages is None:
+            print(f"Reading period file: {self.period_file}")
+            pages = self.iter_pages()
         
-        print("Saving chunks...")
-        self.save_chunks(processed_chunks)
+        print("Splitting, processing and saving chunks...")
+        raw_chunks = self.iter_chunks(pages)
+        processed_chunks = (self.process_chunk(chunk, i) for i, chunk in enumerate(raw_chunks))
+        count = self.save_chunks(processed_chunks)
         
-        print(f"Processing complete! {len(processed_chunks)} chunks created.")
+        print(f"Processing complete! {count} chunks created.")
         print(f"Output saved to {self.output_dir}/")
 
 class ExamInfoProcessor(PeriodProcessor):
@@ -147,7 +368,7 @@ class ExamInfoProcessor(PeriodProcessor):
         metadata = {
             "chunk_id": index,
             "section": "Exam Information",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self.run_timestamp,
             "source": "AP US History Exam Information"
         }
         
@@ -156,43 +377,104 @@ class ExamInfoProcessor(PeriodProcessor):
             "metadata": metadata
         }
     
-    def save_chunks(self, chunks: List[Dict]):
-        """save processed chunks to json files"""
-        output_file = os.path.join(self.output_dir, "exam_info_chunks.json")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(chunks, f, indent=2)
-
-def process_period(period_num: int):
-    """process a single period pdf"""
-    period_file = f"/Users/RyanWorks/downloads/p{period_num}.pdf"
-    output_dir = f"/Users/RyanWorks/desktop/ap-data-by-period/period{period_num}_data"
-    
-    print(f"\nProcessing Period {period_num}...")
-    processor = PeriodProcessor(period_file, output_dir)
-    processor.process()
-
-def process_exam_info():
-    """process the exam info pdf"""
-    exam_file = "/Users/RyanWorks/downloads/examinformation.pdf"
-    output_dir = "/Users/RyanWorks/desktop/ap-data-by-period/exam_info_data"
-    
-    print("\nProcessing Exam Information...")
-    processor = ExamInfoProcessor(exam_file, output_dir)
-    processor.process()
+    def output_stem(self) -> str:
+        return os.path.join(self.output_dir, "exam_info_chunks")
 
-def main():
-    # process all periods 1-9
+def ingest_jobs() -> List[Tuple[str, str, str, type]]:
+    """(label, pdf path, output dir, processor class) for every ced pdf"""
+    jobs = []
     for period_num in range(1, 10):
+        period_file = os.path.join(PDF_DIR, f"p{period_num}.pdf")
+        output_dir = os.path.join(DATA_DIR, f"period{period_num}_data")
+        jobs.append((f"Period {period_num}", period_file, output_dir, PeriodProcessor))
+
+    exam_file = os.path.join(PDF_DIR, "examinformation.pdf")
+    jobs.append(("Exam Information", exam_file, os.path.join(DATA_DIR, "exam_info_data"), ExamInfoProcessor))
+    return jobs
+
+def load_manifest() -> Dict[str, Dict]:
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(manifest: Dict[str, Dict]):
+    """write the manifest via a temp file so a crash never leaves it half written"""
+    os.makedirs(os.path.dirname(MANIFEST_FILE), exist_ok=True)
+    tmp_file = MANIFEST_FILE + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, MANIFEST_FILE)
+
+def main(workers: Optional[int] = None, force: bool = False, chunk_format: str = "jsonl"):
+    """process every ced pdf, skipping ones whose content hash hasnt changed
+
+    page extraction for all changed pdfs runs in one process pool, so both
+    pages and periods are processed in parallel (workers=1 runs serially).
+    only a bounded window of page ranges is in flight, so memory stays flat
+    however many pdfs there are
+    """
+    manifest = {} if force else load_manifest()
+    pending = []
+    for label, pdf_path, output_dir, processor_class in ingest_jobs():
         try:
-            process_period(period_num)
-        except Exception as e:
-            print(f"Error processing period {period_num}: {str(e)}")
+            digest = file_sha256(pdf_path)
+            processor = processor_class(pdf_path, output_dir, chunk_format)
+        except OSError as e:
+            print(f"Error processing {label}: {str(e)}")
             continue
     
-    # process exam info
-    try:
-        process_exam_info()
-    except Exception as e:
-        print(f"Error processing exam information: {str(e)}")
+        entry = manifest.get(pdf_path, {})
+        output_file = processor.output_file()
+        if entry.get("sha256") == digest and entry.get("output") == output_file and os.path.exists(output_file):
+            print(f"Skipping {label} (unchanged)")
+            continue
+        pending.append((label, pdf_path, processor, digest))
+
+    def finish(pdf_path, processor, digest):
+        # record the pdf only once its chunks are on disk
+        manifest[pdf_path] = {"sha256": digest, "output": processor.output_file()}
+        save_manifest(manifest)
+
+    if workers == 1:
+        for label, pdf_path, processor, digest in pending:
+            print(f"\nProcessing {label}...")
+            try:
+                processor.process()
+                finish(pdf_path, processor, digest)
+            except Exception as e:
+                print(f"Error processing {label}: {str(e)}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            def page_tasks():
+                # every page range of every pdf, tagged with the pdf's position in pending
+                for n, (label, pdf_path, processor, digest) in enumerate(pending):
+                    try:
+                        ranges = processor.page_ranges()
+                    except Exception as e:
+                        print(f"Error processing {label}: {str(e)}")
+                        continue
+                    for start, stop in ranges:
+                        yield n, (extract_pages, pdf_path, start, stop)
+
+            # the next ranges (often of the next pdf) keep the pool busy while this pdf is chunked
+            window = TASKS_IN_FLIGHT_PER_WORKER * (workers or os.cpu_count() or 1)
+            for n, group in groupby(submit_windowed(pool, page_tasks(), window), key=lambda result: result[0]):
+                label, pdf_path, processor, digest = pending[n]
+                print(f"\nProcessing {label}...")
+                try:
+                    # pages stream into the chunker as each range comes back
+                    processor.process(page for _, future in group for page in future.result())
+                    finish(pdf_path, processor, digest)
+                except Exception as e:
+                    print(f"Error processing {label}: {str(e)}")
     
     print("\nAll content processed!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process the AP US History CED pdfs into chunk files")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cpu count, 1 = serial)")
+    parser.add_argument("--force", action="store_true", help="re-process every pdf even if unchanged")
+    parser.add_argument("--format", choices=CHUNK_FORMATS, default="jsonl", help="chunk file format (default: compact jsonl)")
+    args = parser.parse_args()
+    main(workers=args.workers, force=args.force, chunk_format=args.format)
@@ -0,0 +1,145 @@
+import asyncio
+import contextvars
+import json
+import os
+import random
+from typing import AsyncIterator, Dict, List
+import aiohttp
+from groq_client import (GroqError, retry_after_seconds, GROQ_API_URL, CONNECT_TIMEOUT, READ_TIMEOUT, MAX_RETRIES,
+                         BACKOFF_BASE, BACKOFF_MAX, RETRY_AFTER_MAX, RETRYABLE_STATUS)
+
+# requests in flight to the api at once, across every session of the service
+MAX_CONCURRENCY = int(os.environ.get("GROQ_MAX_CONCURRENCY", "32"))
+
+# retries and token usage of the calling task's last request
+call_stats = contextvars.ContextVar("groq_call_stats", default=None)
+
+class AsyncGroqClient:
+    """asyncio version of GroqClient for the multi-student service
+
+    same retry / backoff / Retry-After handling; a semaphore caps how many
+    requests are in flight so hundreds of sessions share a bounded pool of
+    keep-alive connections instead of one thread each
+    """
+    def __init__(self, api_key: str = None, api_url: str = None, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, max_retries: int = MAX_RETRIES,
+                 max_concurrency: int = MAX_CONCURRENCY):
+        self.api_key = api_key if api_key is not None else os.environ.get("GROQ_API_KEY")
+        self.api_url = api_url or GROQ_API_URL
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session = None
+
+    async def start(self) -> "AsyncGroqClient":
+        """open the connection pool (call from inside the running event loop)"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                timeout=self.timeout,
+                headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            )
+        return self
+
+    def backoff_delay(self, attempt: int, response: aiohttp.ClientResponse = None) -> float:
+        """how long to sleep before retry number attempt + 1"""
+        if response is not None:
+            retry_after = retry_after_seconds(response)
+            if retry_after is not None:
+                return min(retry_after, RETRY_AFTER_MAX)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    async def post(self, data: Dict) -> aiohttp.ClientResponse:
+        """post to the api, retrying transient failures
+
+        returns the last response (which may still be an error status) unread,
+        so the caller must release it; raises the last exception if every
+        attempt failed to get a response
+        """
+        await self.start()
+        stats = {"retries": 0, "usage": None}
+        call_stats.set(stats)
+        for attempt in range(self.max_retries + 1):
+            stats["retries"] = attempt
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await self.session.post(self.api_url, json=data)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if last_attempt:
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"Groq request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status not in RETRYABLE_STATUS or last_attempt:
+                return response
+            delay = self.backoff_delay(attempt, response)
+            print(f"Groq returned {response.status}, retrying in {delay:.1f}s")
+            response.release()
+            await asyncio.sleep(delay)
+
+    async def chat(self, messages: List[Dict], model: str, max_completion_tokens: int, temperature: float = 0.7) -> Dict:
+        """send a chat completion request and return the parsed json response"""
+        data = {
+            "model": model,
+            "messages": messages,
+            "max_completion_tokens": max_completion_tokens,
+            "temperature": temperature
+        }
+        async with self.semaphore:
+            response = await self.post(data)
+            async with response:
+                response_json = await response.json(content_type=None)
+        call_stats.get()["usage"] = response_json.get("usage")
+        return response_json
+
+    async def stream_chat(self, messages: List[Dict], model: str, max_completion_tokens: int,
+                          temperature: float = 0.7) -> AsyncIterator[str]:
+        """send a streaming chat completion request and yield content deltas as they arrive
+
+        retries only happen before the first byte of the stream; raises GroqError
+        if the api answers with an error
+        """
+        data = {
+            "model": model,
+            "messages": messages,
+            "max_completion_tokens": max_completion_tokens,
+            "temperature": temperature,
+            "stream": True
+        }
+        async with self.semaphore:
+            response = await self.post(data)
+            stats = call_stats.get()
+            async with response:
+                if response.status != 200:
+                    raise GroqError(f"HTTP {response.status}: {(await response.text())[:500]}")
+                async for raw in response.content:
+                    line = raw.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    event = json.loads(payload)
+                    if "error" in event:
+                        raise GroqError(str(event["error"]))
+                    # groq puts the usage block on the last chunk
+                    usage = event.get("usage") or (event.get("x_groq") or {}).get("usage")
+                    if usage:
+                        stats["usage"] = usage
+                    choices = event.get("choices") or []
+                    if choices:
+                        content = (choices[0].get("delta") or {}).get("content")
+                        if content:
+                            yield content
+
+    def last_call_stats(self) -> Dict:
+        """retries and usage of this task's most recent request"""
+        return dict(call_stats.get() or {"retries": 0, "usage": None})
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
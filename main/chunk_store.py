@@ -0,0 +1,90 @@
+import json
+import mmap
+import os
+import threading
+from typing import Dict, Iterator, List
+
+# compact shard format written by data_scraping/process_ced.py:
+#   period_N_chunks.jsonl      one json string (the chunk text) per line
+#   period_N_chunks.meta.json  {"version", "count", "timestamp", "table", "rows", "offsets"}
+# metadata is interned: rows[i] points into table, where per-chunk fields
+# (chunk_id, timestamp) are left as null and filled back in on read
+CHUNK_STORE_VERSION = 1
+TEXT_SUFFIX = ".jsonl"
+META_SUFFIX = ".meta.json"
+
+def meta_file_for(text_file: str) -> str:
+    """path of the metadata/offset index that goes with a .jsonl text file"""
+    return text_file[:-len(TEXT_SUFFIX)] + META_SUFFIX
+
+class ShardStore:
+    """one shard (period or exam info) of compact chunks, loaded on first access
+
+    nothing is read until a chunk from this shard is actually needed; then the
+    small metadata file is parsed and the text file is memory-mapped so only
+    the lines that get touched are paged in
+    """
+    def __init__(self, text_file: str):
+        self.text_file = text_file
+        self.meta_file = meta_file_for(text_file)
+        self.meta = None
+        self.text_map = None
+        self.lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.meta is not None
+
+    def load(self):
+        """read the metadata table and map the text file (once)"""
+        with self.lock:
+            if self.meta is not None:
+                return
+            with open(self.meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get("version") != CHUNK_STORE_VERSION:
+                raise ValueError(f"unsupported chunk store version in {self.meta_file}")
+            with open(self.text_file, 'rb') as f:
+                self.text_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if meta["count"] else b""
+            self.meta = meta
+
+    def __len__(self):
+        self.load()
+        return self.meta["count"]
+
+    def text(self, i: int) -> str:
+        self.load()
+        offsets = self.meta["offsets"]
+        return json.loads(self.text_map[offsets[i]:offsets[i + 1]])
+
+    def metadata(self, i: int) -> Dict:
+        self.load()
+        metadata = dict(self.meta["table"][self.meta["rows"][i]])
+        if "chunk_id" in metadata:
+            metadata["chunk_id"] = i
+        if "timestamp" in metadata:
+            metadata["timestamp"] = self.meta["timestamp"]
+        return metadata
+
+    def chunk(self, i: int) -> Dict:
+        return {"text": self.text(i), "metadata": self.metadata(i)}
+
+    def __iter__(self) -> Iterator[Dict]:
+        """stream every chunk in order (used when building the index)"""
+        self.load()
+        with open(self.text_file, 'r', encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                yield {"text": json.loads(line), "metadata": self.metadata(i)}
+
+    def files(self) -> List[str]:
+        return [self.text_file, self.meta_file]
+
+    def close(self):
+        with self.lock:
+            if isinstance(self.text_map, mmap.mmap):
+                self.text_map.close()
+            self.text_map = None
+            self.meta = None
+
+def is_compact(path: str) -> bool:
+    return path.endswith(TEXT_SUFFIX) and os.path.exists(meta_file_for(path))
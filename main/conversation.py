@@ -0,0 +1,101 @@
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+from tokens import estimate_tokens
+
+# tokens the conversation history may take in a request (llama3 has an 8192 token
+# window, which also has to fit the system prompts, memory and the 1000 token answer)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+# question/answer pairs always kept word for word
+KEEP_RECENT_TURNS = int(os.environ.get("CONTEXT_RECENT_TURNS", "3"))
+# tokens the running summary of older turns may grow to
+SUMMARY_TOKEN_LIMIT = 400
+# per-message framing tokens (role, separators)
+MESSAGE_OVERHEAD = 4
+
+def message_tokens(messages: List[Dict]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+def format_turns(messages: List[Dict]) -> str:
+    return "\n".join(f"{'Student' if m['role'] == 'user' else 'Tutor'}: {m['content']}" for m in messages)
+
+class ConversationContext:
+    """follow-up history that stays within a token budget
+
+    the newest turns are kept verbatim; older ones are folded into a running
+    summary on a background thread (while the student reads the answer and
+    types the next question), so each request costs about the same
+    """
+    def __init__(self, summarize: Callable[[str, str], Optional[str]], token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 keep_recent: int = KEEP_RECENT_TURNS):
+        self.summarize = summarize  # (summary so far, older turns) -> new summary
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.turns = []
+        self.lock = threading.Lock()
+        self.fold_thread = None
+
+    def summary_message(self) -> List[Dict]:
+        if not self.summary:
+            return []
+        return [{"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"}]
+
+    def fold_count(self) -> int:
+        """how many of the oldest messages have to move into the summary"""
+        count = 0
+        summary_tokens = message_tokens(self.summary_message()) or SUMMARY_TOKEN_LIMIT
+        while len(self.turns) - count > 2:
+            recent = self.turns[count:]
+            if len(recent) <= 2 * self.keep_recent and summary_tokens + message_tokens(recent) <= self.token_budget:
+                break
+            count += 2
+        return count
+
+    def add_turn(self, question: str, response: str):
+        """record a question/answer pair and start folding old turns if over budget"""
+        self.wait()
+        with self.lock:
+            self.turns.append({"role": "user", "content": question})
+            self.turns.append({"role": "assistant", "content": response})
+            count = self.fold_count()
+            if not count:
+                return
+            folded = self.turns[:count]
+        self.fold_thread = threading.Thread(target=self.fold, args=(folded,), name="context-fold", daemon=True)
+        self.fold_thread.start()
+
+    def fold(self, folded: List[Dict]):
+        text = format_turns(folded)
+        summary = None
+        try:
+            summary = self.summarize(self.summary, text)
+        except Exception as e:
+            print(f"Error summarizing conversation: {str(e)}")
+        if not summary:
+            # no llm summary: keep the start of each older question instead
+            lines = [self.summary] if self.summary else []
+            lines += [f"Student asked: {m['content'][:200]}" for m in folded if m["role"] == "user"]
+            summary = "\n".join(lines)
+        # never let the summary itself outgrow its share of the budget
+        max_chars = SUMMARY_TOKEN_LIMIT * 4
+        if len(summary) > max_chars:
+            summary = summary[-max_chars:]
+        with self.lock:
+            self.summary = summary
+            self.turns = self.turns[len(folded):]
+
+    def wait(self):
+        """wait for a fold in progress (normally finished before the next question)"""
+        if self.fold_thread is not None:
+            self.fold_thread.join()
+            self.fold_thread = None
+
+    def messages(self) -> List[Dict]:
+        """summary (if any) + recent turns, ready to send"""
+        self.wait()
+        with self.lock:
+            return self.summary_message() + list(self.turns)
+
+    def tokens(self) -> int:
+        return message_tokens(self.messages())
@@ -0,0 +1,182 @@
+import re
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from rag_index import write_snapshot, read_snapshot, sources_unchanged
+
+# dense vectors are signed feature hashes of character n-grams, which is a
+# sparse random projection of the n-gram count vector down to DENSE_DIM dims
+# (experimental: a lexical stand-in for a learned embedding, see RETRIEVAL_MODES in rag_utils.py)
+DENSE_DIM = 256  # must be a power of two
+NGRAM_SIZES = (3, 4, 5)
+HASHES_PER_NGRAM = 2  # each n-gram lands in this many (bucket, sign) slots
+
+DENSE_SNAPSHOT_FILE = "dense_index.bin"
+DENSE_SNAPSHOT_VERSION = 1
+
+# ivf params: ~sqrt(n) clusters, and a query only scans the nprobe closest ones
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50_000
+DEFAULT_NPROBE = 8
+
+# rolling hash / mixing constants (fixed so vectors are stable across processes)
+HASH_BASE = np.uint64(1099511628211)
+MIX_CONSTANTS = [np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F)]
+
+NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+# texts are embedded in blocks so the hashing runs as a few large numpy ops
+EMBED_BLOCK = 1024
+
+def ngram_hashes(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """stable 64-bit hashes of every character n-gram in the normalized texts
+
+    returns (hashes, row) where row says which text each n-gram came from
+    """
+    normalized = [" " + NON_WORD_RE.sub(" ", text.lower()).strip() + " " for text in texts]
+    encoded = [t.encode('ascii', 'ignore') for t in normalized]
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    row_of_pos = np.repeat(np.arange(len(encoded)), [len(b) for b in encoded])
+
+    hashes, rows = [], []
+    # polynomial hash of every window (wraps mod 2^64); the n-gram hashes are
+    # extended one character at a time from the (n - 1)-gram hashes
+    h = data.copy()
+    for n in range(2, max(NGRAM_SIZES) + 1):
+        windows = len(data) - n + 1
+        if windows <= 0:
+            break
+        h = h[:windows] * HASH_BASE + data[n - 1:]
+        if n not in NGRAM_SIZES:
+            continue
+        # drop windows that straddle two texts
+        inside = row_of_pos[:windows] == row_of_pos[n - 1:]
+        hashes.append(h[inside] + np.uint64(n))
+        rows.append(row_of_pos[:windows][inside])
+    if not hashes:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    return np.concatenate(hashes), np.concatenate(rows)
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """embed texts as l2-normalized float32 rows of a contiguous (n, DENSE_DIM) matrix"""
+    bits = DENSE_DIM.bit_length() - 1
+    vectors = np.zeros((len(texts), DENSE_DIM), dtype=np.float32)
+    with np.errstate(over='ignore'):
+        for start in range(0, len(texts), EMBED_BLOCK):
+            block = texts[start:start + EMBED_BLOCK]
+            hashes, rows = ngram_hashes(block)
+            counts = np.zeros(len(block) * DENSE_DIM)
+            for mix in MIX_CONSTANTS[:HASHES_PER_NGRAM]:
+                mixed = hashes * mix
+                buckets = (mixed >> np.uint64(64 - bits)).astype(np.int64)
+                signs = np.where((mixed >> np.uint64(31)) & np.uint64(1), 1.0, -1.0)
+                counts += np.bincount(rows * DENSE_DIM + buckets, weights=signs, minlength=len(counts))
+            vectors[start:start + len(block)] = counts.reshape(len(block), DENSE_DIM)
+
+    # dampen repeated n-grams, then normalize so dot product == cosine
+    np.copyto(vectors, np.sign(vectors) * np.sqrt(np.abs(vectors)))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray, block: int = 65536) -> np.ndarray:
+    """closest centroid (by cosine) for every vector, in blocks to bound memory"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        assignments[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+    return assignments
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """spherical k-means on a sample of the vectors"""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = assign_clusters(sample, centroids)
+        # per-cluster sums via one sort + reduceat
+        order = np.argsort(assignments, kind='stable')
+        clusters, starts = np.unique(assignments[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[clusters] = np.add.reduceat(sample[order], starts, axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # keep the old centroid for clusters that went empty
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids).astype(np.float32)
+    return centroids
+
+class DenseIndex:
+    """ivf (cluster-pruned) index over chunk vectors
+
+    vectors are stored grouped by cluster, so each probed cluster is one
+    contiguous slice of the float32 matrix
+    """
+    def __init__(self, arrays: Dict[str, np.ndarray], header: Dict):
+        self.arrays = arrays
+        self.header = header
+        self.vectors = arrays["vectors"]            # (n, DENSE_DIM), grouped by cluster
+        self.ids = arrays["ids"]                    # chunk idx of each row in vectors
+        self.list_offsets = arrays["list_offsets"]  # cluster c is rows list_offsets[c]:list_offsets[c + 1]
+        self.centroids = arrays["centroids"]        # (nlist, DENSE_DIM)
+
+    @classmethod
+    def build(cls, texts: List[str]) -> "DenseIndex":
+        """embed texts (in chunk order) and cluster them"""
+        vectors = embed_texts(texts)
+        nlist = max(1, min(len(vectors), int(np.sqrt(len(vectors)))))
+        if len(vectors):
+            centroids = train_centroids(vectors, nlist)
+            assignments = assign_clusters(vectors, centroids)
+        else:
+            centroids = np.zeros((0, DENSE_DIM), dtype=np.float32)
+            assignments = np.empty(0, dtype=np.int32)
+
+        order = np.argsort(assignments, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=len(centroids)), out=list_offsets[1:])
+
+        arrays = {
+            "vectors": np.ascontiguousarray(vectors[order]),
+            "ids": order,
+            "list_offsets": list_offsets,
+            "centroids": centroids,
+        }
+        header = {"dim": DENSE_DIM, "ngrams": list(NGRAM_SIZES), "hashes": HASHES_PER_NGRAM}
+        return cls(arrays, header)
+
+    def search(self, query: str, top_k: int, nprobe: int = DEFAULT_NPROBE) -> Tuple[np.ndarray, np.ndarray]:
+        """(chunk idxs, cosine scores) of the best matches among the nprobe closest clusters"""
+        if not len(self.centroids):
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        query_vector = embed_texts([query])[0]
+
+        nprobe = min(nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query_vector
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        rows = np.concatenate([np.arange(self.list_offsets[c], self.list_offsets[c + 1]) for c in probe])
+        scores = self.vectors[rows] @ query_vector
+        k = min(top_k, len(rows))
+        if not k:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return self.ids[rows[top]], scores[top]
+
+    def save(self, path: str, sources: Dict[str, Dict]):
+        """write the dense index to a snapshot file"""
+        write_snapshot(path, dict(self.header, version=DENSE_SNAPSHOT_VERSION, sources=sources), self.arrays)
+
+    @classmethod
+    def load(cls, path: str, source_paths: List[str]) -> Optional["DenseIndex"]:
+        """memory-map a dense snapshot if it matches the current config and source files"""
+        snapshot = read_snapshot(path)
+        if snapshot is None:
+            return None
+        header, arrays = snapshot
+        if (header.get("version") != DENSE_SNAPSHOT_VERSION or header.get("dim") != DENSE_DIM
+                or header.get("ngrams") != list(NGRAM_SIZES) or header.get("hashes") != HASHES_PER_NGRAM):
+            return None
+        if not sources_unchanged(header.get("sources", {}), source_paths):
+            return None
+        return cls(arrays, header)
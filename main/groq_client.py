@@ -0,0 +1,162 @@
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+# groq api setup (url can be pointed at a local stub server for testing)
+GROQ_API_URL = os.environ.get("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+
+# seconds to wait for the connection / for each read of the response
+CONNECT_TIMEOUT = float(os.environ.get("GROQ_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("GROQ_READ_TIMEOUT", "60"))
+
+# retries after the first attempt, with jittered exponential backoff between them
+MAX_RETRIES = int(os.environ.get("GROQ_MAX_RETRIES", "3"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+# never sleep longer than this even if the server asks for it
+RETRY_AFTER_MAX = 60.0
+
+# keep-alive connections kept open to the api host
+POOL_SIZE = 8
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class GroqError(Exception):
+    """the api returned an error instead of a completion"""
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """seconds the server asked us to wait (Retry-After as seconds or an http date)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class GroqClient:
+    """chat completions client that reuses pooled keep-alive connections
+
+    timeouts, connection errors and retryable statuses (429 / 5xx) are retried
+    with full-jitter exponential backoff, honoring Retry-After when it is sent
+    """
+    def __init__(self, api_key: str = None, api_url: str = None, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, max_retries: int = MAX_RETRIES, pool_size: int = POOL_SIZE):
+        self.api_key = api_key if api_key is not None else os.environ.get("GROQ_API_KEY")
+        self.api_url = api_url or GROQ_API_URL
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        # retries and token usage of the calling thread's last request
+        self.local = threading.local()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        })
+
+    def backoff_delay(self, attempt: int, response: requests.Response = None) -> float:
+        """how long to sleep before retry number attempt + 1"""
+        if response is not None:
+            retry_after = retry_after_seconds(response)
+            if retry_after is not None:
+                return min(retry_after, RETRY_AFTER_MAX)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def post(self, data: Dict, **kwargs) -> requests.Response:
+        """post to the api, retrying transient failures
+
+        returns the last response (which may still be an error status);
+        raises the last exception if every attempt failed to get a response
+        """
+        self.local.usage = None
+        for attempt in range(self.max_retries + 1):
+            self.local.retries = attempt
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.post(self.api_url, json=data, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt:
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"Groq request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRYABLE_STATUS or last_attempt:
+                return response
+            delay = self.backoff_delay(attempt, response)
+            print(f"Groq returned {response.status_code}, retrying in {delay:.1f}s")
+            response.close()
+            time.sleep(delay)
+
+    def chat(self, messages: List[Dict], model: str, max_completion_tokens: int, temperature: float = 0.7) -> Dict:
+        """send a chat completion request and return the parsed json response"""
+        data = {
+            "model": model,
+            "messages": messages,
+            "max_completion_tokens": max_completion_tokens,
+            "temperature": temperature
+        }
+        response_json = self.post(data).json()
+        self.local.usage = response_json.get("usage")
+        return response_json
+
+    def stream_chat(self, messages: List[Dict], model: str, max_completion_tokens: int,
+                    temperature: float = 0.7) -> Iterator[str]:
+        """send a streaming chat completion request and yield content deltas as they arrive
+
+        retries only happen before the first byte of the stream; raises GroqError
+        if the api answers with an error
+        """
+        data = {
+            "model": model,
+            "messages": messages,
+            "max_completion_tokens": max_completion_tokens,
+            "temperature": temperature,
+            "stream": True
+        }
+        response = self.post(data, stream=True)
+        with response:
+            if response.status_code != 200:
+                raise GroqError(f"HTTP {response.status_code}: {response.text[:500]}")
+            # server-sent events are utf-8; chunk_size=None hands lines over as soon as they arrive
+            response.encoding = "utf-8"
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                event = json.loads(payload)
+                if "error" in event:
+                    raise GroqError(str(event["error"]))
+                # groq puts the usage block on the last chunk
+                usage = event.get("usage") or (event.get("x_groq") or {}).get("usage")
+                if usage:
+                    self.local.usage = usage
+                choices = event.get("choices") or []
+                if choices:
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        yield content
+
+    def last_call_stats(self) -> Dict:
+        """retries and usage of this thread's most recent request"""
+        return {"retries": getattr(self.local, "retries", 0), "usage": getattr(self.local, "usage", None)}
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,168 @@
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from rate_limiter import priority_of, INTERACTIVE
+
+# one json line per llm call, only written when LLM_METRICS_FILE names a file (it is never rotated),
+# and where the prometheus text goes
+METRICS_LOG_FILE = os.environ.get("LLM_METRICS_FILE", "")
+PROMETHEUS_FILE = os.environ.get("LLM_PROMETHEUS_FILE", "llm_metrics.prom")
+
+# what gets printed per call: 0 = nothing, 1 = one summary line for interactive calls,
+# 2 = a line for every call plus the messages of interactive ones. background calls
+# never print more than their line, so they dont scroll over the student's input() prompt
+VERBOSITY = int(os.environ.get("LLM_LOG_VERBOSITY", "1"))
+
+# histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0]
+
+COUNTERS = ["calls", "errors", "cache_hits", "shed", "retries", "prompt_tokens", "completion_tokens"]
+
+class Histogram:
+    """cumulative-bucket histogram in the prometheus layout"""
+    def __init__(self, bounds: List[float] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        running, out = 0, []
+        for c in self.counts:
+            running += c
+            out.append(running)
+        return out
+
+    def quantile(self, q: float) -> Optional[float]:
+        """bucket upper bound that covers the q quantile (None if empty)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, cumulative in zip(self.bounds + [float("inf")], self.cumulative()):
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+class LLMMetrics:
+    """per (purpose, model) counters and latency histograms for llm calls"""
+    def __init__(self, log_file: str = METRICS_LOG_FILE, verbosity: int = VERBOSITY):
+        self.log_file = log_file
+        self.verbosity = verbosity
+        self.lock = threading.Lock()
+        self.series = {}  # (purpose, model) -> {"counters", "latency", "ttft"}
+
+    def get_series(self, purpose: str, model: str) -> Dict:
+        key = (purpose, model)
+        if key not in self.series:
+            self.series[key] = {"counters": dict.fromkeys(COUNTERS, 0), "latency": Histogram(), "ttft": Histogram()}
+        return self.series[key]
+
+    def record_call(self, purpose: str, model: str, latency: float = None, ttft: float = None,
+                    usage: Dict = None, error: str = None, cached: bool = False, shed: bool = False, retries: int = 0):
+        """record one query_groq call (an api call, a cache hit or a shed call)"""
+        usage = usage or {}
+        with self.lock:
+            series = self.get_series(purpose, model)
+            counters = series["counters"]
+            counters["calls"] += 1
+            counters["errors"] += 1 if error else 0
+            counters["cache_hits"] += 1 if cached else 0
+            counters["shed"] += 1 if shed else 0
+            counters["retries"] += retries
+            counters["prompt_tokens"] += usage.get("prompt_tokens") or 0
+            counters["completion_tokens"] += usage.get("completion_tokens") or 0
+            if latency is not None and not cached:
+                series["latency"].observe(latency)
+                series["ttft"].observe(ttft if ttft is not None else latency)
+
+            record = {
+                "time": time.time(),
+                "purpose": purpose,
+                "model": model,
+                "latency": latency,
+                "ttft": ttft,
+                "prompt_tokens": usage.get("prompt_tokens"),
+                "completion_tokens": usage.get("completion_tokens"),
+                "cached": cached,
+                "shed": shed,
+                "retries": retries,
+                "error": error,
+            }
+            if self.log_file:
+                with open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + "\n")
+
+        if self.verbosity >= 2 or (self.verbosity >= 1 and priority_of(purpose) == INTERACTIVE):
+            print(self.format_record(record))
+
+    def format_record(self, record: Dict) -> str:
+        if record["cached"]:
+            outcome = "cache hit"
+        elif record["shed"]:
+            outcome = "shed (rate limit)"
+        elif record["error"]:
+            outcome = f"error: {record['error']}"
+        else:
+            outcome = f"{record['latency']:.2f}s"
+            if record["ttft"] is not None:
+                outcome += f" (first token {record['ttft']:.2f}s)"
+            if record["prompt_tokens"] is not None:
+                outcome += f", {record['prompt_tokens']}+{record['completion_tokens']} tokens"
+        if record["retries"]:
+            outcome += f", {record['retries']} retries"
+        return f"[LLM {record['purpose']} / {record['model']}] {outcome}"
+
+    def prometheus_text(self) -> str:
+        """all series in the prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            items = sorted(self.series.items())
+            for counter in COUNTERS:
+                name = f"llm_{counter}_total"
+                lines.append(f"# TYPE {name} counter")
+                for (purpose, model), series in items:
+                    lines.append(f'{name}{{purpose="{escape_label(purpose)}",model="{escape_label(model)}"}} {series["counters"][counter]}')
+            for hist in ("latency", "ttft"):
+                name = f"llm_{hist}_seconds"
+                lines.append(f"# TYPE {name} histogram")
+                for (purpose, model), series in items:
+                    labels = f'purpose="{escape_label(purpose)}",model="{escape_label(model)}"'
+                    histogram = series[hist]
+                    for bound, cumulative in zip(histogram.bounds + ["+Inf"], histogram.cumulative()):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str = PROMETHEUS_FILE):
+        if not path:
+            return
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(path + ".tmp", path)
+
+    def summary(self) -> List[Dict]:
+        """one row per (purpose, model), busiest first"""
+        with self.lock:
+            rows = []
+            for (purpose, model), series in self.series.items():
+                latency = series["latency"]
+                rows.append(dict(
+                    series["counters"],
+                    purpose=purpose,
+                    model=model,
+                    mean_latency=latency.total / latency.count if latency.count else None,
+                    p95_latency=latency.quantile(0.95),
+                ))
+        return sorted(rows, key=lambda r: -(r["prompt_tokens"] + r["completion_tokens"]))
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
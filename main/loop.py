@@ -1,36 +1,115 @@
-import os
-import json
-import requests
 import time
-from tqdm import tqdm
-from collections import Counter, deque
+
+# taken before the heavier imports so time-to-first-prompt covers them
+STARTUP_BEGIN = time.perf_counter()
+
+import os
+import argparse
 from datetime import datetime
-from rag_utils import RAGSystem
+from concurrent.futures import ThreadPoolExecutor
+from rag_utils import RAGSystem, BackgroundRAGSystem
+from groq_client import GroqClient, GroqError
+from memory_worker import MemoryWorker
+from memory_log import period_of
+from student_memory import StudentMemory
+from tokens import request_tokens
+from conversation import ConversationContext, SUMMARY_TOKEN_LIMIT
+from response_cache import ResponseCache, cache_key
+from rate_limiter import RateScheduler, priority_of, INTERACTIVE
+from llm_metrics import LLMMetrics
+from stage_profiler import StageProfiler
+from question_bank import QuestionBank, QuestionPrefetcher, QUESTION_BATCH_SIZE, parse_question_batch, format_question
+from tutor_prompts import (AP_PERIODS, CHAT_MODEL, TASK_MODEL, chat_messages, question_messages, hint_messages,
+                           feedback_messages, skipped_note, answered_note, pattern_messages, practice_pattern_messages,
+                           memory_summary_messages, conversation_summary_messages)
 
-# groq api setup
-GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-MEMORY_FILE = "memory.txt"
+# groq api setup (url, timeouts and retries come from the environment, see groq_client.py)
+groq_client = GroqClient()
+# repeated prompts for opted-in purposes are answered from disk (see response_cache.py)
+response_cache = ResponseCache()
+# shared groq quota: interactive purposes go first, background analysis is deferred/shed near the limit
+rate_scheduler = RateScheduler()
+MEMORY_FILE = "memory.txt"  # old single-file memory, imported into the log on first run
+# memory log + local search + consolidation + cached summaries in the working directory (see student_memory.py)
+student_memory = StudentMemory(lambda label, memory: summarize_memory(label, memory))
+memory_log = student_memory.log
+memory_search = student_memory.search
+memory_consolidator = student_memory.consolidator
+memory_summaries = student_memory.summaries
 
+# print the main chat response token by token as it streams in (GROQ_STREAM=0 to turn off)
+STREAM_RESPONSES = os.environ.get("GROQ_STREAM", "1") != "0"
 
-rag_system = RAGSystem()
-    
+# latency / token / cache / error metrics per purpose and model (LLM_LOG_VERBOSITY sets what gets printed)
+llm_metrics = LLMMetrics()
+
+# opt-in per-turn stage timings (STAGE_PROFILE=1 or --profile, see stage_profiler.py)
+stage_profiler = StageProfiler()
 
-# all the apush periods
-AP_PERIODS = [
-    "Period 1 (1491-1607): Native American Societies and European Exploration",
-    "Period 2 (1607-1754): Colonial America",
-    "Period 3 (1754-1800): The American Revolution",
-    "Period 4 (1800-1848): Early Republic and Expansion",
-    "Period 5 (1844-1877): Civil War and Reconstruction",
-    "Period 6 (1865-1898): Industrialization and Gilded Age",
-    "Period 7 (1890-1945): Progressive Era and World Wars",
-    "Period 8 (1945-1980): Cold War and Civil Rights",
-    "Period 9 (1980-Present): Modern America"
-]
+
+# the retrieval index loads on a background thread so the prompt shows up right away
+# (RAG_DATA_DIR points it at the processed ced chunks, RAG_ENABLED=0 turns grounding off)
+RAG_ENABLED = os.environ.get("RAG_ENABLED", "1") != "0"
+rag_loader = BackgroundRAGSystem(**({"base_dir": os.environ["RAG_DATA_DIR"]} if os.environ.get("RAG_DATA_DIR") else {}))
+
+# retrieval and the memory lookup for a turn run side by side
+turn_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="turn")
+
+# startup timings in seconds (time_to_prompt, rag_load)
+startup_metrics = {}
+
+def get_rag_system() -> RAGSystem:
+    """get the rag system, waiting only if the background load hasnt finished"""
+    system = rag_loader.get()
+    startup_metrics.setdefault("rag_load", rag_loader.load_time)
+    return system
+
+def show_startup_metrics():
+    """show startup timings"""
+    print("\nStartup timings:")
+    print(f"- Time to first prompt: {startup_metrics.get('time_to_prompt', 0):.3f}s")
+    if rag_loader.ready:
+        print(f"- Retrieval index load: {rag_loader.load_time:.3f}s")
+    else:
+        print("- Retrieval index load: still loading")
+
+def get_rag_context(query: str) -> str:
+    """ced context for a query, packed into the rag token budget"""
+    if not RAG_ENABLED:
+        return ""
+    try:
+        return get_rag_system().get_context(query)
+    except Exception as e:
+        print(f"Error retrieving context: {str(e)}")
+        return ""
+
+def show_llm_metrics():
+    """show per-purpose llm call metrics and export them for prometheus"""
+    print("\nLLM calls by purpose:")
+    rows = llm_metrics.summary()
+    if not rows:
+        print("- No calls yet")
+    for row in rows:
+        latency = f"{row['mean_latency']:.2f}s mean, p95 <= {row['p95_latency']}s" if row["mean_latency"] is not None else "no api calls"
+        print(f"- {row['purpose']} ({row['model']}): {row['calls']} calls, {latency}, "
+              f"{row['prompt_tokens']}+{row['completion_tokens']} tokens, {row['cache_hits']} cached, "
+              f"{row['errors']} errors, {row['retries']} retries, {row['shed']} shed")
+    llm_metrics.write_prometheus()
+
+def show_cache_stats():
+    """show llm response cache hits and misses"""
+    print("\nLLM response cache:")
+    stats = response_cache.stats()
+    if not stats:
+        print("- No cacheable calls yet")
+    for purpose, counts in stats.items():
+        print(f"- {purpose}: {counts['hits']} hits, {counts['misses']} misses")
+    
 
 def log_llm_call(purpose: str, model: str, messages: list):
     """log info about llm api calls"""
+    if llm_metrics.verbosity < 2 or priority_of(purpose) != INTERACTIVE:
+        return
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"\n[LLM Call at {timestamp}]")
     print(f"Purpose: {purpose}")
@@ -42,158 +121,154 @@ def log_llm_call(purpose: str, model: str, messages: list):
         print(f"- {role}: {content}")
     print("-" * 80)
 
-def load_memory(file_path=MEMORY_FILE):
-    """load existing memory from file"""
-    if os.path.exists(file_path):
+def migrate_memory_file(file_path=MEMORY_FILE):
+    """import the old memory.txt into the memory log (once, before the log exists)"""
+    if os.path.exists(file_path) and not os.path.exists(memory_log.directory):
         with open(file_path, 'r') as f:
-            return f.read().strip()
-    return ""
+            memory_log.import_text(f.read())
+
+def load_memory():
+    """load every memory entry as text"""
+    with stage_profiler.span("load_memory", local=True):
+        return student_memory.text()
 
-def save_memory(memory_content, file_path=MEMORY_FILE):
-    """save memory to file"""
-    with open(file_path, 'w') as f:
-        f.write(memory_content)
+def save_memory(pattern, period=None):
+    """add one learning pattern to memory (merged into a near-duplicate if there is one)"""
+    # also rebuilds the summaries this entry changed, so the next turn finds them fresh
+    with stage_profiler.span("save_memory"):
+        student_memory.save(pattern, period=period)
 
-def query_groq(messages, model="llama3-8b-8192", max_completion_tokens=1000, purpose="Unknown"):
+def query_groq(messages, model=TASK_MODEL, max_completion_tokens=1000, purpose="Unknown"):
     """helper function to call groq api"""
     # log the llm call
 
     log_llm_call(purpose, model, messages)
    
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    data = {
-        "model": model,
-        "messages": messages,
-        "max_completion_tokens": max_completion_tokens,
-        "temperature": 0.7
-    }
-
+    key = cache_key(model, messages, {"max_completion_tokens": max_completion_tokens, "temperature": 0.7})
+    cached = response_cache.get(purpose, key)
+    if cached is not None:
+        llm_metrics.record_call(purpose, model, cached=True)
+        return cached
+   
+    estimated_tokens = request_tokens(messages, max_completion_tokens)
+    if not rate_scheduler.acquire(purpose, estimated_tokens):
+        llm_metrics.record_call(purpose, model, shed=True)
+        return None
+   
+    start = time.perf_counter()
+    error = None
     try:
-        response = requests.post(GROQ_API_URL, json=data, headers=headers)
-        response_json = response.json()
+        response_json = groq_client.chat(messages, model, max_completion_tokens)
+        rate_scheduler.settle(purpose, estimated_tokens, (response_json.get("usage") or {}).get("total_tokens"))
         
         if "error" in response_json:
+            error = str(response_json["error"])
             print(f"API Error: {response_json['error']}")
             return None
         if "choices" not in response_json or not response_json["choices"]:
+            error = "unexpected response"
             print(f"Unexpected API response: {response_json}")
             return None
             
-        return response_json["choices"][0]["message"]["content"].strip()
+        response = response_json["choices"][0]["message"]["content"].strip()
+        response_cache.put(purpose, key, response)
+        return response
     except Exception as e:
+        error = str(e)
         print(f"Error processing response: {e}")
         return None
+    finally:
+        # without streaming the first token shows up with the last one
+        call_stats = groq_client.last_call_stats()
+        llm_metrics.record_call(purpose, model, latency=time.perf_counter() - start, usage=call_stats["usage"],
+                                error=error, retries=call_stats["retries"])
 
-def generate_ap_question(period, topic=None, question_type="multiple_choice"):
-    """generate an apush practice question"""
-    topic_context = f" focusing on {topic}" if topic else ""
-    prompt = f"""
-    Generate an AP US History practice question for {period}{topic_context}
-    
-    Question type: {question_type}
-    
-    For multiple choice questions, include:
-    1. The question
-    2. Four possible answer options (A, B, C, D)
-    3. The correct answer
-    4. Brief explanation (2-3 sentences)
-    5. Key historical context (1-2 sentences)
-    6. AP exam relevance (1 sentence)
-    
-    Format the response as:
-    QUESTION:
-    [question text]
-    
-    OPTIONS:
-    A) [first option]
-    B) [second option]
-    C) [third option]
-    D) [fourth option]
-    
-    ANSWER:
-    [correct answer letter]
-    
-    EXPLANATION:
-    [brief explanation]
-    
-    HISTORICAL CONTEXT:
-    [key context]
-    
-    AP RELEVANCE:
-    [exam relevance]
+def query_groq_stream(messages, model=CHAT_MODEL, max_completion_tokens=1000, purpose="Unknown", on_token=None):
+    """helper function to call groq api with streaming, passing each token to on_token
+
+    returns the full response text (or None on error)
     """
+    log_llm_call(purpose, model, messages)
     
-    messages = [
-        {"role": "system", "content": "You are an AP US History expert creating exam-style questions"},
-        {"role": "user", "content": prompt}
-    ]
+    estimated_tokens = request_tokens(messages, max_completion_tokens)
+    if not rate_scheduler.acquire(purpose, estimated_tokens):
+        llm_metrics.record_call(purpose, model, shed=True)
+        return None
     
-    return query_groq(messages, model="llama3-8b-8192", max_completion_tokens=500, purpose="Generate AP question")
+    pieces = []
+    ttft = None
+    error = None
+    start = time.perf_counter()
+    try:
+        for token in groq_client.stream_chat(messages, model, max_completion_tokens):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            pieces.append(token)
+            if on_token:
+                on_token(token)
+    except GroqError as e:
+        error = str(e)
+        print(f"API Error: {e}")
+        return None
+    except Exception as e:
+        error = str(e)
+        print(f"Error processing response: {e}")
+        return None
+    finally:
+        call_stats = groq_client.last_call_stats()
+        # usage comes on the stream's last chunk (none if it broke off early)
+        rate_scheduler.settle(purpose, estimated_tokens, (call_stats["usage"] or {}).get("total_tokens"))
+        if on_token:
+            print()  # end the streamed line (before the metrics line, if any)
+        llm_metrics.record_call(purpose, model, latency=time.perf_counter() - start, ttft=ttft,
+                                usage=call_stats["usage"], error=error, retries=call_stats["retries"])
+    
+    response = "".join(pieces).strip()
+    return response or None
+
+def print_token(token: str):
+    print(token, end="", flush=True)
+
+def generate_ap_questions(period, topic=None, count=QUESTION_BATCH_SIZE, question_type="multiple_choice",
+                          purpose="Generate AP questions"):
+    """generate a batch of apush practice questions, returning the ones that parse and validate"""
+    messages = question_messages(period, topic, count, question_type)
+    response = query_groq(messages, model=TASK_MODEL, max_completion_tokens=500 * count, purpose=purpose)
+    return parse_question_batch(response)
+
+def prefetch_ap_questions(period, topic, count):
+    """background question generation (lowest priority for the rate limiter)"""
+    return generate_ap_questions(period, topic, count, purpose="Prefetch AP questions")
+
+def next_practice_question(period, topic=None):
+    """serve a question from the bank, generating a batch only if the bank has none ready"""
+    question = question_bank.pop(period, topic)
+    if question is None:
+        questions = generate_ap_questions(period, topic)
+        if not questions:
+            return None
+        question, rest = questions[0], questions[1:]
+        question_bank.add(period, topic, rest)
+    # top the slot back up in the background for next time
+    question_prefetcher.request(period, topic)
+    return question
 
 def save_practice_problem(problem: str, period: str):
-    """save practice problem to memory"""
-    current_memory = load_memory()
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # get key info from problem
-    parts = problem.split('\n\n')
-    question_text = ""
-    correct_answer = ""
-    
-    for part in parts:
-        if part.startswith("QUESTION:"):
-            question_text = part.replace("QUESTION:", "").strip()
-        elif part.startswith("ANSWER:"):
-            correct_answer = part.replace("ANSWER:", "").strip()
-    
-    # check for learning patterns
-    pattern_prompt = f"""
-    Question: {question_text}
-Period: {period}
-    Correct Answer: {correct_answer}
-    
-    Identify if this practice question reveals any learning patterns or difficulties
-    If yes, format as: "User has shown difficulty with: [specific concept/pattern]"
-    If no clear pattern, return empty string
-    """
-    
-    messages = [
-        {"role": "system", "content": "You are an AP US History expert identifying learning patterns"},
-        {"role": "user", "content": pattern_prompt}
-    ]
-    
-    pattern = query_groq(messages, model="llama3-8b-8192", max_completion_tokens=150, purpose="Analyze practice problem pattern")
+    """save practice problem to memory (in the background)"""
+    memory_worker.submit("save_practice_problem", problem, period)
+
+@stage_profiler.stage("save_practice_problem")
+def save_practice_problem_now(problem: str, period: str):
+    """analyze a practice problem and save any pattern to memory"""
+    messages = practice_pattern_messages(problem, period)
+    pattern = query_groq(messages, model=TASK_MODEL, max_completion_tokens=150, purpose="Analyze practice problem pattern")
     if pattern:
-        new_entry = f"\n[{timestamp}] {pattern}"
-        updated_memory = current_memory + new_entry
-        save_memory(updated_memory)
-
-def get_relevant_practice_problems(period: str) -> str:
-    """get relevant practice problems for current period"""
-    memory = load_memory()
-    if not memory:
-        return ""
+        save_memory(pattern, period=period_of(period))
     
-    relevance_prompt = f"""
-    Current period: {period}
-    
-    Past practice problems and interactions:
-    {memory}
-    
-    Based on the current period, which previous practice problems and learning patterns are most relevant?
-    Provide a concise summary of relevant problems and learning patterns
-    """
-    
-    messages = [
-        {"role": "system", "content": "You are an AP US History expert identifying relevant practice problems and learning patterns"},
-        {"role": "user", "content": relevance_prompt}
-    ]
-    
-    return query_groq(messages, model="llama3-8b-8192", max_completion_tokens=150, purpose="Get relevant practice problems")
+def summarize_memory(label: str, memory: str) -> str:
+    """summarize one slice (a period or a concept) of memory"""
+    messages = memory_summary_messages(label, memory)
+    return query_groq(messages, model=TASK_MODEL, max_completion_tokens=150, purpose="Summarize memory")
 
 def show_periods():
     """show all apush periods"""
@@ -216,6 +291,7 @@ def practice_mode():
             break
         elif period_choice.lower() == 'problems':
             print("\nAll Practice Problems:")
+            memory_worker.flush()
             print(load_memory())
             continue
         
@@ -230,6 +306,11 @@ def practice_mode():
             print("Please enter a valid number.")
             continue
         
+        # general questions for this period (and the next, which students tend to move on to)
+        # get ready while the student picks a topic
+        for ap_period in AP_PERIODS[period_index:period_index + 2]:
+            question_prefetcher.request(ap_period)
+        
         # get topic from student
         print(f"\nYou've selected {period}")
         print("What specific topic would you like to practice?")
@@ -244,30 +325,17 @@ def practice_mode():
         
         selected_topic = input("\nEnter your topic (or press Enter for a general question): ").strip()
         
-        # generate new question
-        full_question = generate_ap_question(period, selected_topic)
-        if not full_question:
+        # get the next question (usually already in the bank)
+        with stage_profiler.span("practice_question"):
+            question = next_practice_question(period, selected_topic)
+        if not question:
             print("Sorry, I couldn't generate a practice question. Please try again.")
             continue
         
-        # split question into parts
-        parts = full_question.split('\n\n')
-        question_text = ""
-        solution = ""
-        options = []
-        correct_answer = ""
-        
-        for part in parts:
-            if part.startswith("QUESTION:"):
-                question_text = part.replace("QUESTION:", "").strip()
-            elif part.startswith("OPTIONS:"):
-                options_text = part.replace("OPTIONS:", "").strip()
-                options = [opt.strip() for opt in options_text.split('\n') if opt.strip()]
-            elif part.startswith("ANSWER:"):
-                correct_answer = part.replace("ANSWER:", "").strip()
-                solution += part + "\n\n"
-            elif part.startswith("EXPLANATION:") or part.startswith("HISTORICAL CONTEXT:") or part.startswith("AP RELEVANCE:"):
-                solution += part + "\n\n"
+        full_question = format_question(question)
+        question_text = question["question"]
+        options = question["options"]
+        correct_answer = question["answer"]
         
         # show question and options
         print("\nHere's your AP US History practice question:")
@@ -278,34 +346,20 @@ def practice_mode():
                 print(opt)
         
         # get user's answer
+        selected_option = None
         while True:
             attempt = input("\nEnter the letter of your answer (A, B, C, or D) (or 'skip' to see solution, 'hint' for a hint): ").strip().upper()
             
             if attempt.lower() == 'skip':
                 print("\nCorrect Answer:", correct_answer)
                 # update memory for skipped question
-                update_memory(
-                    question_text,
-                    "Question skipped",
-                    f"Student skipped question about {selected_topic if selected_topic else 'general topic'} in {period}"
-                )
+                update_memory(*skipped_note(question_text, period, selected_topic))
                 break
             elif attempt.lower() == 'hint':
                 # give a hint without giving away the answer
-                hint_prompt = f"""
-                AP US History Question: {question_text}
-                Period: {period}
-                Topic: {selected_topic if selected_topic else 'General'}
-                
-                Provide a brief, focused hint (1-2 sentences) that guides the student without giving away the solution
-                """
-                
-                messages = [
-                    {"role": "system", "content": "You are an AP US History teacher providing hints"},
-                    {"role": "user", "content": hint_prompt}
-                ]
-                
-                hint = query_groq(messages, model="llama3-8b-8192", max_completion_tokens=100, purpose="Generate hint")
+                messages = hint_messages(question_text, period, selected_topic)
+                with stage_profiler.span("practice_hint"):
+                    hint = query_groq(messages, model=TASK_MODEL, max_completion_tokens=100, purpose="Generate hint")
                 if hint:
                     print("\nHint:", hint)
                 continue
@@ -320,111 +374,89 @@ def practice_mode():
                 print("Please enter a valid letter (A, B, C, or D)")
         
         # give feedback
-        feedback_prompt = f"""
-        AP US History Question: {question_text}
-        Period: {period}
-        Topic: {selected_topic if selected_topic else 'General'}
-        Student's selected option: {selected_option if 'selected_option' in locals() else 'skipped'}
-        Correct answer: {correct_answer}
-        
-        Provide brief, focused feedback (2-3 sentences) that:
-        1. Acknowledges what was correct (if anything)
-        2. Points out one key area for improvement
-        3. Includes one specific tip for AP exam success
-        """
-        
-        messages = [
-            {"role": "system", "content": "You are an AP US History teacher providing concise feedback"},
-            {"role": "user", "content": feedback_prompt}
-        ]
-        
-        feedback = query_groq(messages, model="llama3-8b-8192", max_completion_tokens=150, purpose="Generate feedback")
+        messages = feedback_messages(question_text, period, selected_topic, selected_option, correct_answer)
+        with stage_profiler.span("practice_feedback"):
+            feedback = query_groq(messages, model=TASK_MODEL, max_completion_tokens=150, purpose="Generate feedback")
         if feedback:
             print("\nFeedback:", feedback)
             
             # update memory with the interaction
-            is_correct = selected_option and selected_option.startswith(correct_answer)
-            memory_context = f"Topic: {selected_topic if selected_topic else 'General'}, Period: {period}"
-            update_memory(
-                question_text,
-                f"Selected: {selected_option}, Correct: {correct_answer}",
-                f"{'Correct answer' if is_correct else 'Incorrect answer'} on {memory_context}. {feedback}"
-            )
+            update_memory(*answered_note(question_text, period, selected_topic, selected_option, correct_answer, feedback))
         
         # save the question
         save_practice_problem(full_question, period)
 
-def get_relevant_memory(query: str) -> str:
+def get_relevant_memory(query: str, period: str = None) -> str:
     """get relevant past learnings from memory"""
-    memory = load_memory()
-    if not memory:
-        return ""
-    
-    relevance_prompt = f"""
-    User query: {query}
-    Past interactions and practice: {memory}
-    
-    Identify any patterns of difficulty or learning gaps from past interactions that are relevant to this query
-    Only include insights if they show a clear pattern of misunderstanding or difficulty
-    Format as: "User has shown difficulty with: [specific concept/pattern]"
-    If no relevant patterns found, return empty string
-    """
-    
-    messages = [
-        {"role": "system", "content": "You are an AP US History expert identifying learning patterns"},
-        {"role": "user", "content": relevance_prompt}
-    ]
-    
-    return query_groq(messages, model="llama3-8b-8192", max_completion_tokens=150, purpose="Get relevant memory")
+    relevant = student_memory.relevant(query, period)
+    if memory_summaries.stale:
+        # out of date summaries are rebuilt off the interactive path, ready for the next turn
+        memory_worker.submit("refresh_memory_summaries")
+    return relevant
+
+def summarize_conversation(summary: str, turns: str) -> str:
+    """fold older conversation turns into the running summary"""
+    messages = conversation_summary_messages(summary, turns)
+    return query_groq(messages, model=TASK_MODEL, max_completion_tokens=SUMMARY_TOKEN_LIMIT, purpose="Summarize conversation")
 
 def update_memory(question: str, response: str, feedback: str):
-    """update memory with new interaction"""
-    current_memory = load_memory()
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # check for learning patterns
-    pattern_prompt = f"""
-    Question: {question}
-    Response: {response}
-    Feedback: {feedback}
-    
-    Identify if this interaction shows a clear pattern of difficulty or misunderstanding
-    If yes, format as: "User has shown difficulty with: [specific concept/pattern]"
-    If no clear pattern, return empty string
-    """
-    
-    messages = [
-        {"role": "system", "content": "You are an AP US History expert identifying learning patterns"},
-        {"role": "user", "content": pattern_prompt}
-    ]
-    
-    pattern = query_groq(messages, model="llama3-8b-8192", max_completion_tokens=150, purpose="Update memory with pattern")
+    """update memory with new interaction (in the background)"""
+    memory_worker.submit("update_memory", question, response, feedback)
+
+@stage_profiler.stage("update_memory")
+def update_memory_now(question: str, response: str, feedback: str):
+    """analyze an interaction and save any pattern to memory"""
+    messages = pattern_messages(question, response, feedback)
+    pattern = query_groq(messages, model=TASK_MODEL, max_completion_tokens=150, purpose="Update memory with pattern")
     if pattern:
-        new_entry = f"\n[{timestamp}] {pattern}"
-        updated_memory = current_memory + new_entry
-        save_memory(updated_memory)
+        save_memory(pattern, period=period_of(feedback) or period_of(question))
+
+# pattern analysis + memory writes run here in submit order, off the interactive path
+memory_worker = MemoryWorker({
+    "update_memory": update_memory_now,
+    "save_practice_problem": save_practice_problem_now,
+    "consolidate_memory": memory_consolidator.consolidate,
+    "refresh_memory_summaries": student_memory.refresh_summaries,
+})
+
+# practice questions generated ahead of time, kept topped up in the background
+question_bank = QuestionBank()
+question_prefetcher = QuestionPrefetcher(question_bank, prefetch_ap_questions)
 
 def chat_with_memory():
     """main chat function with memory"""
+    rag_loader.start()
+    migrate_memory_file()
+    memory_worker.start()
+    # batch pass over whatever built up before this session (e.g. an imported memory.txt)
+    memory_worker.submit("consolidate_memory")
     print("Welcome to AP US History Study Buddy!")
     print("\nCommands:")
     print("- Type 'exit' to quit")
     print("- Type 'memory' to see full memory")
     print("- Type 'practice' to enter practice mode")
     print("- Type 'periods' to see all AP periods")
+    print("- Type 'startup' to see startup timings")
+    print("- Type 'cache' to see llm response cache stats")
+    print("- Type 'metrics' to see llm call metrics")
+    startup_metrics.setdefault("time_to_prompt", time.perf_counter() - STARTUP_BEGIN)
     
     while True:
         try:
             # start conversation context
-            conversation_context = []
+            conversation_context = ConversationContext(summarize_conversation)
             
             # get initial question
             question = input("\nYour question: ").strip()
             
             if question.lower() == 'exit':
+                print("Saving memory...")
+                memory_worker.close()
+                llm_metrics.write_prometheus()
                 break
             elif question.lower() == 'memory':
                 print("\nCurrent Memory:")
+                memory_worker.flush()
                 print(load_memory())
                 continue
             elif question.lower() == 'practice':
@@ -433,34 +465,46 @@ def chat_with_memory():
             elif question.lower() == 'periods':
                 show_periods()
                 continue
+            elif question.lower() == 'startup':
+                show_startup_metrics()
+                continue
+            elif question.lower() == 'cache':
+                show_cache_stats()
+                continue
+            elif question.lower() == 'metrics':
+                show_llm_metrics()
+                continue
             
             # start conversation loop
             while True:
-                # get relevant past learnings
-                relevant_memory = get_relevant_memory(question)
+                with stage_profiler.span("chat_turn"):
+                    # get ced context and relevant past learnings at the same time
+                    rag_future = turn_pool.submit(stage_profiler.wrap("retrieval", get_rag_context, local=True), question)
+                    memory_future = turn_pool.submit(stage_profiler.wrap("get_relevant_memory", get_relevant_memory, local=True), question)
+                    rag_context = rag_future.result()
+                    relevant_memory = memory_future.result()
                 
-                # prepare conversation
-                messages = [
-                    {"role": "system", "content": "You are an AP US History expert tutor helping students prepare for the AP exam"}
-                ]
+                    # prepare conversation
+                    with stage_profiler.span("conversation_context"):
+                        history = conversation_context.messages()
+                    messages = chat_messages(question, relevant_memory, rag_context, history)
                 
-                if relevant_memory:
-                    messages.append({
-                        "role": "system",
-                        "content": f"Relevant past learnings to consider:\n{relevant_memory}"
-                    })
-                
-                messages.extend(conversation_context)
-                messages.append({"role": "user", "content": question})
-                
-                # get response
-                response = query_groq(messages, model="llama3-70b-8192", max_completion_tokens=1000, purpose="Main chat response")
-                if response:
-                    print("\nAI:", response)
+                    # get response
+                    with stage_profiler.span("main_llm_call"):
+                        if STREAM_RESPONSES:
+                            print("\nAI: ", end="", flush=True)
+                            response = query_groq_stream(messages, model=CHAT_MODEL, max_completion_tokens=1000,
+                                                         purpose="Main chat response", on_token=print_token)
+                        else:
+                            response = query_groq(messages, model=CHAT_MODEL, max_completion_tokens=1000, purpose="Main chat response")
+                            if response:
+                                print("\nAI:", response)
                     
                     # update conversation context
-                    conversation_context.append({"role": "user", "content": question})
-                    conversation_context.append({"role": "assistant", "content": response})
+                    if response:
+                        conversation_context.add_turn(question, response)
+                
+                if response:
                     
                     # check for follow-up
                     follow_up = input("\nDo you have any follow-up questions? (yes/no): ").strip().lower()
@@ -478,4 +522,11 @@ def chat_with_memory():
             print(f"Error occurred: {str(e)}")
             print("Sorry, an error occurred. Please try again.")
 
-chat_with_memory()
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AP US History Study Buddy")
+    parser.add_argument("--profile", action="store_true", help="record per-turn stage timings (same as STAGE_PROFILE=1)")
+    parser.add_argument("--cprofile", metavar="DIR", default="", help="with --profile, also dump cprofile stats of the local stages into DIR")
+    args = parser.parse_args()
+    if args.profile or args.cprofile:
+        stage_profiler.enable(args.cprofile)
+    chat_with_memory()
\ No newline at end of file
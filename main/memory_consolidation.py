@@ -0,0 +1,183 @@
+import re
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from memory_log import MemoryLog, TIMESTAMP_FORMAT
+
+# minhash over character shingles; lsh with 16 bands of 4 rows makes pairs
+# above ~0.5 jaccard land in a shared bucket with high probability
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 4
+# estimated jaccard at or above which two entries count as the same pattern
+DUPLICATE_THRESHOLD = 0.5
+
+# fixed seed so signatures are stable across runs
+perm_rng = np.random.default_rng(1763)
+PERM_A = perm_rng.integers(1, 2**63, NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+PERM_B = perm_rng.integers(0, 2**63, NUM_PERMUTATIONS, dtype=np.uint64)
+
+NO_PATTERN_RE = re.compile(
+    r'\bno (clear |obvious |specific |significant |discernible )?(pattern|difficult|misunderstanding|learning gap)'
+    r'|\bempty string\b|^\W*(none|n/?a)?\W*$',
+    re.IGNORECASE
+)
+# the shared "User has shown difficulty with:" prefix would make every entry look alike
+BOILERPLATE_RE = re.compile(r'^\W*user has shown difficulty with:?\s*', re.IGNORECASE)
+NORMALIZE_RE = re.compile(r'[^a-z0-9]+')
+
+def is_pattern(text: str) -> bool:
+    """false for llm answers that just say there was no pattern"""
+    if not text or not text.strip():
+        return False
+    # the negation decides even when the answer also says "difficulty with",
+    # as in "no clear pattern of difficulty with ..."
+    return not NO_PATTERN_RE.search(text)
+
+def minhash(text: str) -> np.ndarray:
+    """minhash signature of the text's character shingles"""
+    normalized = NORMALIZE_RE.sub(" ", BOILERPLATE_RE.sub("", text).lower()).strip()
+    normalized = normalized.ljust(SHINGLE_SIZE)
+    shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    values = np.array([zlib.crc32(s.encode('utf-8')) for s in shingles], dtype=np.uint64)
+    # multiply-shift hashing, one row per permutation (wraps mod 2^64)
+    with np.errstate(over='ignore'):
+        hashed = (values[None, :] * PERM_A[:, None] + PERM_B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """estimated jaccard similarity of two signatures"""
+    return float(np.mean(a == b))
+
+def band_keys(signature: np.ndarray) -> List[bytes]:
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    return [bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes() for band in range(LSH_BANDS)]
+
+class MemoryConsolidator:
+    """keeps the memory log free of non-patterns and near-duplicate entries
+
+    add() is the incremental path (one new pattern merged into its nearest
+    duplicate); consolidate() is the batch pass over the whole log
+    """
+    def __init__(self, memory_log: MemoryLog, threshold: float = DUPLICATE_THRESHOLD):
+        self.memory_log = memory_log
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.signatures = {}  # entry id -> minhash signature
+        self.buckets = {}     # band key -> entry ids
+        self.seen_id = -1
+
+    def index_entry(self, entry_id: int, signature: np.ndarray):
+        self.signatures[entry_id] = signature
+        for key in band_keys(signature):
+            self.buckets.setdefault(key, set()).add(entry_id)
+
+    def forget(self, entry_id: int):
+        signature = self.signatures.pop(entry_id, None)
+        if signature is None:
+            return
+        for key in band_keys(signature):
+            bucket = self.buckets.get(key)
+            if bucket:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def refresh(self):
+        """sign entries appended since the last refresh"""
+        new_ids = [i for i in self.memory_log.select() if i > self.seen_id]
+        if not new_ids:
+            return
+        for entry in self.memory_log.read(new_ids):
+            self.index_entry(entry["id"], minhash(entry["text"]))
+        self.seen_id = max(self.seen_id, new_ids[-1])
+
+    def duplicates_of(self, entry_id: Optional[int], signature: np.ndarray) -> List[int]:
+        """live entries whose estimated similarity clears the threshold"""
+        candidates = set()
+        for key in band_keys(signature):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(entry_id)
+        return [i for i in candidates
+                if i not in self.memory_log.deleted and similarity(signature, self.signatures[i]) >= self.threshold]
+
+    def merge(self, entries: List[Dict], text: str = None, period: str = None) -> int:
+        """replace entries (plus an optional new sighting of text) with one entry carrying a count"""
+        timestamps = [e["timestamp"] for e in entries]
+        last_seen = max(e.get("last_seen", e["timestamp"]) for e in entries)
+        if text:
+            last_seen = datetime.now().strftime(TIMESTAMP_FORMAT)
+        latest = max(entries, key=lambda e: (e.get("last_seen", e["timestamp"]), e["id"]))
+        count = sum(e.get("count", 1) for e in entries) + (1 if text else 0)
+        # the newest wording wins; the entry keeps its first-seen timestamp
+        merged_id = self.memory_log.append(
+            text or latest["text"],
+            period=period or next((e["period"] for e in sorted(entries, key=lambda e: -e["id"]) if e.get("period")), None),
+            timestamp=min(timestamps),
+            count=count,
+            last_seen=last_seen,
+        )
+        self.memory_log.delete([e["id"] for e in entries])
+        for e in entries:
+            self.forget(e["id"])
+        return merged_id
+
+    def add(self, text: str, period: str = None) -> Optional[int]:
+        """append a pattern, merging it into an existing near-duplicate; None if it isnt a pattern"""
+        if not is_pattern(text):
+            return None
+        with self.lock:
+            self.refresh()
+            signature = minhash(text)
+            duplicates = self.duplicates_of(None, signature)
+            if not duplicates:
+                entry_id = self.memory_log.append(text, period=period)
+            else:
+                best = max(duplicates, key=lambda i: (similarity(signature, self.signatures[i]), i))
+                entry_id = self.merge(self.memory_log.read([best]), text=text, period=period)
+            self.index_entry(entry_id, signature)
+            self.seen_id = max(self.seen_id, entry_id)
+            return entry_id
+
+    def consolidate(self) -> int:
+        """batch pass: drop non-patterns, merge every near-duplicate cluster, compact the log
+
+        returns how many entries were removed
+        """
+        with self.lock:
+            self.refresh()
+            before = len(self.memory_log)
+            entries = {e["id"]: e for e in self.memory_log.entries()}
+
+            junk = [i for i, e in entries.items() if not is_pattern(e["text"])]
+            self.memory_log.delete(junk)
+            for i in junk:
+                self.forget(i)
+                del entries[i]
+
+            # union-find over verified lsh candidate pairs
+            parent = {i: i for i in entries}
+            def find(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+            for i in entries:
+                for j in self.duplicates_of(i, self.signatures[i]):
+                    if j in parent:
+                        parent[find(i)] = find(j)
+
+            clusters = {}
+            for i in entries:
+                clusters.setdefault(find(i), []).append(entries[i])
+            for members in clusters.values():
+                if len(members) > 1:
+                    merged_id = self.merge(members)
+                    latest = max(members, key=lambda e: (e.get("last_seen", e["timestamp"]), e["id"]))
+                    self.index_entry(merged_id, minhash(latest["text"]))
+                    self.seen_id = max(self.seen_id, merged_id)
+
+            self.memory_log.compact()
+            return before - len(self.memory_log)
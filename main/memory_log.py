@@ -0,0 +1,349 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+# memory is an append-only log split into segments, each with a sidecar index:
+#   segment_000001.log  one json record per line (entries, delete tombstones and next-id marks)
+#   segment_000001.idx  one json row per record: offset/length plus timestamp, period and concept
+# the .log files are the source of truth; an index is rebuilt from its log if missing or behind
+MEMORY_LOG_DIR = "memory_log"
+SEGMENT_MAX_BYTES = 1 << 20
+# sealed segments are merged (dropping deleted entries) once there are this many
+COMPACT_SEGMENTS = 4
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+SEGMENT_RE = re.compile(r'^segment_(\d+)\.log$')
+PERIOD_RE = re.compile(r'\bPeriod (\d)\b')
+CONCEPT_RE = re.compile(r'difficulty with:\s*([^.\n]+)', re.IGNORECASE)
+# memory.txt entries look like "[2024-01-01 12:00:00] text"
+LEGACY_ENTRY_RE = re.compile(r'\n(?=\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\] )')
+LEGACY_TIMESTAMP_RE = re.compile(r'^\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\]\s*(.*)$', re.DOTALL)
+
+def period_of(text: str) -> Optional[str]:
+    """first apush period number mentioned in the text"""
+    match = PERIOD_RE.search(text or "")
+    return match.group(1) if match else None
+
+def concept_of(text: str) -> Optional[str]:
+    """the concept from a "User has shown difficulty with: ..." pattern"""
+    match = CONCEPT_RE.search(text or "")
+    if not match:
+        return None
+    concept = match.group(1).strip().strip('."[]').lower()
+    return concept or None
+
+def format_entry(entry: Dict) -> str:
+    text = f"[{entry['timestamp']}] {entry['text']}"
+    if entry.get("count", 1) > 1:
+        text += f" (seen {entry['count']} times, last {entry['last_seen']})"
+    return text
+
+class MemoryLog:
+    """append-only, segmented memory log with an in-memory index
+
+    only the small index rows are loaded on open; entry text is read from the
+    segment with a positioned read when an entry is actually requested
+    """
+    def __init__(self, directory: str = MEMORY_LOG_DIR, segment_max_bytes: int = SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.lock = threading.RLock()
+        self.rows = {}        # entry id -> index row (replaced by compaction; read through row() off the lock)
+        self.order = []       # live entry ids in append order
+        self.by_period = {}   # period -> entry ids
+        self.by_concept = {}  # concept -> entry ids
+        self.deleted = set()
+        self.segments = []    # segment numbers, oldest first
+        self.next_id = 0
+        self.opened = False
+
+    def segment_path(self, number: int, suffix: str = ".log") -> str:
+        return os.path.join(self.directory, f"segment_{number:06d}{suffix}")
+
+    def open(self) -> "MemoryLog":
+        """load the index rows of every segment (once)"""
+        with self.lock:
+            if self.opened:
+                return self
+            os.makedirs(self.directory, exist_ok=True)
+            self.segments = sorted(int(m.group(1)) for m in map(SEGMENT_RE.match, os.listdir(self.directory)) if m)
+            rows = []
+            for number in self.segments:
+                rows.extend(self.load_segment_index(number))
+            self.rebuild(rows)
+            self.opened = True
+            return self
+
+    def load_segment_index(self, number: int) -> List[Dict]:
+        """index rows for one segment, re-deriving any the sidecar is missing"""
+        log_path = self.segment_path(number)
+        idx_path = self.segment_path(number, ".idx")
+        rows = []
+        if os.path.exists(idx_path):
+            with open(idx_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        break  # torn last line
+        indexed_end = rows[-1]["offset"] + rows[-1]["length"] if rows else 0
+
+        size = os.path.getsize(log_path)
+        if indexed_end > size:
+            # index is ahead of its log (shouldnt happen), so trust the log
+            rows, indexed_end = [], 0
+        if indexed_end < size:
+            with open(log_path, 'rb') as f:
+                f.seek(indexed_end)
+                tail = f.read()
+            offset = indexed_end
+            for line in tail.splitlines(keepends=True):
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                rows.append(self.index_row(record, number, offset, len(line)))
+                offset += len(line)
+            if offset < size:
+                # drop a half-written record left by a crash
+                with open(log_path, 'r+b') as f:
+                    f.truncate(offset)
+            with open(idx_path + ".tmp", 'w', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+            os.replace(idx_path + ".tmp", idx_path)
+
+        for row in rows:
+            row["segment"] = number
+        return rows
+
+    def index_row(self, record: Dict, number: int, offset: int, length: int) -> Dict:
+        if "delete" in record:
+            return {"offset": offset, "length": length, "delete": record["delete"]}
+        if "next_id" in record:
+            return {"offset": offset, "length": length, "next_id": record["next_id"]}
+        return {
+            "id": record["id"],
+            "offset": offset,
+            "length": length,
+            "timestamp": record["timestamp"],
+            "period": record.get("period"),
+            "concept": record.get("concept"),
+        }
+
+    def rebuild(self, rows: List[Dict]):
+        """rebuild the in-memory lookups from index rows (in log order)"""
+        self.rows, self.by_period, self.by_concept = {}, {}, {}
+        self.deleted = set()
+        max_id = -1
+        for row in rows:
+            if "delete" in row:
+                self.deleted.update(row["delete"])
+            elif "next_id" in row:
+                # written by compaction, so ids of entries it dropped are never handed out again
+                max_id = max(max_id, row["next_id"] - 1)
+            else:
+                # a crash mid-compaction can leave an entry in two segments; keep the newer copy
+                self.rows[row["id"]] = row
+                max_id = max(max_id, row["id"])
+        self.next_id = max(max_id, max(self.deleted, default=-1)) + 1
+        self.order = sorted(i for i in self.rows if i not in self.deleted)
+        for entry_id in self.order:
+            self.add_lookups(self.rows[entry_id])
+
+    def add_lookups(self, row: Dict):
+        if row.get("period"):
+            self.by_period.setdefault(row["period"], []).append(row["id"])
+        if row.get("concept"):
+            self.by_concept.setdefault(row["concept"], []).append(row["id"])
+
+    def write_record(self, record: Dict) -> Dict:
+        """append one record to the active segment, then its index row"""
+        data = (json.dumps(record) + "\n").encode('utf-8')
+        if not self.segments:
+            self.segments.append(1)
+        number = self.segments[-1]
+        log_path = self.segment_path(number)
+        offset = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        if offset and offset + len(data) > self.segment_max_bytes:
+            number = self.segments[-1] + 1
+            self.segments.append(number)
+            log_path, offset = self.segment_path(number), 0
+
+        # one write of the whole record with O_APPEND, so a record is never interleaved
+        fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        row = self.index_row(record, number, offset, len(data))
+        with open(self.segment_path(number, ".idx"), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(row) + "\n")
+        row["segment"] = number
+        return row
+
+    def maybe_compact(self):
+        if len(self.segments) > COMPACT_SEGMENTS:
+            self.compact()
+
+    def append(self, text: str, period: str = None, concept: str = None, timestamp: str = None,
+               count: int = 1, last_seen: str = None) -> int:
+        """append an entry and return its id
+
+        count / last_seen are set on entries that merge several near-duplicates
+        """
+        with self.open().lock:
+            record = {
+                "id": self.next_id,
+                "timestamp": timestamp or datetime.now().strftime(TIMESTAMP_FORMAT),
+                "period": period,
+                "concept": concept if concept is not None else concept_of(text),
+                "text": text,
+            }
+            if count > 1:
+                record["count"] = count
+                record["last_seen"] = last_seen or record["timestamp"]
+            self.next_id += 1
+            row = self.write_record(record)
+            self.rows[row["id"]] = row
+            self.order.append(row["id"])
+            self.add_lookups(row)
+            self.maybe_compact()
+            return row["id"]
+
+    def delete(self, entry_ids: List[int]):
+        """tombstone entries; their space is reclaimed by compaction"""
+        with self.open().lock:
+            entry_ids = [i for i in entry_ids if i in self.rows and i not in self.deleted]
+            if not entry_ids:
+                return
+            self.write_record({"delete": entry_ids})
+            self.deleted.update(entry_ids)
+            gone = set(entry_ids)
+            self.order = [i for i in self.order if i not in gone]
+            for lookup in (self.by_period, self.by_concept):
+                for key in list(lookup):
+                    lookup[key] = [i for i in lookup[key] if i not in gone]
+                    if not lookup[key]:
+                        del lookup[key]
+            self.maybe_compact()
+
+    def read(self, entry_ids: List[int]) -> List[Dict]:
+        """full entries for the given ids, reading only their bytes from each segment"""
+        with self.open().lock:
+            entries = []
+            handles = {}
+            try:
+                for entry_id in entry_ids:
+                    row = self.rows[entry_id]
+                    if row["segment"] not in handles:
+                        handles[row["segment"]] = open(self.segment_path(row["segment"]), 'rb')
+                    f = handles[row["segment"]]
+                    f.seek(row["offset"])
+                    entries.append(json.loads(f.read(row["length"])))
+            finally:
+                for f in handles.values():
+                    f.close()
+            return entries
+
+    def row(self, entry_id: int) -> Optional[Dict]:
+        """a copy of an entry's index row, None if it doesnt exist (or was compacted away)"""
+        with self.open().lock:
+            row = self.rows.get(entry_id)
+            return dict(row) if row is not None else None
+
+    def select(self, period: str = None, concept: str = None, since: str = None) -> List[int]:
+        """ids of live entries matching every given filter, oldest first"""
+        with self.open().lock:
+            ids = self.order
+            if period is not None:
+                ids = self.by_period.get(period, [])
+            if concept is not None:
+                wanted = set(self.by_concept.get(concept, []))
+                ids = [i for i in ids if i in wanted]
+            if since is not None:
+                # timestamps are fixed-width, so string order is time order
+                ids = [i for i in ids if self.rows[i]["timestamp"] >= since]
+            return list(ids)
+
+    def recent(self, n: int, period: str = None, concept: str = None) -> List[Dict]:
+        """the newest n matching entries, oldest first"""
+        ids = self.select(period=period, concept=concept)
+        return self.read(ids[-n:] if n else [])
+
+    def entries(self, period: str = None, concept: str = None, since: str = None) -> Iterator[Dict]:
+        ids = self.select(period=period, concept=concept, since=since)
+        for start in range(0, len(ids), 256):
+            yield from self.read(ids[start:start + 256])
+
+    def __len__(self):
+        return len(self.open().order)
+
+    def text(self, entries: List[Dict] = None) -> str:
+        """entries formatted the way memory.txt stored them (all entries by default)"""
+        if entries is None:
+            entries = list(self.entries())
+        return "\n".join(format_entry(entry) for entry in entries)
+
+    def compact(self):
+        """merge the sealed segments into one, dropping deleted entries and tombstones"""
+        with self.lock:
+            sealed = self.segments[:-1]
+            if not sealed:
+                return
+            target = sealed[-1]
+            live = [i for i in sorted(self.rows) if self.rows[i]["segment"] in sealed and i not in self.deleted]
+            records = self.read(live)
+
+            # the merged segment takes the number of the newest sealed one: drop its index,
+            # swap in the new log, write a fresh index, then remove the older segments.
+            # a crash at any point leaves logs that rebuild to the same entries.
+            # it starts with a next-id mark: the dropped entries (and their tombstones) may
+            # include the highest id, which must not be reused once the log is reopened
+            log_path = self.segment_path(target)
+            idx_path = self.segment_path(target, ".idx")
+            rows, offset = [], 0
+            with open(log_path + ".tmp", 'wb') as f:
+                for record in [{"next_id": self.next_id}] + records:
+                    data = (json.dumps(record) + "\n").encode('utf-8')
+                    f.write(data)
+                    rows.append(self.index_row(record, target, offset, len(data)))
+                    offset += len(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(idx_path):
+                os.remove(idx_path)
+            os.replace(log_path + ".tmp", log_path)
+            with open(idx_path + ".tmp", 'w', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+            os.replace(idx_path + ".tmp", idx_path)
+            for number in sealed[:-1]:
+                os.remove(self.segment_path(number))
+                if os.path.exists(self.segment_path(number, ".idx")):
+                    os.remove(self.segment_path(number, ".idx"))
+
+            self.segments = [target] + self.segments[len(sealed):]
+            all_rows = []
+            for row in rows:
+                row["segment"] = target
+                all_rows.append(row)
+            for number in self.segments[1:]:
+                all_rows.extend(self.load_segment_index(number))
+            self.rebuild(all_rows)
+
+    def import_text(self, memory_text: str):
+        """append entries from an old memory.txt"""
+        for chunk in LEGACY_ENTRY_RE.split(memory_text.strip()):
+            chunk = chunk.strip()
+            if not chunk:
+                continue
+            match = LEGACY_TIMESTAMP_RE.match(chunk)
+            timestamp, text = match.groups() if match else (None, chunk)
+            self.append(text, period=period_of(text), timestamp=timestamp)
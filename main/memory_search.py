@@ -0,0 +1,81 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import List
+from memory_log import MemoryLog, format_entry
+from rag_index import BM25_K1, BM25_B
+
+# how many memory entries (and roughly how many tokens of them) go into a relevance prompt
+MEMORY_TOP_K = int(os.environ.get("MEMORY_TOP_K", "8"))
+MEMORY_TOKEN_BUDGET = int(os.environ.get("MEMORY_TOKEN_BUDGET", "600"))
+
+# entries tagged with the period the student is asking about score higher
+PERIOD_BOOST = 1.5
+
+WORD_RE = re.compile(r'\b\w+\b')
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "with", "is", "was", "were", "are",
+    "be", "by", "as", "at", "it", "that", "this", "what", "how", "why", "did", "do", "does", "user",
+    "has", "have", "shown", "difficulty",
+}
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+
+class MemorySearch:
+    """bm25 index over memory log entries, kept in step with the log incrementally
+
+    entries only ever get appended with increasing ids, so each refresh just
+    indexes ids it hasnt seen; deleted entries are filtered at query time
+    """
+    def __init__(self, memory_log: MemoryLog):
+        self.memory_log = memory_log
+        self.lock = threading.Lock()
+        self.postings = {}     # term -> {entry id: term frequency}
+        self.lengths = {}      # entry id -> number of terms
+        self.texts = {}        # entry id -> formatted entry
+        self.periods = {}      # entry id -> period
+        self.seen_id = -1
+
+    def refresh(self):
+        """index entries appended since the last refresh"""
+        new_ids = [i for i in self.memory_log.select() if i > self.seen_id]
+        if not new_ids:
+            return
+        for entry in self.memory_log.read(new_ids):
+            terms = tokenize(entry["text"])
+            for term, tf in Counter(terms).items():
+                self.postings.setdefault(term, {})[entry["id"]] = tf
+            self.lengths[entry["id"]] = len(terms)
+            self.texts[entry["id"]] = format_entry(entry)
+            self.periods[entry["id"]] = entry.get("period")
+        self.seen_id = max(self.seen_id, new_ids[-1])
+
+    def search(self, query: str, period: str = None, top_k: int = MEMORY_TOP_K) -> List[int]:
+        """ids of the top_k live entries by bm25 score, best first"""
+        with self.lock:
+            self.refresh()
+            live = set(self.memory_log.select())
+            num_docs = len(live)
+            if not num_docs:
+                return []
+            avg_length = sum(self.lengths[i] for i in live) / num_docs or 1.0
+
+            scores = {}
+            for term in set(tokenize(query)):
+                docs = {i: tf for i, tf in self.postings.get(term, {}).items() if i in live}
+                if not docs:
+                    continue
+                idf = math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for i, tf in docs.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / avg_length)
+                    scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            if period is not None:
+                for i in scores:
+                    if self.periods[i] == period:
+                        scores[i] *= PERIOD_BOOST
+            # ties go to the newer entry
+            return sorted(scores, key=lambda i: (-scores[i], -i))[:top_k]
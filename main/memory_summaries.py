@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from memory_log import MemoryLog, TIMESTAMP_FORMAT
+from tokens import estimate_tokens
+
+# materialized summaries, keyed "period:3" / "concept:the stamp act"
+MEMORY_SUMMARY_FILE = "memory_summaries.json"
+# token cap on the entries handed to the summarizer for one slice (newest kept)
+SUMMARY_INPUT_BUDGET = 1500
+
+def slice_fingerprint(entry_ids: List[int]) -> str:
+    """changes whenever an entry is added to or removed from the slice"""
+    return hashlib.sha256(",".join(map(str, entry_ids)).encode('ascii')).hexdigest()[:16]
+
+class MemorySummaries:
+    """per-period and per-concept summaries of the memory log, cached on disk
+
+    each cached summary records a fingerprint of the entry ids it was built
+    from; it is only rebuilt (one llm call) when that slice of the log changed.
+    a slice with a single entry is its own summary and never costs a call.
+    the lock is never held across the llm call, and foreground lookups
+    (refresh=False) never make one: they get the last stored summary and the
+    slice is queued in stale for refresh_stale to rebuild in the background
+    """
+    def __init__(self, memory_log: MemoryLog, summarize: Callable[[str, str], Optional[str]],
+                 cache_file: str = MEMORY_SUMMARY_FILE):
+        self.memory_log = memory_log
+        self.summarize = summarize  # (slice label, formatted entries) -> summary
+        self.cache_file = cache_file
+        self.lock = threading.Lock()
+        self.cache = None
+        self.stale = set()  # keys served out of date by a foreground lookup
+
+    def load_cache(self) -> Dict[str, Dict]:
+        if self.cache is None:
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError):
+                self.cache = {}
+        return self.cache
+
+    def save_cache(self):
+        with open(self.cache_file + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, indent=2)
+        os.replace(self.cache_file + ".tmp", self.cache_file)
+
+    def slice_ids(self, key: str) -> List[int]:
+        kind, value = key.split(":", 1)
+        if kind == "period":
+            return self.memory_log.select(period=value)
+        return self.memory_log.select(concept=value)
+
+    def slice_text(self, ids: List[int]) -> str:
+        """the slice's entries as summarizer input, newest first until the budget is spent (older ones are never read)"""
+        entries, used = [], 0
+        for end in range(len(ids), 0, -32):
+            for entry in reversed(self.memory_log.read(ids[max(0, end - 32):end])):
+                text = self.memory_log.text([entry])
+                used += estimate_tokens(text)
+                if entries and used > SUMMARY_INPUT_BUDGET:
+                    break
+                entries.append(text)
+            if entries and used > SUMMARY_INPUT_BUDGET:
+                break
+        return "\n".join(reversed(entries))
+
+    def summary(self, key: str, refresh: bool = True) -> str:
+        """the summary for a slice, rebuilding it only if the slice changed
+
+        with refresh=False an out of date summary is returned as is ("" if
+        there is none yet) and the key is left in stale instead
+        """
+        with self.lock:
+            cache = self.load_cache()
+            ids = self.slice_ids(key)
+            if not ids:
+                self.stale.discard(key)
+                if cache.pop(key, None) is not None:
+                    self.save_cache()
+                return ""
+            fingerprint = slice_fingerprint(ids)
+            cached = cache.get(key)
+            if cached and cached["fingerprint"] == fingerprint:
+                return cached["summary"]
+            if len(ids) > 1 and not refresh:
+                self.stale.add(key)
+                return cached["summary"] if cached else ""
+
+        memory_text = self.slice_text(ids)
+        if len(ids) == 1:
+            summary = memory_text
+        else:
+            summary = self.summarize(key.replace(":", " ", 1), memory_text)
+            if summary is None:
+                # llm failed: hand back the raw entries and try again next time
+                return memory_text
+
+        with self.lock:
+            # the slice may have changed during the llm call; a summary of the old slice isnt stored
+            if slice_fingerprint(self.slice_ids(key)) == fingerprint:
+                self.load_cache()[key] = {
+                    "fingerprint": fingerprint,
+                    "summary": summary,
+                    "entries": len(ids),
+                    "updated": datetime.now().strftime(TIMESTAMP_FORMAT),
+                }
+                self.save_cache()
+                self.stale.discard(key)
+        return summary
+
+    def period_summary(self, period: str, refresh: bool = True) -> str:
+        return self.summary(f"period:{period}", refresh) if period else ""
+
+    def concept_summary(self, concept: str, refresh: bool = True) -> str:
+        return self.summary(f"concept:{concept}", refresh) if concept else ""
+
+    def refresh_for(self, entry_id: Optional[int]):
+        """rebuild the summaries that a newly added entry belongs to"""
+        row = self.memory_log.row(entry_id) if entry_id is not None else None
+        if row is None:
+            return
+        self.period_summary(row.get("period"))
+        self.concept_summary(row.get("concept"))
+
+    def refresh_stale(self):
+        """rebuild the summaries foreground lookups found out of date"""
+        with self.lock:
+            keys, self.stale = self.stale, set()
+        for key in sorted(keys):
+            self.summary(key)
@@ -0,0 +1,114 @@
+import atexit
+import json
+import os
+import queue
+import threading
+from typing import Callable, Dict, List
+
+# jobs are journaled here before they are queued, so a crash doesnt lose them
+MEMORY_JOURNAL_FILE = "memory_queue.jsonl"
+
+class MemoryWorker:
+    """runs memory updates (pattern analysis + memory writes) on one background thread
+
+    jobs run in the order they were submitted. each job is appended to a
+    journal (and fsynced) before submit returns and marked done once it ran;
+    jobs still pending at startup, e.g. after a crash, are replayed first
+    """
+    def __init__(self, handlers: Dict[str, Callable], journal_file: str = MEMORY_JOURNAL_FILE):
+        self.handlers = handlers
+        self.journal_file = journal_file
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.thread = None
+
+    def pending_jobs(self) -> List[Dict]:
+        """jobs in the journal that never got marked done"""
+        if not os.path.exists(self.journal_file):
+            return []
+        jobs, done = [], set()
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # a torn last line from a crash mid-write
+                    continue
+                if "done" in record:
+                    done.add(record["done"])
+                else:
+                    jobs.append(record)
+        return [job for job in jobs if job["id"] not in done]
+
+    def start(self) -> "MemoryWorker":
+        """replay unfinished jobs from the journal and start the worker thread"""
+        with self.lock:
+            if self.thread is not None:
+                return self
+            pending = self.pending_jobs()
+            self.next_id = max((job["id"] for job in pending), default=-1) + 1
+            # rewrite the journal with just the pending jobs so it doesnt grow forever
+            with open(self.journal_file + ".tmp", 'w', encoding='utf-8') as f:
+                for job in pending:
+                    f.write(json.dumps(job) + "\n")
+            os.replace(self.journal_file + ".tmp", self.journal_file)
+            for job in pending:
+                self.queue.put(job)
+
+            self.thread = threading.Thread(target=self.run, name="memory-worker", daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+        return self
+
+    def append_journal(self, record: Dict):
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def submit(self, kind: str, *args):
+        """journal a job and queue it; returns right away"""
+        if kind not in self.handlers:
+            raise ValueError(f"unknown memory job: {kind}")
+        self.start()
+        with self.lock:
+            job = {"id": self.next_id, "kind": kind, "args": list(args)}
+            self.next_id += 1
+            self.append_journal(job)
+            self.queue.put(job)
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                try:
+                    self.handlers[job["kind"]](*job["args"])
+                except Exception as e:
+                    print(f"Error updating memory: {str(e)}")
+                with self.lock:
+                    self.append_journal({"done": job["id"]})
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """wait until every submitted job has run"""
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """flush pending jobs and stop the worker thread"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return
+        self.queue.join()
+        self.queue.put(None)
+        thread.join()
+        # every job is done, so the journal has nothing left to replay
+        with self.lock:
+            if os.path.exists(self.journal_file) and not self.pending_jobs():
+                os.remove(self.journal_file)
+        atexit.unregister(self.close)
@@ -0,0 +1,178 @@
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# generated practice questions waiting to be served, by period and topic
+QUESTION_BANK_FILE = "question_bank.sqlite3"
+# questions asked for in one generation request
+QUESTION_BATCH_SIZE = 3
+# the prefetcher tops each (period, topic) back up to this many ready questions
+PREFETCH_TARGET = 3
+
+SECTION_NAMES = ["QUESTION", "OPTIONS", "ANSWER", "EXPLANATION", "HISTORICAL CONTEXT", "AP RELEVANCE"]
+SECTION_RE = re.compile(r'^\s*(?:\*\*)?(' + "|".join(SECTION_NAMES) + r')(?:\*\*)?\s*:\s*(?:\*\*)?', re.MULTILINE | re.IGNORECASE)
+# questions in a batch are separated by a line of === or ---
+BATCH_SPLIT_RE = re.compile(r'^\s*(?:={3,}|-{3,}).*$', re.MULTILINE)
+OPTION_RE = re.compile(r'^\s*\(?([A-D])[).:]\s*(.+)$', re.MULTILINE)
+ANSWER_RE = re.compile(r'\b([A-D])\b')
+
+def parse_question(text: str) -> Optional[Dict]:
+    """parse one generated question into its sections; None if it doesnt validate
+
+    a valid question has question text, exactly the options A-D and an answer letter among them
+    """
+    matches = list(SECTION_RE.finditer(text))
+    sections = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(text)
+        sections.setdefault(match.group(1).upper(), text[match.end():end].strip())
+
+    options = {letter: option.strip() for letter, option in OPTION_RE.findall(sections.get("OPTIONS", ""))}
+    answer = ANSWER_RE.search(sections.get("ANSWER", ""))
+    if not sections.get("QUESTION") or sorted(options) != ["A", "B", "C", "D"] or not answer:
+        return None
+    return {
+        "question": sections["QUESTION"],
+        "options": [f"{letter}) {options[letter]}" for letter in "ABCD"],
+        "answer": answer.group(1),
+        "explanation": sections.get("EXPLANATION", ""),
+        "context": sections.get("HISTORICAL CONTEXT", ""),
+        "relevance": sections.get("AP RELEVANCE", ""),
+    }
+
+def parse_question_batch(text: str) -> List[Dict]:
+    """every valid question in a batched generation response"""
+    if not text:
+        return []
+    questions = []
+    for block in BATCH_SPLIT_RE.split(text):
+        question = parse_question(block)
+        if question:
+            questions.append(question)
+    return questions
+
+def format_question(question: Dict) -> str:
+    """render a parsed question back in the QUESTION: / OPTIONS: / ... layout"""
+    return "\n\n".join([
+        f"QUESTION:\n{question['question']}",
+        "OPTIONS:\n" + "\n".join(question["options"]),
+        f"ANSWER:\n{question['answer']}",
+        f"EXPLANATION:\n{question['explanation']}",
+        f"HISTORICAL CONTEXT:\n{question['context']}",
+        f"AP RELEVANCE:\n{question['relevance']}",
+    ])
+
+def topic_key(topic: Optional[str]) -> str:
+    return " ".join((topic or "").lower().split())
+
+class QuestionBank:
+    """persistent pool of ready questions; serving one is a local read"""
+    def __init__(self, path: str = QUESTION_BANK_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            # shared between the practice loop and the prefetcher, guarded by self.lock
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS questions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, period TEXT, topic TEXT, question TEXT, created REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS questions_slot ON questions (period, topic, id)")
+            self.conn.commit()
+        return self.conn
+
+    def add(self, period: str, topic: Optional[str], questions: List[Dict]):
+        with self.lock:
+            conn = self.connect()
+            now = time.time()
+            conn.executemany(
+                "INSERT INTO questions (period, topic, question, created) VALUES (?, ?, ?, ?)",
+                [(period, topic_key(topic), json.dumps(q), now) for q in questions]
+            )
+            conn.commit()
+
+    def pop(self, period: str, topic: Optional[str]) -> Optional[Dict]:
+        """take the oldest ready question for the period/topic (each is served once)"""
+        with self.lock:
+            conn = self.connect()
+            row = conn.execute(
+                "SELECT id, question FROM questions WHERE period = ? AND topic = ? ORDER BY id LIMIT 1",
+                (period, topic_key(topic))
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM questions WHERE id = ?", (row[0],))
+            conn.commit()
+            return json.loads(row[1])
+
+    def count(self, period: str, topic: Optional[str]) -> int:
+        with self.lock:
+            return self.connect().execute(
+                "SELECT COUNT(*) FROM questions WHERE period = ? AND topic = ?", (period, topic_key(topic))
+            ).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+class QuestionPrefetcher:
+    """background thread that keeps a few questions ready per (period, topic)
+
+    generate(period, topic, n) should return parsed questions (possibly fewer than n)
+    """
+    def __init__(self, bank: QuestionBank, generate: Callable[[str, str, int], List[Dict]],
+                 target: int = PREFETCH_TARGET, batch_size: int = QUESTION_BATCH_SIZE):
+        self.bank = bank
+        self.generate = generate
+        self.target = target
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self) -> "QuestionPrefetcher":
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="question-prefetcher", daemon=True)
+                self.thread.start()
+        return self
+
+    def request(self, period: str, topic: Optional[str] = None):
+        """ask for the slot to be topped up (no-op if it is already queued)"""
+        slot = (period, topic_key(topic))
+        with self.lock:
+            if slot in self.pending:
+                return
+            self.pending.add(slot)
+        self.start()
+        self.queue.put(slot)
+
+    def run(self):
+        while True:
+            period, topic = self.queue.get()
+            try:
+                # a slot can take a few batches if some questions fail validation
+                for _ in range(self.target):
+                    missing = self.target - self.bank.count(period, topic)
+                    if missing <= 0:
+                        break
+                    questions = self.generate(period, topic, min(self.batch_size, missing))
+                    if not questions:
+                        break
+                    self.bank.add(period, topic, questions)
+            except Exception as e:
+                print(f"Error prefetching questions: {str(e)}")
+            finally:
+                with self.lock:
+                    self.pending.discard((period, topic))
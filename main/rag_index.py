@@ -0,0 +1,336 @@
+import json
+import os
+import bisect
+import hashlib
+from collections import Counter
+from typing import List, Dict, Callable, Iterable, Optional, Sequence, Tuple
+import numpy as np
+
+# snapshot file layout:
+#   magic (8 bytes) | header length (uint64 le) | json header | arrays (64-byte aligned)
+# the header records dtype/shape/offset of every array plus the source files it was built from
+SNAPSHOT_MAGIC = b"APRAGIDX"
+SNAPSHOT_VERSION = 3
+SNAPSHOT_FILE = "rag_index.bin"
+ALIGN = 64
+
+# bm25 tuning params (baked into post_weights, so changing them invalidates snapshots)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# all numeric arrays stored in the snapshot (name -> dtype)
+INDEX_ARRAYS = {
+    "vocab_blob": np.uint8,       # sorted terms, utf-8, concatenated
+    "vocab_offsets": np.int64,    # term i is vocab_blob[vocab_offsets[i]:vocab_offsets[i + 1]]
+    "post_offsets": np.int64,     # postings of term i are post_*[post_offsets[i]:post_offsets[i + 1]]
+    "post_docs": np.int32,        # chunk idx for each posting
+    "post_tfs": np.int32,         # term freq for each posting
+    "post_weights": np.float32,   # bm25 tf-idf weight for each posting (chunk x term matrix values)
+    "doc_lengths": np.int32,      # number of words in each chunk
+    "period_mask": np.int16,      # bit i set if "period i" appears in the chunk's period title
+    "is_exam": np.uint8,          # 1 for exam info chunks
+    "text_blob": np.uint8,        # chunk texts, utf-8, concatenated (empty for chunks kept in a shard store)
+    "text_offsets": np.int64,
+    "meta_blob": np.uint8,        # chunk metadata, one json object per chunk (same)
+    "meta_offsets": np.int64,
+}
+
+def file_sha256(path: str) -> str:
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def source_signature(paths: List[str]) -> Dict[str, Dict]:
+    """mtime, size and content hash of every source file"""
+    signature = {}
+    for path in paths:
+        stat = os.stat(path)
+        signature[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": file_sha256(path)}
+    return signature
+
+def sources_unchanged(recorded: Dict[str, Dict], paths: List[str]) -> bool:
+    """check the source files against the signature stored in a snapshot
+
+    only files whose mtime or size moved get re-hashed, so a touched but
+    otherwise identical file doesnt force a rebuild
+    """
+    if sorted(recorded) != sorted(paths):
+        return False
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        info = recorded[path]
+        if stat.st_mtime_ns == info["mtime_ns"] and stat.st_size == info["size"]:
+            continue
+        if file_sha256(path) != info["sha256"]:
+            return False
+    return True
+
+def write_snapshot(path: str, header: Dict, arrays: Dict[str, np.ndarray]):
+    """write named arrays plus a json header to path (atomically, via a temp file + rename)"""
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+
+    header_bytes = json.dumps(dict(header, arrays=layout)).encode('utf-8')
+    data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+def read_snapshot(path: str) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+    """memory-map a file written by write_snapshot; returns (header, arrays) or None"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            header_len = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_len).decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+
+    data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+    # plain ndarray view of the mapping: np.memmap slices pay python-level subclass
+    # overhead on every postings lookup
+    buf = np.memmap(path, dtype=np.uint8, mode='r').view(np.ndarray)
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"]))
+        start = data_start + info["offset"]
+        arrays[name] = buf[start:start + count * dtype.itemsize].view(dtype).reshape(info["shape"])
+    return header, arrays
+
+def bm25_weights(post_offsets: np.ndarray, post_docs: np.ndarray, post_tfs: np.ndarray,
+                 doc_lengths: np.ndarray, avg_doc_length: float) -> np.ndarray:
+    """idf * saturated tf for every posting
+
+    a query's bm25 score is then just the sum of these weights over its terms,
+    i.e. a sparse dot product against the chunk x term matrix
+    """
+    num_docs = len(doc_lengths)
+    doc_freqs = np.diff(post_offsets)
+    idf = np.log(1 + (num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+    posting_idf = np.repeat(idf, doc_freqs)
+
+    tfs = post_tfs.astype(np.float64)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[post_docs] / (avg_doc_length or 1.0))
+    return (posting_idf * tfs * (BM25_K1 + 1) / (tfs + norm)).astype(np.float32)
+
+def encode_strings(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """pack strings into a utf-8 blob plus an offsets array"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+def decode_string(blob: np.ndarray, offsets: np.ndarray, i: int) -> str:
+    """read string i back out of a blob/offsets pair"""
+    return bytes(blob[offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+def decode_term_ids(blob: np.ndarray, offsets: np.ndarray) -> Dict[str, int]:
+    """every string of a blob/offsets pair mapped to its position"""
+    raw = bytes(blob)
+    bounds = offsets.tolist()
+    return {raw[bounds[i]:bounds[i + 1]].decode('utf-8'): i for i in range(len(bounds) - 1)}
+
+class StringTable(Sequence):
+    """read-only sequence view over a blob/offsets pair (decodes on access)"""
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return decode_string(self.blob, self.offsets, i)
+
+class ChunkView(Sequence):
+    """lazy list of chunk dicts backed by the snapshot's text and metadata blobs"""
+    def __init__(self, index: "RetrievalIndex", start: int = 0, stop: Optional[int] = None):
+        self.index = index
+        self.start = start
+        self.stop = index.num_docs if stop is None else stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.index.chunk(self.start + i)
+
+class RetrievalIndex:
+    """flat-array inverted index over the ced chunks
+
+    the same arrays back both a freshly built index and one memory-mapped
+    from a snapshot file, so scoring code doesnt care where it came from
+    """
+    def __init__(self, arrays: Dict[str, np.ndarray], header: Dict):
+        self.arrays = arrays
+        self.header = header
+        self.vocab = StringTable(arrays["vocab_blob"], arrays["vocab_offsets"])
+        # term -> id, decoded once: bisecting the mmapped table decoded a term on every probe
+        self.term_ids = decode_term_ids(arrays["vocab_blob"], arrays["vocab_offsets"])
+        self.post_offsets = arrays["post_offsets"]
+        self.post_docs = arrays["post_docs"]
+        self.post_tfs = arrays["post_tfs"]
+        self.post_weights = arrays["post_weights"]
+        self.doc_lengths = arrays["doc_lengths"]
+        self.period_mask = arrays["period_mask"]
+        self.is_exam = arrays["is_exam"]
+        self.num_docs = len(self.doc_lengths)
+        self.avg_doc_length = float(header.get("avg_doc_length", 0.0))
+        self.shards = header.get("shards", [])
+        self.shard_starts = [start for _, start, _ in self.shards]
+        # shards whose text lives in a compact store instead of the blobs above
+        self.external_shards = set(header.get("external_shards", []))
+        self.stores = {}
+
+    @classmethod
+    def build(cls, shards: List[Tuple[str, Iterable[Dict]]], tokenize: Callable[[str], List[str]],
+              external_shards: Iterable[str] = ()) -> "RetrievalIndex":
+        """build the index from (shard name, chunks) pairs
+
+        chunk text/metadata of external_shards isnt copied into the index, it's
+        read back from the shard store on demand
+        """
+        external_shards = set(external_shards)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths, period_mask, is_exam, texts, metas = [], [], [], [], []
+        shard_ranges = []
+
+        idx = 0
+        for name, chunks in shards:
+            start = idx
+            for chunk in chunks:
+                words = tokenize(chunk["text"])
+                doc_lengths.append(len(words))
+                for term, tf in Counter(words).items():
+                    postings.setdefault(term, []).append((idx, tf))
+
+                metadata = chunk.get("metadata", {})
+                title = metadata.get("period_title", "").lower()
+                period_mask.append(sum(1 << i for i in range(1, 10) if f"period {i}" in title))
+                is_exam.append(1 if metadata.get("section") == "Exam Information" else 0)
+                external = name in external_shards
+                texts.append("" if external else chunk["text"])
+                metas.append("" if external else json.dumps(metadata))
+                idx += 1
+            shard_ranges.append([name, start, idx])
+
+        terms = sorted(postings)
+        vocab_blob, vocab_offsets = encode_strings(terms)
+        post_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        if terms:
+            np.cumsum([len(postings[t]) for t in terms], out=post_offsets[1:])
+        flat = [p for t in terms for p in postings[t]]
+        post_docs = np.array([d for d, _ in flat], dtype=np.int32)
+        post_tfs = np.array([tf for _, tf in flat], dtype=np.int32)
+        doc_lengths = np.array(doc_lengths, dtype=np.int32)
+        avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        post_weights = bm25_weights(post_offsets, post_docs, post_tfs, doc_lengths, avg_doc_length)
+        text_blob, text_offsets = encode_strings(texts)
+        meta_blob, meta_offsets = encode_strings(metas)
+
+        arrays = {
+            "vocab_blob": vocab_blob,
+            "vocab_offsets": vocab_offsets,
+            "post_offsets": post_offsets,
+            "post_docs": post_docs,
+            "post_tfs": post_tfs,
+            "post_weights": post_weights,
+            "doc_lengths": doc_lengths,
+            "period_mask": np.array(period_mask, dtype=np.int16),
+            "is_exam": np.array(is_exam, dtype=np.uint8),
+            "text_blob": text_blob,
+            "text_offsets": text_offsets,
+            "meta_blob": meta_blob,
+            "meta_offsets": meta_offsets,
+        }
+        header = {
+            "avg_doc_length": avg_doc_length,
+            "bm25": [BM25_K1, BM25_B],
+            "shards": shard_ranges,
+            "external_shards": sorted(external_shards),
+        }
+        return cls(arrays, header)
+
+    def term_id(self, term: str) -> int:
+        """position of a term in the sorted vocab, or -1 if it isnt indexed"""
+        return self.term_ids.get(term, -1)
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(chunk idxs, bm25 weights) for a term id"""
+        start, stop = self.post_offsets[term_id], self.post_offsets[term_id + 1]
+        return self.post_docs[start:stop], self.post_weights[start:stop]
+
+    def doc_freq(self, term_id: int) -> int:
+        return int(self.post_offsets[term_id + 1] - self.post_offsets[term_id])
+
+    def attach_stores(self, stores: Dict):
+        """hook up the shard stores that hold the text of the external shards"""
+        self.stores = stores
+
+    def chunk(self, i: int) -> Dict:
+        """decode chunk i into the usual {"text", "metadata"} dict"""
+        if self.external_shards:
+            name, start, _ = self.shards[bisect.bisect_right(self.shard_starts, i) - 1]
+            if name in self.external_shards:
+                return self.stores[name].chunk(i - start)
+        return {
+            "text": decode_string(self.arrays["text_blob"], self.arrays["text_offsets"], i),
+            "metadata": json.loads(decode_string(self.arrays["meta_blob"], self.arrays["meta_offsets"], i)),
+        }
+
+    def save(self, path: str, sources: Dict[str, Dict]):
+        """write the index to a snapshot file"""
+        header = dict(self.header, version=SNAPSHOT_VERSION, sources=sources)
+        arrays = {name: np.asarray(self.arrays[name], dtype=dtype) for name, dtype in INDEX_ARRAYS.items()}
+        write_snapshot(path, header, arrays)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["RetrievalIndex"]:
+        """memory-map a snapshot file; returns None if it's missing or from another version"""
+        snapshot = read_snapshot(path)
+        if snapshot is None:
+            return None
+        header, arrays = snapshot
+        if header.get("version") != SNAPSHOT_VERSION or header.get("bm25") != [BM25_K1, BM25_B]:
+            return None
+        return cls(arrays, header)
+
+def open_snapshot(path: str, source_paths: List[str]) -> Optional[RetrievalIndex]:
+    """load a snapshot if it exists and was built from the current source files"""
+    index = RetrievalIndex.load(path)
+    if index is None or not sources_unchanged(index.header.get("sources", {}), source_paths):
+        return None
+    return index
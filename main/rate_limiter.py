@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+# client-side quota, matched to the groq account's limits
+REQUESTS_PER_MINUTE = int(os.environ.get("GROQ_REQUESTS_PER_MINUTE", "30"))
+TOKENS_PER_MINUTE = int(os.environ.get("GROQ_TOKENS_PER_MINUTE", "30000"))
+
+# priority classes, lowest number goes first:
+#   reserve  share of each bucket the class must leave untouched (kept for higher classes)
+#   max_wait seconds the call may be deferred before it is shed (None = wait as long as needed)
+INTERACTIVE, FOLLOW_UP, BACKGROUND = 0, 1, 2
+PRIORITY_CLASSES = {
+    INTERACTIVE: {"reserve": 0.0, "max_wait": None},
+    FOLLOW_UP: {"reserve": 0.1, "max_wait": 60.0},
+    BACKGROUND: {"reserve": 0.25, "max_wait": 300.0},
+}
+
+# query_groq purpose -> priority class (unknown purposes are FOLLOW_UP)
+PURPOSE_PRIORITIES = {
+    "Main chat response": INTERACTIVE,
+    "Generate hint": INTERACTIVE,
+    "Generate feedback": INTERACTIVE,
+    "Generate AP questions": INTERACTIVE,
+    "Summarize conversation": FOLLOW_UP,
+    "Summarize memory": FOLLOW_UP,
+    "Update memory with pattern": BACKGROUND,
+    "Analyze practice problem pattern": BACKGROUND,
+    "Prefetch AP questions": BACKGROUND,
+}
+
+def priority_of(purpose: str) -> int:
+    return PURPOSE_PRIORITIES.get(purpose, FOLLOW_UP)
+
+class TokenBucket:
+    """refills continuously up to capacity; the level may go negative after a settle"""
+    def __init__(self, capacity: float, per_second: float):
+        self.capacity = capacity
+        self.per_second = per_second
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        """time until the level reaches amount"""
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.per_second
+
+class RateScheduler:
+    """token-bucket limits on requests/min and tokens/min, handed out by priority
+
+    waiting calls are served strictly by (priority, arrival); lower classes
+    also have to leave a reserve in both buckets, so near the limit they are
+    deferred (and eventually shed) while interactive calls still go through.
+    a call is charged at most what its class may ever take from a full bucket,
+    so an oversized estimate cant hold up its class forever
+    """
+    def __init__(self, requests_per_minute: int = REQUESTS_PER_MINUTE, tokens_per_minute: int = TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.cond = threading.Condition()
+        self.waiting = []  # heap of (priority, arrival)
+        self.arrivals = itertools.count()
+        self.shed = {}     # purpose -> calls dropped
+
+    def charge(self, purpose: str, tokens: int) -> float:
+        """tokens taken from the bucket for a call estimated at tokens"""
+        reserve = PRIORITY_CLASSES[priority_of(purpose)]["reserve"]
+        return min(tokens, self.tokens.capacity * (1 - reserve))
+
+    def acquire(self, purpose: str, tokens: int) -> bool:
+        """block until the call may go out; False if it was shed instead"""
+        priority = priority_of(purpose)
+        limits = PRIORITY_CLASSES[priority]
+        tokens = self.charge(purpose, tokens)
+        start = time.monotonic()
+        with self.cond:
+            entry = (priority, next(self.arrivals))
+            heapq.heappush(self.waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    need_requests = min(1 + limits["reserve"] * self.requests.capacity, self.requests.capacity)
+                    need_tokens = tokens + limits["reserve"] * self.tokens.capacity
+                    if self.waiting[0] == entry:
+                        if self.requests.level >= need_requests and self.tokens.level >= need_tokens:
+                            self.requests.level -= 1
+                            self.tokens.level -= tokens
+                            return True
+                        wait = max(self.requests.seconds_until(need_requests), self.tokens.seconds_until(need_tokens))
+                    else:
+                        wait = 1.0  # woken when the head moves
+                    if limits["max_wait"] is not None:
+                        remaining = start + limits["max_wait"] - now
+                        if remaining <= 0:
+                            self.shed[purpose] = self.shed.get(purpose, 0) + 1
+                            return False
+                        wait = min(wait, remaining)
+                    self.cond.wait(max(wait, 0.01))
+            finally:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                self.cond.notify_all()
+
+    def settle(self, purpose: str, estimated: int, actual: Optional[int]):
+        """correct the token bucket once the real usage of a call is known"""
+        if actual is None:
+            return
+        with self.cond:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + self.charge(purpose, estimated) - actual)
+            self.cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self.cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                "requests_available": self.requests.level,
+                "tokens_available": self.tokens.level,
+                "waiting": len(self.waiting),
+                "shed": dict(self.shed),
+            }
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+# on-disk cache of llm responses (set LLM_CACHE=0 to turn it off)
+RESPONSE_CACHE_FILE = os.environ.get("LLM_CACHE_FILE", "llm_cache.sqlite3")
+RESPONSE_CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+
+DAY = 24 * 60 * 60
+# purposes are opt-in: only these get cached, each for its own ttl (seconds).
+# left out on purpose: the main chat response (conversational),
+# "Generate AP questions" (the same period/topic should give new questions) and
+# the pattern analyses, whose answers go into the memory log (a cached repeat
+# would count as one more sighting of the pattern when consolidating)
+PURPOSE_TTLS = {
+    "Generate hint": 30 * DAY,
+    "Generate feedback": 7 * DAY,
+    "Summarize memory": 7 * DAY,
+}
+
+# lru eviction once either bound is passed
+MAX_ENTRIES = 5000
+MAX_BYTES = 20 * 1024 * 1024
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+def cache_key(model: str, messages: List[Dict], params: Dict) -> str:
+    """hash of the model, the whitespace-normalized messages and the request params"""
+    normalized = [{"role": m["role"], "content": WHITESPACE_RE.sub(" ", m["content"]).strip()} for m in messages]
+    payload = json.dumps({"model": model, "messages": normalized, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """sqlite-backed llm response cache with per-purpose ttls and lru eviction"""
+    def __init__(self, path: str = RESPONSE_CACHE_FILE, ttls: Dict[str, float] = None,
+                 max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.path = path
+        self.ttls = PURPOSE_TTLS if ttls is None else ttls
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.conn = None
+        self.hits = {}    # purpose -> count
+        self.misses = {}  # purpose -> count
+
+    def connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            # shared between the chat thread and the memory worker, guarded by self.lock
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, purpose TEXT, response TEXT, size INTEGER, created REAL, last_used REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self.conn.commit()
+        return self.conn
+
+    def cacheable(self, purpose: str) -> bool:
+        return self.enabled and purpose in self.ttls
+
+    def get(self, purpose: str, key: str) -> Optional[str]:
+        """cached response for key if it is younger than the purpose's ttl"""
+        if not self.cacheable(purpose):
+            return None
+        now = time.time()
+        with self.lock:
+            conn = self.connect()
+            row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttls[purpose]:
+                self.misses[purpose] = self.misses.get(purpose, 0) + 1
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits[purpose] = self.hits.get(purpose, 0) + 1
+            return row[0]
+
+    def put(self, purpose: str, key: str, response: str):
+        if not self.cacheable(purpose):
+            return
+        now = time.time()
+        with self.lock:
+            conn = self.connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, purpose, response, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, purpose, response, len(response.encode('utf-8')), now, now)
+            )
+            self.evict(conn)
+            conn.commit()
+
+    def evict(self, conn: sqlite3.Connection):
+        """drop least recently used entries until both bounds hold"""
+        count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        doomed = []
+        for key, entry_size in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            size -= entry_size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """hit/miss counts per purpose for this process"""
+        purposes = sorted(set(self.hits) | set(self.misses))
+        return {p: {"hits": self.hits.get(p, 0), "misses": self.misses.get(p, 0)} for p in purposes}
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
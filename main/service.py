@@ -0,0 +1,617 @@
+"""the chat and practice flows of loop.py as a multi-student http / websocket service"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from functools import partial
+from typing import Dict, List, Optional
+import aiohttp
+from aiohttp import web
+from rag_utils import BackgroundRAGSystem
+from async_groq_client import AsyncGroqClient
+from groq_client import GroqError
+from memory_log import period_of
+from student_memory import StudentMemory
+from tokens import request_tokens
+from conversation import ConversationContext, SUMMARY_TOKEN_LIMIT
+from response_cache import ResponseCache, RESPONSE_CACHE_FILE, cache_key
+from rate_limiter import RateScheduler, PRIORITY_CLASSES, priority_of
+from llm_metrics import LLMMetrics, METRICS_LOG_FILE, PROMETHEUS_FILE
+from question_bank import (QuestionBank, QuestionPrefetcher, QUESTION_BANK_FILE, QUESTION_BATCH_SIZE,
+                           parse_question_batch, format_question)
+from tutor_prompts import (AP_PERIODS, CHAT_MODEL, TASK_MODEL, chat_messages, question_messages, hint_messages,
+                           feedback_messages, skipped_note, answered_note, pattern_messages, practice_pattern_messages,
+                           memory_summary_messages, conversation_summary_messages)
+
+# shared caches + one memory directory per student (students/<student_id>)
+SERVICE_DATA_DIR = os.environ.get("SERVICE_DATA_DIR", "service_data")
+
+# sessions idle this long are closed (their open conversation still goes to memory)
+SESSION_IDLE_SECONDS = float(os.environ.get("SESSION_IDLE_SECONDS", "1800"))
+SESSION_SWEEP_SECONDS = 60
+
+# threads for memory / sqlite work, for retrieval scoring, for the response cache + metrics log
+# and (per priority class) for calls waiting on the rate limiter
+WORKER_THREADS = int(os.environ.get("SERVICE_WORKER_THREADS", "32"))
+RETRIEVAL_THREADS = int(os.environ.get("SERVICE_RETRIEVAL_THREADS", "4"))
+IO_THREADS = int(os.environ.get("SERVICE_IO_THREADS", "4"))
+LIMITER_THREADS = int(os.environ.get("SERVICE_LIMITER_THREADS", "64"))
+
+# per-call llm log lines are off by default here, hundreds of sessions would flood stdout
+SERVICE_LOG_VERBOSITY = int(os.environ.get("LLM_LOG_VERBOSITY", "0"))
+
+RAG_ENABLED = os.environ.get("RAG_ENABLED", "1") != "0"
+
+STUDENT_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def resolve_period(value) -> Optional[str]:
+    """an AP_PERIODS entry from its number (1-9) or its full name"""
+    if value in AP_PERIODS:
+        return value
+    try:
+        index = int(value) - 1
+    except (TypeError, ValueError):
+        return None
+    return AP_PERIODS[index] if 0 <= index < len(AP_PERIODS) else None
+
+def json_error(error_class, message: str) -> web.HTTPException:
+    return error_class(text=json.dumps({"error": message}), content_type="application/json")
+
+async def json_body(request: web.Request) -> Dict:
+    if not request.body_exists:
+        return {}
+    try:
+        body = await request.json()
+    except ValueError:
+        raise json_error(web.HTTPBadRequest, "request body must be json")
+    if not isinstance(body, dict):
+        raise json_error(web.HTTPBadRequest, "request body must be a json object")
+    return body
+
+class StudentState:
+    """one student's memory, shared by all of their sessions"""
+    def __init__(self, student_id: str, memory: StudentMemory):
+        self.id = student_id
+        self.memory = memory
+        # memory updates run one at a time per student, in submit order (asyncio locks are fifo)
+        self.lock = asyncio.Lock()
+        self.sessions = set()
+        self.pending = 0  # memory updates queued or running
+
+class TutorSession:
+    """one student's conversation context + the practice question in progress"""
+    def __init__(self, session_id: str, student: StudentState, summarize):
+        self.id = session_id
+        self.student = student
+        self.conversation = ConversationContext(summarize)
+        self.last_turn = None  # (question, response) of the open conversation, saved to memory when it ends
+        self.practice = None   # {"question", "period", "topic"} while a question is unanswered
+        self.lock = asyncio.Lock()  # one request at a time per session
+        self.websockets = 0
+        self.last_used = time.monotonic()
+
+class TutorService:
+    """shared state and request handlers of the service
+
+    everything below runs on the event loop thread except the blocking pieces
+    (memory, sqlite, retrieval, rate limiter waits), which go to thread pools.
+    sync callbacks that need the llm (memory / conversation summaries, question
+    prefetch) run on those threads and hop back onto the loop for the call
+    """
+    def __init__(self, data_dir: str = SERVICE_DATA_DIR, rag_kwargs: Dict = None):
+        self.data_dir = data_dir
+        self.groq_client = AsyncGroqClient()
+        self.response_cache = ResponseCache(self.data_path(RESPONSE_CACHE_FILE))
+        self.rate_scheduler = RateScheduler()
+        self.llm_metrics = LLMMetrics(self.data_path(METRICS_LOG_FILE), verbosity=SERVICE_LOG_VERBOSITY)
+        self.rag_loader = BackgroundRAGSystem(**(rag_kwargs or {}))
+        self.question_bank = QuestionBank(self.data_path(QUESTION_BANK_FILE))
+        self.question_prefetcher = QuestionPrefetcher(self.question_bank, self.prefetch_questions)
+        self.worker_pool = ThreadPoolExecutor(WORKER_THREADS, thread_name_prefix="service-worker")
+        self.retrieval_pool = ThreadPoolExecutor(RETRIEVAL_THREADS, thread_name_prefix="service-retrieval")
+        # quick local writes/reads only, never bridges back to the loop, so it cant fill up
+        # with threads waiting on an llm call the way worker_pool can
+        self.io_pool = ThreadPoolExecutor(IO_THREADS, thread_name_prefix="service-io")
+        # one pool per priority class: a full pool of deferred background waits cant queue
+        # an interactive call behind them (within a class the scheduler is fifo anyway)
+        self.limiter_pools = {
+            priority: ThreadPoolExecutor(LIMITER_THREADS, thread_name_prefix=f"service-limiter-{priority}")
+            for priority in PRIORITY_CLASSES
+        }
+        # only touched from the event loop thread, so no lock
+        self.students = {}  # student id -> StudentState
+        self.sessions = {}  # session id -> TutorSession
+        self.memory_tasks = set()
+        self.loop = None
+        self.sweeper = None
+
+    def data_path(self, name: str) -> str:
+        return os.path.join(self.data_dir, name) if name else name
+
+    async def run_blocking(self, func, *args, pool: ThreadPoolExecutor = None):
+        return await self.loop.run_in_executor(pool or self.worker_pool, func, *args)
+
+    def bridge(self, coro):
+        """run a coroutine on the event loop from a worker thread and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    # llm calls
+
+    async def acquire(self, purpose: str, tokens: int) -> bool:
+        """rate_scheduler.acquire on the limiter pool of the call's priority class"""
+        return await self.run_blocking(self.rate_scheduler.acquire, purpose, tokens,
+                                       pool=self.limiter_pools[priority_of(purpose)])
+
+    async def record_call(self, purpose: str, model: str, **fields):
+        """llm_metrics.record_call off the loop (it may append to the metrics log)"""
+        await self.run_blocking(partial(self.llm_metrics.record_call, purpose, model, **fields), pool=self.io_pool)
+
+    async def query_llm(self, messages: List[Dict], model: str = TASK_MODEL, max_completion_tokens: int = 1000,
+                        purpose: str = "Unknown") -> Optional[str]:
+        """async query_groq: response cache, rate limiter, retrying client, metrics"""
+        # cache lookups are on the io pool, so they never wait behind memory work or limiter waits
+        key = cache_key(model, messages, {"max_completion_tokens": max_completion_tokens, "temperature": 0.7})
+        cached = await self.run_blocking(self.response_cache.get, purpose, key, pool=self.io_pool)
+        if cached is not None:
+            await self.record_call(purpose, model, cached=True)
+            return cached
+
+        estimated_tokens = request_tokens(messages, max_completion_tokens)
+        if not await self.acquire(purpose, estimated_tokens):
+            await self.record_call(purpose, model, shed=True)
+            return None
+
+        start = time.perf_counter()
+        error = None
+        try:
+            response_json = await self.groq_client.chat(messages, model, max_completion_tokens)
+            self.rate_scheduler.settle(purpose, estimated_tokens, (response_json.get("usage") or {}).get("total_tokens"))
+
+            if "error" in response_json:
+                error = str(response_json["error"])
+                print(f"API Error: {response_json['error']}")
+                return None
+            if "choices" not in response_json or not response_json["choices"]:
+                error = "unexpected response"
+                print(f"Unexpected API response: {response_json}")
+                return None
+
+            response = response_json["choices"][0]["message"]["content"].strip()
+            await self.run_blocking(self.response_cache.put, purpose, key, response, pool=self.io_pool)
+            return response
+        except Exception as e:
+            error = str(e)
+            print(f"Error processing response: {e}")
+            return None
+        finally:
+            call_stats = self.groq_client.last_call_stats()
+            await self.record_call(purpose, model, latency=time.perf_counter() - start, usage=call_stats["usage"],
+                                   error=error, retries=call_stats["retries"])
+
+    async def query_llm_stream(self, messages: List[Dict], model: str = CHAT_MODEL, max_completion_tokens: int = 1000,
+                               purpose: str = "Unknown", on_token=None) -> Optional[str]:
+        """async query_groq_stream, awaiting on_token(token) for each streamed token"""
+        estimated_tokens = request_tokens(messages, max_completion_tokens)
+        if not await self.acquire(purpose, estimated_tokens):
+            await self.record_call(purpose, model, shed=True)
+            return None
+
+        pieces = []
+        ttft = None
+        error = None
+        start = time.perf_counter()
+        try:
+            # aclosing so a stream abandoned halfway (client went away) gives its connection back right away
+            async with aclosing(self.groq_client.stream_chat(messages, model, max_completion_tokens)) as tokens:
+                async for token in tokens:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    pieces.append(token)
+                    if on_token:
+                        await on_token(token)
+        except GroqError as e:
+            error = str(e)
+            print(f"API Error: {e}")
+            return None
+        except Exception as e:
+            error = str(e)
+            print(f"Error processing response: {e}")
+            return None
+        finally:
+            call_stats = self.groq_client.last_call_stats()
+            # usage comes on the stream's last chunk (none if it broke off early)
+            self.rate_scheduler.settle(purpose, estimated_tokens, (call_stats["usage"] or {}).get("total_tokens"))
+            await self.record_call(purpose, model, latency=time.perf_counter() - start, ttft=ttft,
+                                   usage=call_stats["usage"], error=error, retries=call_stats["retries"])
+
+        response = "".join(pieces).strip()
+        return response or None
+
+    def summarize_memory(self, label: str, memory: str) -> Optional[str]:
+        """StudentMemory's summarizer (called on worker threads)"""
+        return self.bridge(self.query_llm(memory_summary_messages(label, memory), TASK_MODEL, 150, "Summarize memory"))
+
+    def summarize_conversation(self, summary: str, turns: str) -> Optional[str]:
+        """ConversationContext's summarizer (called on its fold thread)"""
+        return self.bridge(self.query_llm(conversation_summary_messages(summary, turns), TASK_MODEL,
+                                          SUMMARY_TOKEN_LIMIT, "Summarize conversation"))
+
+    # practice questions
+
+    async def generate_questions(self, period: str, topic: str = None, count: int = QUESTION_BATCH_SIZE,
+                                 purpose: str = "Generate AP questions") -> List[Dict]:
+        messages = question_messages(period, topic, count)
+        response = await self.query_llm(messages, TASK_MODEL, 500 * count, purpose)
+        return parse_question_batch(response)
+
+    def prefetch_questions(self, period: str, topic: str, count: int) -> List[Dict]:
+        """QuestionPrefetcher's generator (called on its thread, lowest priority for the rate limiter)"""
+        return self.bridge(self.generate_questions(period, topic, count, "Prefetch AP questions"))
+
+    async def next_practice_question(self, period: str, topic: str = None) -> Optional[Dict]:
+        """serve a question from the shared bank, generating a batch only if the bank has none ready"""
+        question = await self.run_blocking(self.question_bank.pop, period, topic)
+        if question is None:
+            questions = await self.generate_questions(period, topic)
+            if not questions:
+                return None
+            question, rest = questions[0], questions[1:]
+            await self.run_blocking(self.question_bank.add, period, topic, rest)
+        # top the slot back up in the background for next time
+        self.question_prefetcher.request(period, topic)
+        return question
+
+    # students, sessions and memory
+
+    async def student(self, student_id: str) -> StudentState:
+        student = self.students.get(student_id)
+        if student is None:
+            directory = os.path.join(self.data_dir, "students", student_id)
+            os.makedirs(directory, exist_ok=True)
+            memory = await self.run_blocking(StudentMemory, self.summarize_memory, directory)
+            # another request for the same student may have got here first
+            student = self.students.get(student_id)
+            if student is None:
+                student = self.students[student_id] = StudentState(student_id, memory)
+                # batch pass over whatever built up in earlier runs
+                self.schedule_memory(student, self.consolidate_memory)
+        return student
+
+    def schedule_memory(self, student: StudentState, job, *args):
+        """run a memory job for a student in the background, one at a time per student"""
+        async def run():
+            try:
+                async with student.lock:
+                    await job(student, *args)
+            except Exception as e:
+                print(f"Error updating memory for {student.id}: {str(e)}")
+            finally:
+                student.pending -= 1
+
+        student.pending += 1
+        task = asyncio.create_task(run())
+        self.memory_tasks.add(task)
+        task.add_done_callback(self.memory_tasks.discard)
+
+    async def consolidate_memory(self, student: StudentState):
+        await self.run_blocking(student.memory.consolidator.consolidate)
+
+    async def refresh_summaries(self, student: StudentState):
+        await self.run_blocking(student.memory.refresh_summaries)
+
+    async def update_memory(self, student: StudentState, question: str, response: str, feedback: str):
+        """analyze an interaction and save any pattern to the student's memory"""
+        messages = pattern_messages(question, response, feedback)
+        pattern = await self.query_llm(messages, TASK_MODEL, 150, "Update memory with pattern")
+        if pattern:
+            await self.run_blocking(student.memory.save, pattern, period_of(feedback) or period_of(question))
+
+    async def save_practice_problem(self, student: StudentState, problem: str, period: str):
+        """analyze a practice problem and save any pattern to the student's memory"""
+        messages = practice_pattern_messages(problem, period)
+        pattern = await self.query_llm(messages, TASK_MODEL, 150, "Analyze practice problem pattern")
+        if pattern:
+            await self.run_blocking(student.memory.save, pattern, period_of(period))
+
+    def end_conversation(self, session: TutorSession):
+        """send the finished conversation's last exchange to memory and start a fresh context"""
+        if session.last_turn:
+            self.schedule_memory(session.student, self.update_memory, *session.last_turn, "")
+        session.last_turn = None
+        session.conversation = ConversationContext(self.summarize_conversation)
+
+    def close_session(self, session: TutorSession):
+        self.end_conversation(session)
+        self.sessions.pop(session.id, None)
+        session.student.sessions.discard(session.id)
+
+    async def sweep_sessions(self):
+        """close idle sessions and drop students with no sessions and no memory work left"""
+        while True:
+            await asyncio.sleep(SESSION_SWEEP_SECONDS)
+            cutoff = time.monotonic() - SESSION_IDLE_SECONDS
+            for session in list(self.sessions.values()):
+                if session.last_used < cutoff and not session.websockets and not session.lock.locked():
+                    self.close_session(session)
+            for student in list(self.students.values()):
+                if not student.sessions and not student.pending:
+                    del self.students[student.id]
+
+    def get_rag_context(self, query: str) -> str:
+        """ced context for a query, packed into the rag token budget"""
+        if not RAG_ENABLED:
+            return ""
+        try:
+            return self.rag_loader.get().get_context(query)
+        except Exception as e:
+            print(f"Error retrieving context: {str(e)}")
+            return ""
+
+    async def chat_turn(self, session: TutorSession, question: str, on_token=None) -> Optional[str]:
+        """one chat_with_memory turn: retrieval + memory lookup side by side, then the main llm call"""
+        rag_context, relevant_memory = await asyncio.gather(
+            self.run_blocking(self.get_rag_context, question, pool=self.retrieval_pool),
+            self.run_blocking(session.student.memory.relevant, question),
+        )
+        if session.student.memory.summaries.stale:
+            # out of date summaries are rebuilt in the background, ready for the next turn
+            self.schedule_memory(session.student, self.refresh_summaries)
+        history = await self.run_blocking(session.conversation.messages)
+        messages = chat_messages(question, relevant_memory, rag_context, history)
+        if on_token:
+            response = await self.query_llm_stream(messages, CHAT_MODEL, 1000, "Main chat response", on_token)
+        else:
+            response = await self.query_llm(messages, CHAT_MODEL, 1000, "Main chat response")
+        if response:
+            await self.run_blocking(session.conversation.add_turn, question, response)
+            session.last_turn = (question, response)
+        return response
+
+    # http handlers
+
+    def get_session(self, request: web.Request) -> TutorSession:
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            raise json_error(web.HTTPNotFound, "unknown or expired session")
+        session.last_used = time.monotonic()
+        return session
+
+    async def create_session(self, request: web.Request) -> web.Response:
+        body = await json_body(request)
+        student_id = str(body.get("student_id", ""))
+        if not STUDENT_ID_RE.match(student_id):
+            raise json_error(web.HTTPBadRequest, "student_id must be 1-64 letters, digits, '_' or '-'")
+        student = await self.student(student_id)
+        session = TutorSession(uuid.uuid4().hex, student, self.summarize_conversation)
+        self.sessions[session.id] = session
+        student.sessions.add(session.id)
+        return web.json_response({"session_id": session.id, "student_id": student.id}, status=201)
+
+    async def delete_session(self, request: web.Request) -> web.Response:
+        session = self.get_session(request)
+        async with session.lock:
+            self.close_session(session)
+        return web.json_response({"closed": session.id})
+
+    async def chat(self, request: web.Request) -> web.Response:
+        session = self.get_session(request)
+        body = await json_body(request)
+        question = str(body.get("question", "")).strip()
+        if not question:
+            raise json_error(web.HTTPBadRequest, "question is required")
+        async with session.lock:
+            if body.get("new_conversation"):
+                self.end_conversation(session)
+            response = await self.chat_turn(session, question)
+        if not response:
+            raise json_error(web.HTTPBadGateway, "the tutor could not answer, please try again")
+        return web.json_response({"response": response})
+
+    async def memory(self, request: web.Request) -> web.Response:
+        session = self.get_session(request)
+        student = session.student
+        period = None
+        if "period" in request.query:
+            ap_period = resolve_period(request.query["period"])
+            if ap_period is None:
+                raise json_error(web.HTTPBadRequest, f"period must be a number from 1 to {len(AP_PERIODS)}")
+            period = period_of(ap_period)
+        try:
+            limit = int(request.query["limit"]) if "limit" in request.query else None
+        except ValueError:
+            raise json_error(web.HTTPBadRequest, "limit must be a number")
+        # queued behind the student's pending updates, so the answer includes them
+        async with student.lock:
+            text = await self.run_blocking(student.memory.text, period, limit)
+        return web.json_response({"student_id": student.id, "memory": text})
+
+    async def practice_question(self, request: web.Request) -> web.Response:
+        session = self.get_session(request)
+        body = await json_body(request)
+        period = resolve_period(body.get("period"))
+        if period is None:
+            raise json_error(web.HTTPBadRequest, f"period must be a number from 1 to {len(AP_PERIODS)}")
+        topic = str(body.get("topic") or "").strip()
+        async with session.lock:
+            # general questions for the next period, which students tend to move on to
+            # (the slot just asked for is topped up by next_practice_question)
+            index = AP_PERIODS.index(period)
+            for ap_period in AP_PERIODS[index + 1:index + 2]:
+                self.question_prefetcher.request(ap_period)
+            question = await self.next_practice_question(period, topic)
+            if not question:
+                raise json_error(web.HTTPBadGateway, "could not generate a practice question, please try again")
+            session.practice = {"question": question, "period": period, "topic": topic}
+        return web.json_response({"period": period, "topic": topic, "question": question["question"],
+                                  "options": question["options"]})
+
+    def open_practice(self, session: TutorSession) -> Dict:
+        if session.practice is None:
+            raise json_error(web.HTTPConflict, "no practice question is open, ask for one first")
+        return session.practice
+
+    async def practice_hint(self, request: web.Request) -> web.Response:
+        session = self.get_session(request)
+        async with session.lock:
+            practice = self.open_practice(session)
+            messages = hint_messages(practice["question"]["question"], practice["period"], practice["topic"])
+            hint = await self.query_llm(messages, TASK_MODEL, 100, "Generate hint")
+        if not hint:
+            raise json_error(web.HTTPBadGateway, "could not generate a hint, please try again")
+        return web.json_response({"hint": hint})
+
+    async def practice_answer(self, request: web.Request) -> web.Response:
+        session = self.get_session(request)
+        body = await json_body(request)
+        attempt = str(body.get("answer", "")).strip().upper()
+        async with session.lock:
+            practice = self.open_practice(session)
+            question, period, topic = practice["question"], practice["period"], practice["topic"]
+            question_text, correct_answer = question["question"], question["answer"]
+            student = session.student
+
+            selected_option = None
+            if attempt == "SKIP":
+                self.schedule_memory(student, self.update_memory, *skipped_note(question_text, period, topic))
+            elif attempt in ['A', 'B', 'C', 'D']:
+                selected_option = next((opt for opt in question["options"] if opt.startswith(attempt + ")")), None)
+            if selected_option is None and attempt != "SKIP":
+                raise json_error(web.HTTPBadRequest, "answer must be A, B, C, D or skip")
+
+            messages = feedback_messages(question_text, period, topic, selected_option, correct_answer)
+            feedback = await self.query_llm(messages, TASK_MODEL, 150, "Generate feedback")
+            if feedback:
+                self.schedule_memory(student, self.update_memory,
+                                     *answered_note(question_text, period, topic, selected_option, correct_answer, feedback))
+            self.schedule_memory(student, self.save_practice_problem, format_question(question), period)
+            session.practice = None
+        return web.json_response({
+            "selected_option": selected_option,
+            "correct_answer": correct_answer,
+            "correct": bool(selected_option and selected_option.startswith(correct_answer)),
+            "feedback": feedback,
+            "explanation": question["explanation"],
+            "historical_context": question["context"],
+            "ap_relevance": question["relevance"],
+        })
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """streamed chat: send {"question", "new_conversation"}, get {"type": "token"}... then {"type": "done"}"""
+        session = self.get_session(request)
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+
+        async def send_token(token: str):
+            await ws.send_json({"type": "token", "content": token})
+
+        session.websockets += 1
+        try:
+            async for message in ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                try:
+                    data = json.loads(message.data)
+                    question = str(data.get("question", "")).strip()
+                except (ValueError, AttributeError):
+                    question = ""
+                if not question:
+                    await ws.send_json({"type": "error", "error": "send {\"question\": ...} as json"})
+                    continue
+                session.last_used = time.monotonic()
+                async with session.lock:
+                    if data.get("new_conversation"):
+                        self.end_conversation(session)
+                    response = await self.chat_turn(session, question, on_token=send_token)
+                if ws.closed:
+                    break
+                if response:
+                    await ws.send_json({"type": "done", "response": response})
+                else:
+                    await ws.send_json({"type": "error", "error": "the tutor could not answer, please try again"})
+        finally:
+            session.websockets -= 1
+        return ws
+
+    async def periods(self, request: web.Request) -> web.Response:
+        return web.json_response({"periods": AP_PERIODS})
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "sessions": len(self.sessions),
+            "students": len(self.students),
+            "memory_tasks": len(self.memory_tasks),
+            "retrieval_ready": self.rag_loader.ready,
+        })
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        """llm metrics plus service gauges in the prometheus text format"""
+        limiter = self.rate_scheduler.stats()
+        gauges = {
+            "tutor_sessions": len(self.sessions),
+            "tutor_students": len(self.students),
+            "tutor_memory_tasks": len(self.memory_tasks),
+            "tutor_rate_limiter_waiting": limiter["waiting"],
+        }
+        lines = [self.llm_metrics.prometheus_text()]
+        for name, value in gauges.items():
+            lines.append(f"# TYPE {name} gauge\n{name} {value}\n")
+        return web.Response(text="".join(lines), content_type="text/plain")
+
+    # lifecycle
+
+    async def on_startup(self, app: web.Application):
+        self.loop = asyncio.get_running_loop()
+        os.makedirs(self.data_dir, exist_ok=True)
+        await self.groq_client.start()
+        if RAG_ENABLED:
+            self.rag_loader.start()
+        self.sweeper = asyncio.create_task(self.sweep_sessions())
+
+    async def on_cleanup(self, app: web.Application):
+        self.sweeper.cancel()
+        for session in list(self.sessions.values()):
+            self.close_session(session)
+        # let queued memory updates finish (they still need the llm client)
+        if self.memory_tasks:
+            await asyncio.gather(*list(self.memory_tasks), return_exceptions=True)
+        await self.groq_client.close()
+        self.llm_metrics.write_prometheus(self.data_path(PROMETHEUS_FILE))
+        for pool in (self.worker_pool, self.retrieval_pool, self.io_pool, *self.limiter_pools.values()):
+            pool.shutdown(wait=False)
+        self.question_bank.close()
+        self.response_cache.close()
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.post("/sessions", self.create_session),
+            web.delete("/sessions/{session_id}", self.delete_session),
+            web.post("/sessions/{session_id}/chat", self.chat),
+            web.get("/sessions/{session_id}/memory", self.memory),
+            web.post("/sessions/{session_id}/practice/question", self.practice_question),
+            web.post("/sessions/{session_id}/practice/hint", self.practice_hint),
+            web.post("/sessions/{session_id}/practice/answer", self.practice_answer),
+            web.get("/sessions/{session_id}/ws", self.websocket),
+            web.get("/periods", self.periods),
+            web.get("/health", self.health),
+            web.get("/metrics", self.metrics),
+        ])
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AP US History Study Buddy service (many students, one process)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data-dir", default=SERVICE_DATA_DIR, help="shared caches and per-student memory")
+    args = parser.parse_args()
+    rag_kwargs = {"base_dir": os.environ["RAG_DATA_DIR"]} if os.environ.get("RAG_DATA_DIR") else {}
+    service = TutorService(args.data_dir, rag_kwargs)
+    web.run_app(service.make_app(), host=args.host, port=args.port)
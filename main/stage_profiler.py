@@ -0,0 +1,168 @@
+import atexit
+import cProfile
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# opt-in per-turn stage timings (STAGE_PROFILE=1 or loop.py --profile)
+PROFILE_ENABLED = os.environ.get("STAGE_PROFILE", "0") != "0"
+# one json span tree per turn / background job
+PROFILE_LOG_FILE = os.environ.get("STAGE_PROFILE_FILE", "stage_profile.jsonl")
+# directory for cprofile dumps of the local stages ("" = no cprofile)
+CPROFILE_DIR = os.environ.get("STAGE_PROFILE_CPROFILE", "")
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """nearest-rank percentile (None if there are no values)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+class StageProfiler:
+    """nested timing spans for the stages of a turn
+
+    a span opened with no parent on its thread is a root: when it closes its
+    whole tree is written as one json line. work handed to another thread
+    keeps its parent through wrap(). durations are also kept per stage name
+    for the p50/p95 report at exit, and local stages (no network) can be run
+    under cprofile, one accumulated .prof file per stage
+    """
+    def __init__(self, log_file: str = PROFILE_LOG_FILE, enabled: bool = PROFILE_ENABLED, cprofile_dir: str = CPROFILE_DIR):
+        self.log_file = log_file
+        self.enabled = False
+        self.cprofile_dir = ""
+        self.lock = threading.Lock()
+        self.local = threading.local()  # .stack of open spans, .profiling while a cprofile runs on this thread
+        self.durations = {}  # stage -> [seconds]
+        self.profiles = {}   # stage -> (cProfile.Profile, lock)
+        if enabled:
+            self.enable(cprofile_dir)
+
+    def enable(self, cprofile_dir: str = ""):
+        if not self.enabled:
+            atexit.register(self.close)
+        self.enabled = True
+        self.cprofile_dir = cprofile_dir or self.cprofile_dir
+
+    def current(self) -> Optional[Dict]:
+        stack = getattr(self.local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, local: bool = False, parent: Dict = None):
+        """time the block as stage `name` (local=True: also cprofile it if enabled)"""
+        if not self.enabled:
+            yield
+            return
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        parent = parent or self.current()
+        node = {"name": name, "thread": threading.current_thread().name, "start": time.time(), "children": []}
+        self.local.stack.append(node)
+        profile = self.start_cprofile(name) if local else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            if profile is not None:
+                self.stop_cprofile(name, profile)
+            self.local.stack.pop()
+            node["duration"] = round(duration, 6)
+            with self.lock:
+                self.durations.setdefault(name, []).append(duration)
+                if parent is not None:
+                    parent["children"].append(node)
+            if parent is None:
+                self.write_tree(node)
+
+    def wrap(self, name: str, fn: Callable, local: bool = False) -> Callable:
+        """fn run as a child of the span open right now, even on another thread"""
+        parent = self.current() if self.enabled else None
+        @functools.wraps(fn)
+        def wrapped(*args, **kwargs):
+            with self.span(name, local=local, parent=parent):
+                return fn(*args, **kwargs)
+        return wrapped
+
+    def stage(self, name: str, local: bool = False) -> Callable:
+        """decorator: every call of the function is a span"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapped(*args, **kwargs):
+                with self.span(name, local=local):
+                    return fn(*args, **kwargs)
+            return wrapped
+        return decorate
+
+    def start_cprofile(self, name: str) -> Optional[cProfile.Profile]:
+        # one profiler per thread at a time (a nested local stage is covered by the outer one),
+        # and each stage's profiler is only ever enabled on one thread at a time
+        if not self.cprofile_dir or getattr(self.local, "profiling", False):
+            return None
+        with self.lock:
+            profile, lock = self.profiles.setdefault(name, (cProfile.Profile(), threading.Lock()))
+        if not lock.acquire(blocking=False):
+            return None
+        try:
+            profile.enable()
+        except ValueError:  # another profiler is already active
+            lock.release()
+            return None
+        self.local.profiling = True
+        return profile
+
+    def stop_cprofile(self, name: str, profile: cProfile.Profile):
+        profile.disable()
+        self.local.profiling = False
+        self.profiles[name][1].release()
+
+    def write_tree(self, node: Dict):
+        if not self.log_file:
+            return
+        with self.lock:
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(node) + "\n")
+
+    def report(self) -> List[Dict]:
+        """count / p50 / p95 / total seconds per stage, slowest total first"""
+        with self.lock:
+            rows = [
+                {"stage": name, "count": len(values), "p50": percentile(values, 0.5),
+                 "p95": percentile(values, 0.95), "total": sum(values)}
+                for name, values in self.durations.items()
+            ]
+        return sorted(rows, key=lambda r: -r["total"])
+
+    def dump_cprofiles(self) -> List[str]:
+        """write each local stage's accumulated cprofile stats, returning the paths"""
+        if not self.cprofile_dir:
+            return []
+        os.makedirs(self.cprofile_dir, exist_ok=True)
+        paths = []
+        with self.lock:
+            profiles = list(self.profiles.items())
+        for name, (profile, lock) in profiles:
+            path = os.path.join(self.cprofile_dir, "".join(c if c.isalnum() else "_" for c in name) + ".prof")
+            with lock:
+                profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def close(self):
+        """print the per-stage report and dump the cprofile stats (runs at exit)"""
+        if not self.enabled or not self.durations:
+            return
+        print("\nStage timings (seconds):")
+        for row in self.report():
+            print(f"- {row['stage']}: {row['count']}x, p50 {row['p50']:.3f}, p95 {row['p95']:.3f}, total {row['total']:.3f}")
+        for path in self.dump_cprofiles():
+            print(f"- cProfile stats: {path}")
+        if self.log_file:
+            print(f"- Span trees: {self.log_file}")
+        self.enabled = False
@@ -0,0 +1,67 @@
+import os
+from typing import Callable, Optional
+from memory_log import MemoryLog, MEMORY_LOG_DIR, period_of
+from memory_search import MemorySearch, MEMORY_TOKEN_BUDGET
+from memory_consolidation import MemoryConsolidator
+from memory_summaries import MemorySummaries, MEMORY_SUMMARY_FILE
+from tokens import estimate_tokens
+
+class StudentMemory:
+    """one student's memory: the log, local search, consolidation and cached summaries
+
+    everything lives under directory, so the terminal loop uses the working
+    directory and the service gives each student a directory of their own
+    """
+    def __init__(self, summarize: Callable[[str, str], Optional[str]], directory: str = "."):
+        self.directory = directory
+        self.log = MemoryLog(os.path.join(directory, MEMORY_LOG_DIR))
+        # local bm25 over memory entries, so only the relevant few reach the llm
+        self.search = MemorySearch(self.log)
+        # drops "no pattern" answers and merges near-duplicate patterns
+        self.consolidator = MemoryConsolidator(self.log)
+        # per-period / per-concept summaries, cached until their slice changes
+        self.summaries = MemorySummaries(self.log, summarize, os.path.join(directory, MEMORY_SUMMARY_FILE))
+
+    def text(self, period: str = None, limit: int = None) -> str:
+        """memory entries as text, optionally only one period's / the newest few"""
+        if limit:
+            entries = self.log.recent(limit, period=period)
+        else:
+            entries = list(self.log.entries(period=period))
+        return self.log.text(entries)
+
+    def save(self, pattern: str, period: str = None) -> Optional[int]:
+        """add one learning pattern (merged into a near-duplicate if there is one)"""
+        entry_id = self.consolidator.add(pattern, period=period)
+        # rebuild the summaries this entry changed now, so the next turn finds them fresh
+        self.summaries.refresh_for(entry_id)
+        return entry_id
+
+    def refresh_summaries(self):
+        """rebuild the summaries relevant() served out of date (run it in the background)"""
+        self.summaries.refresh_stale()
+
+    def relevant(self, query: str, period: str = None) -> str:
+        """past learnings for a query within the memory token budget
+
+        precomputed period + concept summaries for the entries that match the
+        query. never calls the llm: a slice that changed since it was summarized
+        is served from its last summary (or the matching entry itself) and
+        left in summaries.stale for refresh_summaries
+        """
+        period = period or period_of(query)
+        parts = [self.summaries.period_summary(period, refresh=False)]
+        for entry_id in self.search.search(query, period):
+            row = self.log.row(entry_id)
+            if row is None:
+                continue  # deleted by a consolidation since the search
+            summary = self.summaries.concept_summary(row.get("concept"), refresh=False)
+            parts.append(summary or self.search.texts[entry_id])
+
+        relevant, used = [], 0
+        for part in dict.fromkeys(parts):
+            cost = estimate_tokens(part)
+            if part and used + cost <= MEMORY_TOKEN_BUDGET:
+                relevant.append(part)
+                used += cost
+        return "\n".join(relevant)
@@ -0,0 +1,10 @@
+# rough tokens-per-character for english text with llama-style tokenizers
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """cheap token estimate for prompt budgeting (no tokenizer needed)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def request_tokens(messages, max_completion_tokens: int) -> int:
+    """upper estimate of the tokens a call uses (prompt + longest allowed answer)"""
+    return sum(estimate_tokens(m["content"]) for m in messages) + max_completion_tokens
@@ -0,0 +1,199 @@
+from typing import Dict, List, Optional
+
+# shared by the terminal loop (loop.py) and the multi-student service (service.py)
+CHAT_MODEL = "llama3-70b-8192"  # main tutor answers
+TASK_MODEL = "llama3-8b-8192"   # questions, hints, feedback, pattern analysis, summaries
+
+# all the apush periods
+AP_PERIODS = [
+    "Period 1 (1491-1607): Native American Societies and European Exploration",
+    "Period 2 (1607-1754): Colonial America",
+    "Period 3 (1754-1800): The American Revolution",
+    "Period 4 (1800-1848): Early Republic and Expansion",
+    "Period 5 (1844-1877): Civil War and Reconstruction",
+    "Period 6 (1865-1898): Industrialization and Gilded Age",
+    "Period 7 (1890-1945): Progressive Era and World Wars",
+    "Period 8 (1945-1980): Cold War and Civil Rights",
+    "Period 9 (1980-Present): Modern America"
+]
+
+TUTOR_SYSTEM_PROMPT = "You are an AP US History expert tutor helping students prepare for the AP exam"
+
+def chat_messages(question: str, relevant_memory: str, rag_context: str, history: List[Dict]) -> List[Dict]:
+    """main chat request: tutor prompt, past learnings, ced context, conversation so far, the question"""
+    messages = [{"role": "system", "content": TUTOR_SYSTEM_PROMPT}]
+    if relevant_memory:
+        messages.append({
+            "role": "system",
+            "content": f"Relevant past learnings to consider:\n{relevant_memory}"
+        })
+    if rag_context:
+        messages.append({"role": "system", "content": rag_context})
+    messages.extend(history)
+    messages.append({"role": "user", "content": question})
+    return messages
+
+def question_messages(period: str, topic: Optional[str], count: int, question_type: str = "multiple_choice") -> List[Dict]:
+    topic_context = f" focusing on {topic}" if topic else ""
+    prompt = f"""
+    Generate {count} different AP US History practice questions for {period}{topic_context}
+
+    Question type: {question_type}
+
+    For each multiple choice question, include:
+    1. The question
+    2. Four possible answer options (A, B, C, D)
+    3. The correct answer
+    4. Brief explanation (2-3 sentences)
+    5. Key historical context (1-2 sentences)
+    6. AP exam relevance (1 sentence)
+
+    Format the response as:
+    QUESTION:
+    [question text]
+
+    OPTIONS:
+    A) [first option]
+    B) [second option]
+    C) [third option]
+    D) [fourth option]
+
+    ANSWER:
+    [correct answer letter]
+
+    EXPLANATION:
+    [brief explanation]
+
+    HISTORICAL CONTEXT:
+    [key context]
+
+    AP RELEVANCE:
+    [exam relevance]
+
+    Put a line containing only === between questions
+    """
+    return [
+        {"role": "system", "content": "You are an AP US History expert creating exam-style questions"},
+        {"role": "user", "content": prompt}
+    ]
+
+def hint_messages(question_text: str, period: str, topic: Optional[str]) -> List[Dict]:
+    hint_prompt = f"""
+    AP US History Question: {question_text}
+    Period: {period}
+    Topic: {topic if topic else 'General'}
+
+    Provide a brief, focused hint (1-2 sentences) that guides the student without giving away the solution
+    """
+    return [
+        {"role": "system", "content": "You are an AP US History teacher providing hints"},
+        {"role": "user", "content": hint_prompt}
+    ]
+
+def feedback_messages(question_text: str, period: str, topic: Optional[str], selected_option: Optional[str],
+                      correct_answer: str) -> List[Dict]:
+    feedback_prompt = f"""
+    AP US History Question: {question_text}
+    Period: {period}
+    Topic: {topic if topic else 'General'}
+    Student's selected option: {selected_option if selected_option else 'skipped'}
+    Correct answer: {correct_answer}
+
+    Provide brief, focused feedback (2-3 sentences) that:
+    1. Acknowledges what was correct (if anything)
+    2. Points out one key area for improvement
+    3. Includes one specific tip for AP exam success
+    """
+    return [
+        {"role": "system", "content": "You are an AP US History teacher providing concise feedback"},
+        {"role": "user", "content": feedback_prompt}
+    ]
+
+def skipped_note(question_text: str, period: str, topic: Optional[str]) -> List[str]:
+    """(question, response, feedback) recorded for memory when a practice question is skipped"""
+    return [question_text, "Question skipped",
+            f"Student skipped question about {topic if topic else 'general topic'} in {period}"]
+
+def answered_note(question_text: str, period: str, topic: Optional[str], selected_option: Optional[str],
+                  correct_answer: str, feedback: str) -> List[str]:
+    """(question, response, feedback) recorded for memory after a practice answer got feedback"""
+    is_correct = selected_option and selected_option.startswith(correct_answer)
+    memory_context = f"Topic: {topic if topic else 'General'}, Period: {period}"
+    return [question_text, f"Selected: {selected_option}, Correct: {correct_answer}",
+            f"{'Correct answer' if is_correct else 'Incorrect answer'} on {memory_context}. {feedback}"]
+
+def pattern_messages(question: str, response: str, feedback: str) -> List[Dict]:
+    """does an interaction show a learning pattern"""
+    pattern_prompt = f"""
+    Question: {question}
+    Response: {response}
+    Feedback: {feedback}
+
+    Identify if this interaction shows a clear pattern of difficulty or misunderstanding
+    If yes, format as: "User has shown difficulty with: [specific concept/pattern]"
+    If no clear pattern, return empty string
+    """
+    return [
+        {"role": "system", "content": "You are an AP US History expert identifying learning patterns"},
+        {"role": "user", "content": pattern_prompt}
+    ]
+
+def practice_pattern_messages(problem: str, period: str) -> List[Dict]:
+    """does a practice problem reveal a learning pattern"""
+    # get key info from problem
+    parts = problem.split('\n\n')
+    question_text = ""
+    correct_answer = ""
+
+    for part in parts:
+        if part.startswith("QUESTION:"):
+            question_text = part.replace("QUESTION:", "").strip()
+        elif part.startswith("ANSWER:"):
+            correct_answer = part.replace("ANSWER:", "").strip()
+
+    pattern_prompt = f"""
+    Question: {question_text}
+    Period: {period}
+    Correct Answer: {correct_answer}
+
+    Identify if this practice question reveals any learning patterns or difficulties
+    If yes, format as: "User has shown difficulty with: [specific concept/pattern]"
+    If no clear pattern, return empty string
+    """
+    return [
+        {"role": "system", "content": "You are an AP US History expert identifying learning patterns"},
+        {"role": "user", "content": pattern_prompt}
+    ]
+
+def memory_summary_messages(label: str, memory: str) -> List[Dict]:
+    summary_prompt = f"""
+    Memory slice: {label}
+
+    Past practice problems and interactions:
+    {memory}
+
+    Summarize the learning patterns and difficulties these entries show
+    Format each as: "User has shown difficulty with: [specific concept/pattern]"
+    Keep it concise
+    """
+    return [
+        {"role": "system", "content": "You are an AP US History expert summarizing a student's learning patterns"},
+        {"role": "user", "content": summary_prompt}
+    ]
+
+def conversation_summary_messages(summary: str, turns: str) -> List[Dict]:
+    summary_prompt = f"""
+    Summary so far:
+    {summary or "(none)"}
+
+    Earlier turns:
+    {turns}
+
+    Update the summary of this tutoring conversation so it covers the earlier turns
+    Keep the questions asked, key facts explained and anything the student struggled with
+    Keep it under 200 words
+    """
+    return [
+        {"role": "system", "content": "You are summarizing an AP US History tutoring conversation"},
+        {"role": "user", "content": summary_prompt}
+    ]
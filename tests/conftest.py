@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+import pytest
+
+# the app modules in main/ (and the benchmark and ced ingest helpers) import each other by bare name
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("main", "benchmarks", "data_scraping"):
+    sys.path.insert(0, os.path.join(ROOT, directory))
+
+# a tiny ced in the layout RAGSystem reads: shard name -> chunk texts
+CED_TEXTS = {
+    "2": [
+        "The Columbian Exchange moved crops and diseases across the Atlantic. Spanish colonists built the encomienda system.",
+        "Spanish colonists built the encomienda system. Missions spread Catholicism among American Indians.",
+    ],
+    "3": [
+        "Parliament passed the Stamp Act in 1765 to tax the colonies. Colonists protested taxation without representation.",
+        "Colonists protested taxation without representation. The Townshend Acts taxed glass, paint and tea.",
+        "The Stamp Act Congress met in New York.",
+    ],
+    "8": [
+        "Containment shaped American foreign policy during the Cold War. The Marshall Plan rebuilt Western Europe.",
+    ],
+    "exam_info": [
+        "The exam has a multiple choice section and a document based question. Each short answer question is scored on a rubric.",
+    ],
+}
+
+def ced_chunks(name: str):
+    if name == "exam_info":
+        metadata = {"section": "Exam Information", "source": "AP US History Exam Information"}
+    else:
+        metadata = {"period": name, "period_title": f"Period {name}", "source": f"AP US History Period {name}"}
+    return [{"text": text, "metadata": dict(metadata, chunk_id=i)} for i, text in enumerate(CED_TEXTS[name])]
+
+@pytest.fixture
+def ced_dir(tmp_path):
+    """a base_dir holding CED_TEXTS as the .json chunk files process_ced writes"""
+    for name in CED_TEXTS:
+        directory = tmp_path / ("exam_info_data" if name == "exam_info" else f"period{name}_data")
+        directory.mkdir()
+        stem = "exam_info_chunks" if name == "exam_info" else f"period_{name}_chunks"
+        (directory / f"{stem}.json").write_text(json.dumps(ced_chunks(name)), encoding="utf-8")
+    return str(tmp_path)
@@ -0,0 +1,59 @@
+import json
+import os
+import pytest
+from conftest import CED_TEXTS, ced_chunks
+from chunk_store import ShardStore, is_compact, meta_file_for
+from process_ced import PeriodProcessor, ExamInfoProcessor
+from rag_utils import RAGSystem
+
+def write_compact(base_dir: str, name: str) -> str:
+    """write one shard of CED_TEXTS through process_ced's compact writer"""
+    if name == "exam_info":
+        processor = ExamInfoProcessor("examinformation.pdf", os.path.join(base_dir, "exam_info_data"))
+    else:
+        processor = PeriodProcessor(f"p{name}.pdf", os.path.join(base_dir, f"period{name}_data"))
+    processor.save_chunks(processor.process_chunk(chunk["text"], i) for i, chunk in enumerate(ced_chunks(name)))
+    return processor.output_file()
+
+def test_compact_shard_round_trips(tmp_path):
+    path = write_compact(str(tmp_path), "3")
+    assert is_compact(path)
+    with open(meta_file_for(path), 'r', encoding='utf-8') as f:
+        assert len(json.load(f)["table"]) == 1  # the chunks share one interned metadata row
+
+    store = ShardStore(path)
+    assert len(store) == 3
+    assert [chunk["text"] for chunk in store] == CED_TEXTS["3"]
+    chunk = store.chunk(2)
+    assert chunk["text"] == "The Stamp Act Congress met in New York."
+    assert chunk["metadata"]["chunk_id"] == 2
+    assert chunk["metadata"]["period"] == "3"
+    assert chunk["metadata"]["timestamp"] == store.meta["timestamp"]
+    store.close()
+    assert not store.loaded
+
+def test_unknown_version_is_rejected(tmp_path):
+    path = write_compact(str(tmp_path), "3")
+    with open(meta_file_for(path), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    with open(meta_file_for(path), 'w', encoding='utf-8') as f:
+        json.dump(dict(meta, version=99), f)
+    with pytest.raises(ValueError):
+        ShardStore(path).load()
+
+def test_compact_shards_load_lazily(ced_dir):
+    json_rag = RAGSystem(ced_dir, use_snapshot=False)
+    for name in ("3", "8"):
+        write_compact(ced_dir, name)
+    RAGSystem(ced_dir)  # builds the snapshot
+    rag = RAGSystem(ced_dir)
+    assert sorted(rag.shard_stores) == ["3", "8"]
+    assert not any(store.loaded for store in rag.shard_stores.values())
+
+    chunk = rag.get_relevant_chunks("encomienda", top_k=1)[0]
+    assert chunk["metadata"]["period"] == "2"  # kept in the .json shard, so no store is opened
+    assert not any(store.loaded for store in rag.shard_stores.values())
+
+    chunks = rag.get_relevant_chunks("stamp act", top_k=2)
+    assert rag.shard_stores["3"].loaded and not rag.shard_stores["8"].loaded
+    assert [c["text"] for c in chunks] == [c["text"] for c in json_rag.get_relevant_chunks("stamp act", top_k=2)]
@@ -0,0 +1,59 @@
+from conversation import ConversationContext, SUMMARY_TOKEN_LIMIT, message_tokens
+
+class Summarizer:
+    def __init__(self, result="summary"):
+        self.calls = []
+        self.result = result
+
+    def __call__(self, summary, turns):
+        self.calls.append((summary, turns))
+        return self.result
+
+def test_recent_turns_kept_verbatim():
+    summarize = Summarizer()
+    context = ConversationContext(summarize, keep_recent=3)
+    for n in range(3):
+        context.add_turn(f"question {n}", f"answer {n}")
+    assert [m["content"] for m in context.messages()] == [
+        "question 0", "answer 0", "question 1", "answer 1", "question 2", "answer 2"]
+    assert summarize.calls == []
+
+def test_turns_past_keep_recent_are_folded():
+    summarize = Summarizer()
+    context = ConversationContext(summarize, keep_recent=2)
+    for n in range(4):
+        context.add_turn(f"question {n}", f"answer {n}")
+    messages = context.messages()
+    assert messages[0] == {"role": "system", "content": "Summary of the earlier conversation:\nsummary"}
+    assert [m["content"] for m in messages[1:]] == ["question 2", "answer 2", "question 3", "answer 3"]
+    # each fold hands over the summary so far plus the turns that dropped out
+    assert summarize.calls == [("", "Student: question 0\nTutor: answer 0"),
+                               ("summary", "Student: question 1\nTutor: answer 1")]
+
+def test_token_budget_folds_long_turns():
+    context = ConversationContext(Summarizer(), token_budget=SUMMARY_TOKEN_LIMIT + 300, keep_recent=10)
+    for n in range(3):
+        context.add_turn(f"question {n}", "x" * 800)
+    # two ~200 token pairs fit next to the short summary, three dont
+    assert [m["content"] for m in context.messages()[1:] if m["role"] == "user"] == ["question 1", "question 2"]
+    # the newest pair is never folded, even if it is over budget on its own
+    context.add_turn("question 3", "x" * 4000)
+    assert [m["content"] for m in context.messages()[1:] if m["role"] == "user"] == ["question 3"]
+
+def test_failed_summary_keeps_the_old_questions():
+    def fail(summary, turns):
+        raise RuntimeError("boom")
+
+    context = ConversationContext(fail, keep_recent=1)
+    context.add_turn("What was the Stamp Act?", "A tax.")
+    context.add_turn("Why did colonists object?", "No representation.")
+    context.add_turn("What came next?", "The Townshend Acts.")
+    summary = context.messages()[0]["content"]
+    assert summary.endswith("Student asked: What was the Stamp Act?\nStudent asked: Why did colonists object?")
+
+def test_summary_is_capped():
+    context = ConversationContext(Summarizer("y" * 10_000), keep_recent=1)
+    context.add_turn("q0", "a0")
+    context.add_turn("q1", "a1")
+    assert len(context.messages()[0]["content"]) <= len("Summary of the earlier conversation:\n") + SUMMARY_TOKEN_LIMIT * 4
+    assert context.tokens() == message_tokens(context.messages())
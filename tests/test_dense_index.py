@@ -0,0 +1,59 @@
+import os
+import numpy as np
+import pytest
+from dense_index import DenseIndex, DENSE_DIM, DENSE_SNAPSHOT_FILE, embed_texts
+from rag_utils import RAGSystem, RRF_K
+
+TEXTS = [
+    "Parliament passed the Stamp Act to tax the colonies.",
+    "The Marshall Plan rebuilt Western Europe after the war.",
+    "Spanish missions spread Catholicism in New Spain.",
+    "Colonists boycotted British goods after the Townshend Acts.",
+    "Containment guided foreign policy in the Cold War.",
+]
+
+def test_embeddings_are_stable_unit_vectors():
+    vectors = embed_texts(TEXTS + [""])
+    assert vectors.shape == (6, DENSE_DIM) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:5], axis=1), 1.0)
+    assert not vectors[5].any()
+    assert np.array_equal(embed_texts(TEXTS[:1])[0], vectors[0])
+
+def test_exhaustive_probe_finds_the_nearest_text():
+    index = DenseIndex.build(TEXTS)
+    assert sorted(index.ids.tolist()) == list(range(len(TEXTS)))
+    docs, scores = index.search("the stamp act taxed the colonies", top_k=2, nprobe=len(index.centroids))
+    assert docs[0] == 0
+    assert scores[0] >= scores[1]
+    assert DenseIndex.build([]).search("anything", top_k=3)[0].size == 0
+
+def test_dense_and_hybrid_modes(ced_dir):
+    rag = RAGSystem(ced_dir, retrieval_mode="hybrid", nprobe=64)
+    assert os.path.exists(os.path.join(ced_dir, DENSE_SNAPSHOT_FILE))
+    dense = rag.search("the marshall plan rebuilt western europe", top_k=3, mode="dense")
+    assert rag.chunks[dense[0][0]]["metadata"]["period"] == "8"
+
+    query = "stamp act taxation"
+    keyword = [idx for idx, _ in rag.search(query, 50, "keyword")]
+    dense = [idx for idx, _ in rag.search(query, 50, "dense")]
+    expected = {}
+    for ranking in (keyword, dense):
+        for rank, idx in enumerate(ranking):
+            expected[idx] = expected.get(idx, 0.0) + 1.0 / (RRF_K + rank + 1)
+    hybrid = rag.search(query, top_k=3)
+    assert [idx for idx, _ in hybrid] == sorted(expected, key=lambda i: (-expected[i], i))[:3]
+    assert hybrid[0][1] == pytest.approx(max(expected.values()))
+
+def test_dense_snapshot_reused_until_sources_change(ced_dir):
+    first = RAGSystem(ced_dir, retrieval_mode="dense")
+    sources = list(first.index.header["sources"])
+    assert DenseIndex.load(os.path.join(ced_dir, DENSE_SNAPSHOT_FILE), sources) is not None
+    with open(sources[0], 'a', encoding='utf-8') as f:
+        f.write(" ")
+    assert DenseIndex.load(os.path.join(ced_dir, DENSE_SNAPSHOT_FILE), sources) is None
+
+def test_unknown_mode_is_rejected(ced_dir):
+    with pytest.raises(ValueError):
+        RAGSystem(ced_dir, retrieval_mode="semantic")
+    with pytest.raises(ValueError):
+        RAGSystem(ced_dir, use_snapshot=False).search("stamp act", mode="semantic")
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import groq_client
+from groq_client import GroqClient, GroqError
+from async_groq_client import AsyncGroqClient
+from mock_groq import MockGroqServer
+
+MESSAGES = [{"role": "system", "content": "You are a helpful AP US History tutor."},
+            {"role": "user", "content": "What caused the Stamp Act crisis?"}]
+COMPLETION = {"choices": [{"message": {"role": "assistant", "content": "Taxes."}}],
+              "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}}
+
+class ScriptedServer:
+    """answers each post with the next (status, headers, body) of a script"""
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server.requests += 1
+                status, headers, body = server.script.pop(0)
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/openai/v1/chat/completions"
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """backoff delays the client asked for, without actually sleeping"""
+    delays = []
+    monkeypatch.setattr(groq_client.time, "sleep", delays.append)
+    return delays
+
+@pytest.fixture
+def mock_groq():
+    mock = MockGroqServer(latency=0.0, jitter=0.0, token_interval=0.0).start()
+    yield mock
+    mock.stop()
+
+def test_429_waits_for_retry_after(sleeps):
+    server = ScriptedServer([
+        (429, {"Retry-After": "2"}, {"error": {"message": "Rate limit reached"}}),
+        (200, {}, COMPLETION),
+    ])
+    try:
+        client = GroqClient(api_key="test", api_url=server.url)
+        response = client.chat(MESSAGES, "test-model", 50)
+    finally:
+        server.stop()
+    assert response["choices"][0]["message"]["content"] == "Taxes."
+    assert sleeps == [2.0]
+    assert client.last_call_stats() == {"retries": 1, "usage": COMPLETION["usage"]}
+
+def test_5xx_is_retried_with_backoff(sleeps):
+    server = ScriptedServer([
+        (503, {}, {"error": {"message": "over capacity"}}),
+        (500, {}, {"error": {"message": "internal error"}}),
+        (200, {}, COMPLETION),
+    ])
+    try:
+        response = GroqClient(api_key="test", api_url=server.url).chat(MESSAGES, "test-model", 50)
+    finally:
+        server.stop()
+    assert response["usage"]["total_tokens"] == 12
+    assert server.requests == 3
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= groq_client.BACKOFF_MAX for delay in sleeps)
+
+def test_gives_up_after_max_retries(sleeps):
+    server = ScriptedServer([(502, {}, {"error": {"message": "bad gateway"}})] * 3)
+    try:
+        response = GroqClient(api_key="test", api_url=server.url, max_retries=2).chat(MESSAGES, "test-model", 50)
+    finally:
+        server.stop()
+    assert "error" in response
+    assert server.requests == 3
+
+def test_4xx_is_not_retried(sleeps):
+    server = ScriptedServer([(400, {}, {"error": {"message": "bad request"}})])
+    try:
+        response = GroqClient(api_key="test", api_url=server.url).chat(MESSAGES, "test-model", 50)
+    finally:
+        server.stop()
+    assert response["error"]["message"] == "bad request"
+    assert sleeps == []
+
+def test_stream_chat_parses_sse(mock_groq):
+    client = GroqClient(api_key="test", api_url=mock_groq.url)
+    tokens = list(client.stream_chat(MESSAGES, "test-model", 200))
+    assert len(tokens) > 1
+    text = "".join(tokens)
+    assert text.endswith(".")
+    # the usage block rides on the last chunk
+    usage = client.last_call_stats()["usage"]
+    assert usage["completion_tokens"] == len(text) // 4
+
+def test_stream_chat_raises_on_error_status(sleeps):
+    server = ScriptedServer([(401, {}, {"error": {"message": "invalid api key"}})])
+    try:
+        with pytest.raises(GroqError, match="HTTP 401"):
+            list(GroqClient(api_key="test", api_url=server.url).stream_chat(MESSAGES, "test-model", 50))
+    finally:
+        server.stop()
+
+def test_async_client_matches_sync_client(mock_groq):
+    async def run():
+        client = AsyncGroqClient(api_key="test", api_url=mock_groq.url)
+        try:
+            response = await client.chat(MESSAGES, "test-model", 50)
+            tokens = [token async for token in client.stream_chat(MESSAGES, "test-model", 200)]
+            return response, tokens, client.last_call_stats()
+        finally:
+            await client.close()
+
+    response, tokens, stats = asyncio.run(run())
+    assert response["choices"][0]["message"]["content"]
+    assert len(tokens) > 1
+    assert stats["usage"]["completion_tokens"] == len("".join(tokens)) // 4
@@ -0,0 +1,41 @@
+from ground_truth import ExhaustiveScorer, OverlapScorer, iter_corpus, load_truth, recall_at_k
+from synthetic_corpus import generate_corpus, generate_queries
+from rag_utils import RAGSystem, EXAM_KEYWORDS, WORD_RE
+
+def baseline_top_k(chunks, query: str, k: int):
+    """get_relevant_chunks as it was before bm25: keyword overlap over every chunk"""
+    query_words = set(WORD_RE.findall(query.lower()))
+    scored = []
+    for position, chunk in enumerate(chunks):
+        chunk_text = chunk["text"].lower()
+        score = len(query_words & set(WORD_RE.findall(chunk_text)))
+        score += sum(1 for word in query_words if word in chunk_text)
+        periods = [f"period {i}" for i in range(1, 10) if f"period {i}" in query.lower()]
+        if periods and any(p in chunk["metadata"].get("period_title", "").lower() for p in periods):
+            score *= 1.5
+        if any(keyword in query.lower() for keyword in EXAM_KEYWORDS) and chunk["metadata"].get("section") == "Exam Information":
+            score *= 1.5
+        scored.append((position, score))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [position for position, score in scored[:k] if score > 0]
+
+def test_truths_match_their_reference_scorers(tmp_path):
+    corpus_dir = str(tmp_path / "corpus")
+    generate_corpus(corpus_dir, 300)
+    queries = generate_queries(corpus_dir, 40)
+    chunks = list(iter_corpus(corpus_dir))
+
+    overlap = OverlapScorer(corpus_dir, queries)
+    assert [overlap.top_k(i, q, 5) for i, q in enumerate(queries)] == [baseline_top_k(chunks, q, 5) for q in queries]
+
+    rag = RAGSystem(corpus_dir, use_snapshot=False)
+    bm25 = ExhaustiveScorer(corpus_dir, queries)
+    assert [bm25.top_k(i, q, 5) for i, q in enumerate(queries)] == [[idx for idx, _ in rag.search(q, 5)] for q in queries]
+
+    # both truths are cached side by side
+    assert load_truth(corpus_dir, queries, 5, "overlap") == load_truth(corpus_dir, queries, 5, "overlap")
+    assert load_truth(corpus_dir, queries, 5) != load_truth(corpus_dir, queries, 5, "overlap")
+
+def test_recall_at_k():
+    assert recall_at_k([[1, 2], [3], []], [[1, 4], [3], []]) == {"recall": 0.75, "queries_scored": 2}
+    assert recall_at_k([[]], [[]])["recall"] is None
@@ -0,0 +1,58 @@
+import json
+from llm_metrics import LLMMetrics, Histogram
+
+USAGE = {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}
+
+def test_histogram_quantile():
+    histogram = Histogram([0.1, 1.0])
+    assert histogram.quantile(0.5) is None
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [1, 3, 4]
+    assert histogram.quantile(0.5) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+
+def test_counters_and_summary():
+    metrics = LLMMetrics("", verbosity=0)
+    metrics.record_call("Generate hint", "m", latency=0.2, usage=USAGE, retries=1)
+    metrics.record_call("Generate hint", "m", cached=True)
+    metrics.record_call("Generate hint", "m", shed=True)
+    metrics.record_call("Main chat response", "m", latency=1.5, usage=dict(USAGE, prompt_tokens=900), error="boom")
+
+    rows = metrics.summary()
+    assert [r["purpose"] for r in rows] == ["Main chat response", "Generate hint"]
+    hint = rows[1]
+    assert (hint["calls"], hint["cache_hits"], hint["shed"], hint["retries"]) == (3, 1, 1, 1)
+    assert (hint["prompt_tokens"], hint["completion_tokens"]) == (100, 20)
+    assert hint["mean_latency"] == 0.2  # cache hits and shed calls arent timed
+    assert rows[0]["errors"] == 1
+
+def test_prometheus_text():
+    metrics = LLMMetrics("", verbosity=0)
+    metrics.record_call('Say "hi"', "m", latency=0.3, ttft=0.1, usage=USAGE)
+    text = metrics.prometheus_text()
+    assert '# TYPE llm_calls_total counter' in text
+    assert 'llm_calls_total{purpose="Say \\"hi\\"",model="m"} 1' in text
+    assert 'llm_latency_seconds_bucket{purpose="Say \\"hi\\"",model="m",le="0.5"} 1' in text
+    assert 'llm_ttft_seconds_bucket{purpose="Say \\"hi\\"",model="m",le="0.1"} 1' in text
+    assert 'llm_latency_seconds_count{purpose="Say \\"hi\\"",model="m"} 1' in text
+
+def test_jsonl_log_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    LLMMetrics(verbosity=0).record_call("Generate hint", "m", latency=0.2)
+    assert list(tmp_path.iterdir()) == []
+
+    log_file = tmp_path / "calls.jsonl"
+    LLMMetrics(str(log_file), verbosity=0).record_call("Generate hint", "m", latency=0.2, usage=USAGE)
+    record = json.loads(log_file.read_text())
+    assert record["purpose"] == "Generate hint"
+    assert record["prompt_tokens"] == 100
+
+def test_verbosity_keeps_background_calls_quiet(capsys):
+    metrics = LLMMetrics("", verbosity=1)
+    metrics.record_call("Update memory with pattern", "m", latency=0.2)
+    metrics.record_call("Main chat response", "m", latency=0.2, ttft=0.05)
+    assert capsys.readouterr().out == "[LLM Main chat response / m] 0.20s (first token 0.05s)\n"
+
+    LLMMetrics("", verbosity=2).record_call("Update memory with pattern", "m", shed=True)
+    assert capsys.readouterr().out == "[LLM Update memory with pattern / m] shed (rate limit)\n"
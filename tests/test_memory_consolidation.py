@@ -0,0 +1,57 @@
+import pytest
+from memory_log import MemoryLog
+from memory_consolidation import MemoryConsolidator, is_pattern
+
+@pytest.mark.parametrize("text", [
+    "User has shown difficulty with: the Stamp Act crisis.",
+    "The student confuses the Federalist and Anti-Federalist positions.",
+])
+def test_patterns(text):
+    assert is_pattern(text)
+
+@pytest.mark.parametrize("text", [
+    "",
+    "None",
+    "N/A",
+    "No clear pattern of difficulty with the Stamp Act crisis.",
+    "There is no specific misunderstanding here.",
+    "Return an empty string.",
+])
+def test_non_patterns(text):
+    assert not is_pattern(text)
+
+def test_add_merges_a_near_duplicate(tmp_path):
+    log = MemoryLog(str(tmp_path / "log"))
+    consolidator = MemoryConsolidator(log)
+    first = consolidator.add("User has shown difficulty with: the causes of the Stamp Act crisis.", period="3")
+    merged = consolidator.add("User has shown difficulty with: the causes of the Stamp Act crisis", period="3")
+
+    assert merged != first
+    assert log.select() == [merged]
+    entry = log.read([merged])[0]
+    assert entry["count"] == 2
+    assert entry["period"] == "3"
+
+def test_add_keeps_distinct_patterns_and_drops_non_patterns(tmp_path):
+    log = MemoryLog(str(tmp_path / "log"))
+    consolidator = MemoryConsolidator(log)
+    assert consolidator.add("No clear pattern of difficulty with anything.") is None
+    a = consolidator.add("User has shown difficulty with: the Missouri Compromise.")
+    b = consolidator.add("User has shown difficulty with: containment policy in the early Cold War.")
+    assert log.select() == [a, b]
+
+def test_consolidate_cleans_up_the_whole_log(tmp_path):
+    log = MemoryLog(str(tmp_path / "log"))
+    # written straight to the log, the way an imported memory.txt arrives
+    log.append("User has shown difficulty with: Reconstruction amendments.")
+    log.append("No clear pattern of difficulty with this question.")
+    log.append("User has shown difficulty with: Reconstruction amendments")
+    log.append("User has shown difficulty with: Progressive Era reforms.")
+
+    removed = MemoryConsolidator(log).consolidate()
+    assert removed == 2
+    texts = sorted(e["text"] for e in log.entries())
+    assert texts == ["User has shown difficulty with: Progressive Era reforms.",
+                     "User has shown difficulty with: Reconstruction amendments"]
+    counts = {e["text"]: e.get("count", 1) for e in log.entries()}
+    assert counts["User has shown difficulty with: Reconstruction amendments"] == 2
@@ -0,0 +1,65 @@
+import json
+from memory_log import MemoryLog
+
+def test_entries_survive_reopen(tmp_path):
+    log = MemoryLog(str(tmp_path / "log"))
+    first = log.append("User has shown difficulty with: the Stamp Act.", period="3")
+    second = log.append("User has shown difficulty with: salutary neglect.", period="2")
+
+    reopened = MemoryLog(str(tmp_path / "log")).open()
+    assert reopened.select() == [first, second]
+    assert reopened.select(period="3") == [first]
+    assert reopened.select(concept="salutary neglect") == [second]
+    assert [e["text"] for e in reopened.entries()] == [e["text"] for e in log.entries()]
+
+def test_delete_writes_a_tombstone(tmp_path):
+    log = MemoryLog(str(tmp_path / "log"))
+    ids = [log.append(f"entry {i}", period="1") for i in range(3)]
+    log.delete([ids[1]])
+    assert log.select() == [ids[0], ids[2]]
+    assert log.select(period="1") == [ids[0], ids[2]]
+    assert log.row(ids[1]) is not None  # still on disk until compaction
+
+    reopened = MemoryLog(str(tmp_path / "log")).open()
+    assert reopened.select() == [ids[0], ids[2]]
+    assert ids[1] in reopened.deleted
+
+def test_torn_last_record_is_dropped(tmp_path):
+    log = MemoryLog(str(tmp_path / "log"))
+    log.append("kept")
+    with open(log.segment_path(log.segments[-1]), 'ab') as f:
+        f.write(b'{"id": 1, "timestamp": "2024-01-01')
+
+    reopened = MemoryLog(str(tmp_path / "log")).open()
+    assert [e["text"] for e in reopened.entries()] == ["kept"]
+    assert reopened.append("next") == 1
+
+def test_compaction_drops_deleted_entries(tmp_path):
+    # every record gets a segment of its own, sealing the one before it
+    log = MemoryLog(str(tmp_path / "log"), segment_max_bytes=10)
+    ids = [log.append(f"entry {i}") for i in range(4)]
+    log.delete([ids[0], ids[2]])
+    log.compact()
+
+    assert log.select() == [ids[1], ids[3]]
+    assert len(log.segments) == 2
+    records = []
+    for number in log.segments:
+        with open(log.segment_path(number), 'r', encoding='utf-8') as f:
+            records.extend(json.loads(line) for line in f)
+    assert {r["id"] for r in records if "id" in r} == {ids[1], ids[3]}
+    assert [e["text"] for e in MemoryLog(str(tmp_path / "log")).entries()] == ["entry 1", "entry 3"]
+
+def test_ids_are_not_reused_after_compaction(tmp_path):
+    # every record, tombstones included, gets a segment of its own
+    log = MemoryLog(str(tmp_path / "log"), segment_max_bytes=10)
+    ids = [log.append(f"entry {i}") for i in range(3)]
+    # the highest entry and its tombstone both end up in sealed segments,
+    # so compaction leaves no trace of that id in the logs
+    log.delete([ids[2]])
+    log.delete([ids[1]])
+    log.compact()
+
+    reopened = MemoryLog(str(tmp_path / "log")).open()
+    assert reopened.select() == [ids[0]]
+    assert reopened.append("after reopen") == ids[2] + 1
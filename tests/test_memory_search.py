@@ -0,0 +1,35 @@
+from memory_log import MemoryLog
+from memory_search import MemorySearch, tokenize
+
+def test_tokenize_drops_stopwords_and_boilerplate():
+    assert tokenize("User has shown difficulty with: the Stamp Act.") == ["stamp", "act"]
+
+def test_ranks_matching_entries_and_skips_the_rest(tmp_path):
+    log = MemoryLog(str(tmp_path / "log"))
+    stamp = log.append("User has shown difficulty with: the Stamp Act and colonial taxes.", period="3")
+    log.append("User has shown difficulty with: containment policy.", period="8")
+    townshend = log.append("User has shown difficulty with: colonial taxes under the Townshend Acts.", period="3")
+
+    search = MemorySearch(log)
+    assert search.search("Why did the Stamp Act anger colonists?") == [stamp]
+    assert set(search.search("colonial taxes")) == {stamp, townshend}
+    assert search.search("railroads") == []
+
+def test_period_boost_and_newer_entries_win_ties(tmp_path):
+    log = MemoryLog(str(tmp_path / "log"))
+    older = log.append("User has shown difficulty with: tariffs.", period="4")
+    newer = log.append("User has shown difficulty with: tariffs.", period="6")
+    search = MemorySearch(log)
+    assert search.search("tariffs") == [newer, older]
+    assert search.search("tariffs", period="4") == [older, newer]
+
+def test_picks_up_appends_and_deletes(tmp_path):
+    log = MemoryLog(str(tmp_path / "log"))
+    first = log.append("User has shown difficulty with: the Missouri Compromise.")
+    search = MemorySearch(log)
+    assert search.search("Missouri Compromise") == [first]
+
+    second = log.append("User has shown difficulty with: the Missouri Compromise line.")
+    log.delete([first])
+    assert search.search("Missouri Compromise") == [second]
+    assert search.search("Missouri", top_k=0) == []
@@ -0,0 +1,76 @@
+from memory_log import MemoryLog
+from memory_summaries import MemorySummaries
+
+class Summarizer:
+    def __init__(self, result="summary"):
+        self.calls = []
+        self.result = result
+
+    def __call__(self, label, memory_text):
+        self.calls.append((label, memory_text))
+        return self.result
+
+def make(tmp_path, summarize):
+    log = MemoryLog(str(tmp_path / "log"))
+    return log, MemorySummaries(log, summarize, cache_file=str(tmp_path / "summaries.json"))
+
+def test_single_entry_is_its_own_summary(tmp_path):
+    summarize = Summarizer()
+    log, summaries = make(tmp_path, summarize)
+    log.append("User has shown difficulty with: the Stamp Act.", period="3")
+    assert "the Stamp Act" in summaries.period_summary("3")
+    assert summaries.period_summary("4") == ""
+    assert summarize.calls == []
+
+def test_summary_is_rebuilt_only_when_the_slice_changes(tmp_path):
+    summarize = Summarizer()
+    log, summaries = make(tmp_path, summarize)
+    log.append("User has shown difficulty with: the Stamp Act.", period="3")
+    log.append("User has shown difficulty with: the Townshend Acts.", period="3")
+    assert summaries.period_summary("3") == "summary"
+    assert summaries.period_summary("3") == "summary"
+    assert len(summarize.calls) == 1
+    assert summarize.calls[0][0] == "period 3"
+
+    # the cache survives a restart
+    _, reopened = make(tmp_path, summarize)
+    assert reopened.period_summary("3") == "summary"
+    assert len(summarize.calls) == 1
+
+    log.append("User has shown difficulty with: the Boston Tea Party.", period="3")
+    summaries.period_summary("3")
+    assert len(summarize.calls) == 2
+    assert "Boston Tea Party" in summarize.calls[1][1]
+
+def test_foreground_lookup_serves_stale_and_queues_refresh(tmp_path):
+    summarize = Summarizer()
+    log, summaries = make(tmp_path, summarize)
+    log.append("User has shown difficulty with: tariffs.", concept="tariffs")
+    log.append("User has shown difficulty with: the tariff of abominations.", concept="tariffs")
+    assert summaries.concept_summary("tariffs", refresh=False) == ""
+    assert summaries.stale == {"concept:tariffs"}
+    assert summarize.calls == []
+
+    summaries.refresh_stale()
+    assert summaries.stale == set()
+    assert summaries.concept_summary("tariffs", refresh=False) == "summary"
+    assert len(summarize.calls) == 1
+
+def test_llm_failure_returns_raw_entries_and_retries(tmp_path):
+    summarize = Summarizer(result=None)
+    log, summaries = make(tmp_path, summarize)
+    log.append("User has shown difficulty with: the Stamp Act.", period="3")
+    log.append("User has shown difficulty with: the Townshend Acts.", period="3")
+    assert "the Townshend Acts" in summaries.period_summary("3")
+    summarize.result = "summary"
+    assert summaries.period_summary("3") == "summary"
+    assert len(summarize.calls) == 2
+
+def test_emptied_slice_drops_its_summary(tmp_path):
+    summarize = Summarizer()
+    log, summaries = make(tmp_path, summarize)
+    ids = [log.append(f"User has shown difficulty with: entry {n}.", period="5") for n in range(2)]
+    summaries.period_summary("5")
+    log.delete(ids)
+    assert summaries.period_summary("5") == ""
+    assert "period:5" not in summaries.load_cache()
@@ -0,0 +1,62 @@
+import json
+import threading
+import pytest
+from memory_worker import MemoryWorker
+
+def test_jobs_run_in_order_and_clear_the_journal(tmp_path):
+    journal = str(tmp_path / "queue.jsonl")
+    seen = []
+    worker = MemoryWorker({"note": seen.append}, journal_file=journal)
+    for n in range(5):
+        worker.submit("note", n)
+    worker.flush()
+    assert seen == [0, 1, 2, 3, 4]
+    assert worker.pending_jobs() == []
+    worker.close()
+    assert not (tmp_path / "queue.jsonl").exists()
+
+def test_unknown_job_is_rejected(tmp_path):
+    worker = MemoryWorker({}, journal_file=str(tmp_path / "queue.jsonl"))
+    with pytest.raises(ValueError):
+        worker.submit("nope")
+    assert worker.thread is None
+
+def test_pending_jobs_are_replayed_on_start(tmp_path):
+    journal = tmp_path / "queue.jsonl"
+    # a crash after job 0 finished and mid-write of job 2
+    journal.write_text(
+        json.dumps({"id": 0, "kind": "note", "args": ["a"]}) + "\n"
+        + json.dumps({"id": 1, "kind": "note", "args": ["b"]}) + "\n"
+        + json.dumps({"done": 0}) + "\n"
+        + '{"id": 2, "kind": "no'
+    )
+    seen = []
+    worker = MemoryWorker({"note": seen.append}, journal_file=str(journal))
+    assert [job["id"] for job in worker.pending_jobs()] == [1]
+    worker.submit("note", "c")
+    worker.flush()
+    assert seen == ["b", "c"]
+    worker.close()
+
+def test_failed_job_is_marked_done(tmp_path, capsys):
+    journal = str(tmp_path / "queue.jsonl")
+
+    def fail(_):
+        raise RuntimeError("boom")
+
+    worker = MemoryWorker({"fail": fail}, journal_file=journal)
+    worker.submit("fail", 1)
+    worker.flush()
+    assert "Error updating memory: boom" in capsys.readouterr().out
+    assert worker.pending_jobs() == []
+    worker.close()
+
+def test_unfinished_job_survives_a_crash(tmp_path):
+    journal = str(tmp_path / "queue.jsonl")
+    release = threading.Event()
+    worker = MemoryWorker({"wait": lambda _: release.wait()}, journal_file=journal)
+    worker.submit("wait", 1)
+    # the job is journaled before submit returns, so another process would replay it
+    assert [job["args"] for job in MemoryWorker({}, journal_file=journal).pending_jobs()] == [[1]]
+    release.set()
+    worker.close()
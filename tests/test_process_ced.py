@@ -0,0 +1,158 @@
+import json
+import os
+import random
+import re
+import pytest
+import PyPDF2
+from PyPDF2 import PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+import process_ced
+
+def write_pdf(path: str, pages):
+    """a pdf with one line of helvetica text per page"""
+    writer = PyPDF2.PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for text in pages:
+        page = PageObject.create_blank_page(width=612, height=792)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+        stream = DecodedStreamObject()
+        stream._data = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode('latin-1')
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        writer.add_page(page)
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+PAGES = [
+    "Period 3: 1754-1800 Britain tightened control over the colonies.",
+    "Key Concept: Colonists resisted new taxes. The Stamp Act united the colonies.",
+    "Exam Tip: Link the protests to independence.",
+]
+
+@pytest.fixture
+def ced(tmp_path, monkeypatch):
+    """point the ingest at tmp dirs holding a period 3 pdf"""
+    pdf_dir, data_dir = tmp_path / "pdfs", tmp_path / "data"
+    pdf_dir.mkdir()
+    monkeypatch.setattr(process_ced, "PDF_DIR", str(pdf_dir))
+    monkeypatch.setattr(process_ced, "DATA_DIR", str(data_dir))
+    monkeypatch.setattr(process_ced, "MANIFEST_FILE", str(data_dir / "ingest_manifest.json"))
+    write_pdf(str(pdf_dir / "p3.pdf"), PAGES)
+    return tmp_path
+
+def chunk_texts(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [chunk["text"] for chunk in json.load(f)]
+
+def test_unchanged_pdfs_are_skipped(ced, capsys):
+    output = str(ced / "data" / "period3_data" / "period_3_chunks.json")
+    process_ced.main(workers=1, chunk_format="json")
+    assert chunk_texts(output)[0].startswith("Period 3: 1754-1800")
+    manifest = process_ced.load_manifest()
+    pdf = str(ced / "pdfs" / "p3.pdf")
+    assert list(manifest) == [pdf]  # the missing pdfs are reported, not recorded
+    assert manifest[pdf] == {"sha256": process_ced.file_sha256(pdf), "output": output}
+    capsys.readouterr()
+
+    process_ced.main(workers=1, chunk_format="json")
+    assert "Skipping Period 3 (unchanged)" in capsys.readouterr().out
+    process_ced.main(workers=1, force=True, chunk_format="json")
+    assert "Processing Period 3" in capsys.readouterr().out
+
+    # a new format means a different output file, so it isnt skipped either
+    process_ced.main(workers=1, chunk_format="jsonl")
+    assert "Processing Period 3" in capsys.readouterr().out
+
+def test_changed_pdf_is_reprocessed(ced, capsys):
+    output = str(ced / "data" / "period3_data" / "period_3_chunks.json")
+    process_ced.main(workers=1, chunk_format="json")
+    write_pdf(str(ced / "pdfs" / "p3.pdf"), PAGES + ["Summary: The Revolution followed."])
+    capsys.readouterr()
+    process_ced.main(workers=1, chunk_format="json")
+    assert "Processing Period 3" in capsys.readouterr().out
+    assert chunk_texts(output)[-1] == "Summary: The Revolution followed."
+
+def test_parallel_ingest_matches_serial(ced):
+    output = str(ced / "data" / "period3_data" / "period_3_chunks.json")
+    process_ced.main(workers=1, chunk_format="json")
+    serial = chunk_texts(output)
+    os.remove(output)
+    process_ced.main(workers=2, chunk_format="json")
+    assert chunk_texts(output) == serial
+
+def test_failed_pdf_is_not_recorded(ced, capsys):
+    (ced / "pdfs" / "p4.pdf").write_bytes(b"not a pdf")
+    process_ced.main(workers=1, chunk_format="json")
+    assert "Error processing Period 4" in capsys.readouterr().out
+    assert str(ced / "pdfs" / "p4.pdf") not in process_ced.load_manifest()
+
+def regex_split_into_chunks(text: str, chunk_size: int = 500):
+    """the split_into_chunks that worked on the whole joined text, before pages were streamed"""
+    chunks = []
+    for subsection in re.split(r'\n(?=[A-Z][A-Za-z\s]+:)', text):
+        subsection = subsection.strip()
+        if not subsection:
+            continue
+        if len(subsection) <= chunk_size:
+            chunks.append(subsection)
+            continue
+        current_chunk, current_size = [], 0
+        for sentence in re.split(r'(?<=[.!?])\s+', subsection):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if current_size + len(sentence) > chunk_size and current_chunk:
+                chunks.append(' '.join(current_chunk))
+                current_chunk = current_chunk[-2:]
+                current_size = sum(len(s) + 1 for s in current_chunk)
+            current_chunk.append(sentence)
+            current_size += len(sentence) + 1
+        if current_chunk:
+            chunks.append(' '.join(current_chunk))
+    return chunks
+
+def random_pages(seed: int):
+    rng = random.Random(seed)
+    words = ["colonists", "Parliament", "tax", "trade", "Stamp", "Act", "war", "the", "of", "and"]
+    pages = []
+    for _ in range(rng.randint(1, 12)):
+        parts = []
+        if rng.random() < 0.4:
+            parts.append(rng.choice(["Key Concept:", "Learning Objective:", "Theme", "Historical Developments"]))
+        for _ in range(rng.randint(0, 40)):
+            parts.append(rng.choice(words) + rng.choice(["", "", "", ".", "!", "?", ","]))
+        pages.append(" ".join(parts))
+    return pages
+
+@pytest.mark.parametrize("seed", range(40))
+def test_streamed_chunks_match_the_joined_text_split(tmp_path, seed):
+    processor = process_ced.PeriodProcessor("p1.pdf", str(tmp_path))
+    pages = random_pages(seed)
+    text = "".join(page + "\n" for page in pages)
+    expected = regex_split_into_chunks(text, chunk_size=120)
+    assert list(processor.iter_chunks(iter(pages), chunk_size=120)) == expected
+    assert processor.split_into_chunks(text, chunk_size=120) == expected
+
+def test_heading_label_can_span_pages(tmp_path):
+    processor = process_ced.PeriodProcessor("p1.pdf", str(tmp_path))
+    pages = ["Intro text.", "Key", "Concept", "Thematic: next part.", "More."]
+    text = "".join(page + "\n" for page in pages)
+    # each of "Key", "Concept" and "Thematic" opens a label that runs on to the colon
+    assert list(processor.iter_chunks(pages)) == regex_split_into_chunks(text) == [
+        "Intro text.", "Key", "Concept", "Thematic: next part.\nMore."]
+
+def test_sentences_carry_across_pieces(tmp_path):
+    processor = process_ced.PeriodProcessor("p1.pdf", str(tmp_path))
+    assert list(processor.iter_sentences(["The Stamp", " Act passed. Colonists", " protested! Then"])) == [
+        "The Stamp Act passed.", "Colonists protested!", "Then"]
+
+def test_streamed_json_matches_json_dump(tmp_path):
+    processor = process_ced.PeriodProcessor("p2.pdf", str(tmp_path), chunk_format="json")
+    chunks = [processor.process_chunk(text, i) for i, text in enumerate(["Period 2: 1607-1754 Contact.", "Más texto."])]
+    for batch in ([], chunks):
+        assert processor.save_json_chunks(iter(batch)) == len(batch)
+        with open(processor.output_file(), 'r', encoding='utf-8') as f:
+            assert f.read() == json.dumps(batch, indent=2)
@@ -0,0 +1,89 @@
+import time
+import pytest
+from question_bank import QuestionBank, QuestionPrefetcher, parse_question, parse_question_batch, format_question
+
+QUESTION = """**QUESTION:** Which development best explains the Stamp Act crisis?
+
+OPTIONS:
+A) Expanding transatlantic trade
+B) British imperial reform
+C. Religious revival
+(D) Westward settlement
+
+ANSWER: B
+
+EXPLANATION:
+Parliament taxed the colonies to pay for the Seven Years' War.
+
+HISTORICAL CONTEXT:
+The end of salutary neglect.
+
+AP RELEVANCE:
+A common multiple-choice theme."""
+
+def make_question(n: int) -> dict:
+    return parse_question(QUESTION.replace("Stamp Act crisis", f"Stamp Act crisis ({n})"))
+
+def test_parse_question():
+    question = parse_question(QUESTION)
+    assert question["question"] == "Which development best explains the Stamp Act crisis?"
+    assert question["options"] == ["A) Expanding transatlantic trade", "B) British imperial reform",
+                                   "C) Religious revival", "D) Westward settlement"]
+    assert question["answer"] == "B"
+    assert question["context"] == "The end of salutary neglect."
+
+@pytest.mark.parametrize("broken", [
+    QUESTION.replace("ANSWER: B", "ANSWER: none of them"),
+    QUESTION.replace("(D) Westward settlement\n", ""),
+    QUESTION.replace("**QUESTION:** Which development best explains the Stamp Act crisis?", ""),
+])
+def test_invalid_questions_are_rejected(broken):
+    assert parse_question(broken) is None
+
+def test_batch_keeps_only_valid_questions():
+    text = "\n===\n".join([QUESTION, "QUESTION:\nincomplete", QUESTION.replace("ANSWER: B", "ANSWER: C")])
+    assert [q["answer"] for q in parse_question_batch(text)] == ["B", "C"]
+    assert parse_question_batch(None) == []
+
+def test_format_round_trips():
+    question = parse_question(QUESTION)
+    assert parse_question(format_question(question)) == question
+
+def test_bank_serves_each_question_once_in_order(tmp_path):
+    path = str(tmp_path / "bank.sqlite3")
+    bank = QuestionBank(path)
+    bank.add("Period 3", "  Key   Events ", [make_question(1), make_question(2)])
+    assert bank.count("Period 3", "key events") == 2
+    assert bank.count("Period 3", None) == 0
+    assert bank.pop("Period 3", "key events")["question"].endswith("(1)?")
+    bank.close()
+
+    reopened = QuestionBank(path)
+    assert reopened.pop("Period 3", "Key events")["question"].endswith("(2)?")
+    assert reopened.pop("Period 3", "Key events") is None
+    reopened.close()
+
+def wait_until_idle(prefetcher: QuestionPrefetcher, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while prefetcher.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_prefetcher_tops_slots_up_to_target(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    calls = []
+
+    def generate(period, topic, count):
+        calls.append((period, topic, count))
+        return [make_question(len(calls))] * 2  # fewer than asked for, like a batch with a bad question
+
+    prefetcher = QuestionPrefetcher(bank, generate, target=3, batch_size=3)
+    bank.add("Period 4", None, [make_question(0)])
+    bank.add("Period 9", None, [make_question(9)] * 3)
+    prefetcher.request("Period 4")
+    prefetcher.request("Period 9")  # already full, so it costs no call
+    wait_until_idle(prefetcher)
+
+    assert bank.count("Period 4", None) == 3
+    assert bank.count("Period 9", None) == 3
+    assert calls == [("Period 4", "", 2)]
+    bank.close()
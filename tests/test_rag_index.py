@@ -0,0 +1,61 @@
+import os
+import numpy as np
+from rag_index import RetrievalIndex, SNAPSHOT_FILE, read_snapshot, write_snapshot, open_snapshot, source_signature
+from rag_utils import RAGSystem
+
+QUERIES = ["stamp act taxation", "encomienda in period 2", "how is the exam scored", "marshall plan"]
+
+def test_snapshot_arrays_round_trip(tmp_path):
+    path = str(tmp_path / "arrays.bin")
+    arrays = {"a": np.arange(5, dtype=np.int32), "b": np.array([1.5, 2.5], dtype=np.float32)}
+    write_snapshot(path, {"note": "hi"}, arrays)
+    header, loaded = read_snapshot(path)
+    assert header["note"] == "hi"
+    assert all(np.array_equal(loaded[name], arrays[name]) for name in arrays)
+    assert all(info["offset"] % 64 == 0 for info in header["arrays"].values())
+
+def test_bad_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "junk.bin"
+    path.write_bytes(b"not a snapshot")
+    assert read_snapshot(str(path)) is None
+    assert RetrievalIndex.load(str(tmp_path / "missing.bin")) is None
+
+def test_snapshot_gives_the_same_results(ced_dir):
+    built = RAGSystem(ced_dir)
+    assert os.path.exists(os.path.join(ced_dir, SNAPSHOT_FILE))
+    loaded = RAGSystem(ced_dir)
+    assert isinstance(loaded.index.post_weights, np.ndarray)
+    assert len(loaded.chunks) == len(built.chunks) == 7
+    assert sorted(loaded.period_chunks) == ["2", "3", "8"]
+    assert loaded.exam_info_chunks[0] == built.exam_info_chunks[0]
+    for query in QUERIES:
+        assert loaded.search(query, top_k=5) == built.search(query, top_k=5)
+        assert loaded.get_relevant_chunks(query) == built.get_relevant_chunks(query)
+
+def test_snapshot_is_rebuilt_when_a_source_changes(ced_dir):
+    RAGSystem(ced_dir)
+    rag = RAGSystem(ced_dir)
+    sources = rag.signature_paths(rag.source_files())
+    snapshot = os.path.join(ced_dir, SNAPSHOT_FILE)
+    assert open_snapshot(snapshot, sources) is not None
+
+    # touching a file without changing it keeps the snapshot
+    os.utime(sources[0], ns=(0, 0))
+    assert open_snapshot(snapshot, sources) is not None
+
+    path = os.path.join(ced_dir, "period8_data", "period_8_chunks.json")
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text.replace("Marshall Plan", "Truman Doctrine"))
+    assert open_snapshot(snapshot, sources) is None
+    rebuilt = RAGSystem(ced_dir)
+    assert rebuilt.search("marshall plan") == []
+    assert rebuilt.get_relevant_chunks("truman doctrine")[0]["metadata"]["period"] == "8"
+    assert open_snapshot(snapshot, sources) is not None
+
+def test_source_signature_lists_every_file(ced_dir):
+    rag = RAGSystem(ced_dir, use_snapshot=False)
+    paths = rag.signature_paths(rag.source_files())
+    assert len(paths) == 4
+    assert set(source_signature(paths)) == set(paths)
@@ -0,0 +1,102 @@
+import math
+import re
+from collections import Counter
+import numpy as np
+import pytest
+from conftest import CED_TEXTS
+from rag_utils import RAGSystem, top_k_indices
+from rag_index import BM25_K1, BM25_B
+from tokens import estimate_tokens
+
+def reference_bm25(query: str) -> dict:
+    """textbook bm25 over CED_TEXTS in load order, boosts left out"""
+    texts = [text for name in [str(p) for p in range(1, 10)] + ["exam_info"] for text in CED_TEXTS.get(name, [])]
+    docs = [re.findall(r'\b\w+\b', text.lower()) for text in texts]
+    avgdl = sum(map(len, docs)) / len(docs)
+    scores = {}
+    for term in set(re.findall(r'\b\w+\b', query.lower())):
+        df = sum(term in doc for doc in docs)
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(docs):
+            tf = Counter(doc)[term]
+            if tf:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+@pytest.fixture
+def rag(ced_dir):
+    return RAGSystem(ced_dir, use_snapshot=False)
+
+def test_top_k_indices_breaks_ties_by_position():
+    scores = np.array([1.0, 3.0, 2.0, 3.0, 0.5])
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 0, 4]
+
+def test_scores_match_reference_bm25(rag):
+    query = "what did colonists say about the stamp act"
+    expected = reference_bm25(query)
+    results = rag.search(query, top_k=10)
+    assert {idx for idx, _ in results} == set(expected)
+    for idx, score in results:
+        assert score == pytest.approx(expected[idx], rel=1e-5)
+    assert [idx for idx, _ in results] == sorted(expected, key=lambda i: (-expected[i], i))
+
+def test_period_and_exam_boosts(rag):
+    plain = dict(rag.search("spanish colonists", top_k=10))
+    boosted = dict(rag.search("spanish colonists in period 2", top_k=10))
+    for idx in (0, 1):  # the period 2 chunks
+        assert boosted[idx] == pytest.approx(plain[idx] * 1.5, rel=1e-5)
+    assert rag.get_relevant_chunks("how is the exam scored", top_k=1)[0]["metadata"]["section"] == "Exam Information"
+
+def test_no_matching_terms(rag):
+    assert rag.search("railroads") == []
+    assert rag.get_relevant_chunks("") == []
+
+BATCH_QUERIES = [
+    "what did colonists say about the stamp act",
+    "encomienda in period 2",
+    "how is the exam scored",
+    "railroads",
+    "the",
+    "stamp act congress in new york during period 3",
+]
+
+def test_batch_matches_single_queries(rag):
+    expected = [rag.get_relevant_chunks(query, top_k=3) for query in BATCH_QUERIES]
+    assert rag.get_relevant_chunks_batch(BATCH_QUERIES, top_k=3) == expected
+    assert rag.get_relevant_chunks_batch([]) == []
+
+def test_batch_split_by_matrix_budget(rag, monkeypatch):
+    expected = rag.get_relevant_chunks_batch(BATCH_QUERIES, top_k=2)
+    # a budget this small puts every query in a batch of its own
+    monkeypatch.setattr("rag_utils.BATCH_MATRIX_BUDGET", 1)
+    assert rag.get_relevant_chunks_batch(BATCH_QUERIES, top_k=2) == expected
+
+def test_pack_chunks_drops_overlapping_sentences(rag):
+    packed = rag.pack_chunks([(0, 2.0), (1, 1.0)])
+    assert [chunk["text"] for chunk in packed] == [
+        CED_TEXTS["2"][0],
+        "Missions spread Catholicism among American Indians.",  # the shared sentence was already packed
+    ]
+    # a chunk with nothing new left is skipped altogether
+    assert len(rag.pack_chunks([(1, 2.0), (0, 1.0), (1, 0.5)])) == 2
+
+def test_pack_chunks_keeps_to_the_budget(rag):
+    # chunk 3 shares a sentence with chunk 2, so only its second sentence costs anything
+    results = [(2, 3.0), (3, 2.0), (4, 1.0)]
+    first = estimate_tokens(CED_TEXTS["3"][0]) + 12
+    second = estimate_tokens("The Townshend Acts taxed glass, paint and tea.") + 12
+    third = estimate_tokens(CED_TEXTS["3"][2]) + 12
+    assert third < second
+    packed = rag.pack_chunks(results, token_budget=first + third)
+    # the second chunk doesnt fit, so the smaller third one takes its place
+    assert [chunk["metadata"]["chunk_id"] for chunk in packed] == [0, 2]
+    assert len(rag.pack_chunks(results, token_budget=first + second + third)) == 3
+    assert rag.pack_chunks(results, token_budget=5) == []
+
+def test_get_context(rag):
+    context = rag.get_context("stamp act congress")
+    assert context.startswith("Relevant information from AP US History CED:")
+    assert "From Period 3 (Period 3):\nThe Stamp Act Congress met in New York." in context
+    assert rag.get_context("railroads") == ""
@@ -0,0 +1,62 @@
+import threading
+import time
+import rate_limiter
+from rate_limiter import RateScheduler, BACKGROUND, FOLLOW_UP
+
+INTERACTIVE_PURPOSE = "Main chat response"
+BACKGROUND_PURPOSE = "Prefetch AP questions"
+
+def test_admits_within_budget():
+    scheduler = RateScheduler(requests_per_minute=60, tokens_per_minute=6000)
+    assert scheduler.acquire(INTERACTIVE_PURPOSE, 1000)
+    stats = scheduler.stats()
+    assert 58.9 < stats["requests_available"] < 59.1
+    assert 4999 < stats["tokens_available"] < 5001
+
+def test_background_keeps_its_reserve(monkeypatch):
+    monkeypatch.setitem(rate_limiter.PRIORITY_CLASSES, BACKGROUND, {"reserve": 0.25, "max_wait": 0.05})
+    scheduler = RateScheduler(requests_per_minute=4, tokens_per_minute=100000)
+    for _ in range(3):
+        assert scheduler.acquire(INTERACTIVE_PURPOSE, 10)
+    # one request left, but a background call has to leave a quarter of the bucket alone
+    assert not scheduler.acquire(BACKGROUND_PURPOSE, 10)
+    assert scheduler.stats()["shed"] == {BACKGROUND_PURPOSE: 1}
+    assert scheduler.acquire(INTERACTIVE_PURPOSE, 10)
+
+def test_oversized_background_call_is_admitted():
+    # an estimate over capacity * (1 - reserve) is charged at that cap instead of waiting forever
+    scheduler = RateScheduler(requests_per_minute=60, tokens_per_minute=1000)
+    start = time.monotonic()
+    assert scheduler.acquire(BACKGROUND_PURPOSE, 5000)
+    assert time.monotonic() - start < 1.0
+    assert scheduler.stats()["tokens_available"] < 300
+
+def test_settle_credits_back_the_unused_estimate():
+    scheduler = RateScheduler(requests_per_minute=60, tokens_per_minute=10000)
+    assert scheduler.acquire(INTERACTIVE_PURPOSE, 4000)
+    scheduler.settle(INTERACTIVE_PURPOSE, 4000, 1000)
+    assert scheduler.stats()["tokens_available"] > 8999
+    # unknown usage leaves the estimate charged
+    assert scheduler.acquire(INTERACTIVE_PURPOSE, 4000)
+    scheduler.settle(INTERACTIVE_PURPOSE, 4000, None)
+    assert scheduler.stats()["tokens_available"] < 5100
+
+def test_higher_priority_goes_first(monkeypatch):
+    monkeypatch.setitem(rate_limiter.PRIORITY_CLASSES, FOLLOW_UP, {"reserve": 0.0, "max_wait": 5.0})
+    # one request every 0.1s once the bucket is empty
+    scheduler = RateScheduler(requests_per_minute=600, tokens_per_minute=10 ** 6)
+    scheduler.requests.level = 0
+    order = []
+
+    def call(purpose, delay):
+        time.sleep(delay)
+        if scheduler.acquire(purpose, 10):
+            order.append(purpose)
+
+    threads = [threading.Thread(target=call, args=("Summarize memory", 0.0)),
+               threading.Thread(target=call, args=(INTERACTIVE_PURPOSE, 0.02))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert order == [INTERACTIVE_PURPOSE, "Summarize memory"]
@@ -0,0 +1,61 @@
+import pytest
+from response_cache import ResponseCache, cache_key
+
+MESSAGES = [{"role": "user", "content": "Give me a hint about the Stamp Act."}]
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttls={"Generate hint": 60}, enabled=True)
+    yield cache
+    cache.close()
+
+def test_cache_key_ignores_whitespace_only():
+    key = cache_key("model", MESSAGES, {"max_completion_tokens": 50})
+    spaced = [{"role": "user", "content": "  Give me a hint\nabout the   Stamp Act. "}]
+    assert cache_key("model", spaced, {"max_completion_tokens": 50}) == key
+    assert cache_key("other-model", MESSAGES, {"max_completion_tokens": 50}) != key
+    assert cache_key("model", MESSAGES, {"max_completion_tokens": 60}) != key
+
+def test_put_then_get(cache):
+    assert cache.get("Generate hint", "k") is None
+    cache.put("Generate hint", "k", "Think about taxes.")
+    assert cache.get("Generate hint", "k") == "Think about taxes."
+    assert cache.stats() == {"Generate hint": {"hits": 1, "misses": 1}}
+
+def test_uncached_purposes_are_skipped(cache):
+    cache.put("Main chat response", "k", "an answer")
+    assert cache.get("Main chat response", "k") is None
+    assert cache.stats() == {}
+
+def test_pattern_analyses_are_never_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), enabled=True)
+    for purpose in ("Update memory with pattern", "Analyze practice problem pattern"):
+        cache.put(purpose, "k", "User has shown difficulty with: the Stamp Act.")
+        assert cache.get(purpose, "k") is None
+    cache.close()
+
+def test_expired_entries_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttls={"Generate hint": -1}, enabled=True)
+    cache.put("Generate hint", "k", "stale")
+    assert cache.get("Generate hint", "k") is None
+    cache.close()
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttls={"Generate hint": 60}, max_entries=2, enabled=True)
+    cache.put("Generate hint", "a", "first")
+    cache.put("Generate hint", "b", "second")
+    assert cache.get("Generate hint", "a") == "first"  # b is now the least recently used
+    cache.put("Generate hint", "c", "third")
+    assert cache.get("Generate hint", "b") is None
+    assert cache.get("Generate hint", "a") == "first"
+    assert cache.get("Generate hint", "c") == "third"
+    cache.close()
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path, ttls={"Generate hint": 60}, enabled=True)
+    cache.put("Generate hint", "k", "kept")
+    cache.close()
+    reopened = ResponseCache(path, ttls={"Generate hint": 60}, enabled=True)
+    assert reopened.get("Generate hint", "k") == "kept"
+    reopened.close()
@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+import service
+from service import TutorService
+from async_groq_client import AsyncGroqClient
+from mock_groq import MockGroqServer
+
+@pytest.fixture
+def mock_groq():
+    # every pattern analysis finds a pattern, so memory updates are predictable
+    mock = MockGroqServer(latency=0.0, jitter=0.0, token_interval=0.0, pattern_share=1.0).start()
+    yield mock
+    mock.stop()
+
+@pytest.fixture
+def run(tmp_path, mock_groq, monkeypatch):
+    """run scenario(service, client) against a service with retrieval off and the mock api"""
+    monkeypatch.setattr(service, "RAG_ENABLED", False)
+
+    def run_scenario(scenario):
+        async def main():
+            tutor = TutorService(str(tmp_path / "data"))
+            tutor.groq_client = AsyncGroqClient(api_key="test", api_url=mock_groq.url)
+            async with TestClient(TestServer(tutor.make_app())) as client:
+                return await scenario(tutor, client)
+        return asyncio.run(main())
+    return run_scenario
+
+async def new_session(client, student_id: str = "ada") -> str:
+    response = await client.post("/sessions", json={"student_id": student_id})
+    assert response.status == 201
+    return (await response.json())["session_id"]
+
+async def memory_settled(tutor: TutorService):
+    while tutor.memory_tasks:
+        await asyncio.gather(*list(tutor.memory_tasks), return_exceptions=True)
+
+def test_sessions_and_chat(run):
+    async def scenario(tutor, client):
+        assert (await client.post("/sessions", json={"student_id": "no spaces"})).status == 400
+        assert (await client.post("/sessions/nope/chat", json={"question": "hi"})).status == 404
+
+        session_id = await new_session(client)
+        assert (await client.post(f"/sessions/{session_id}/chat", json={})).status == 400
+        response = await client.post(f"/sessions/{session_id}/chat", json={"question": "What caused the Stamp Act crisis?"})
+        assert response.status == 200
+        assert (await response.json())["response"]
+        assert len(tutor.sessions[session_id].conversation.turns) == 2  # question + answer
+
+        assert (await client.delete(f"/sessions/{session_id}")).status == 200
+        assert session_id not in tutor.sessions
+        # the closed conversation's last exchange went to the student's memory
+        await memory_settled(tutor)
+        memory = tutor.students["ada"].memory
+        assert "difficulty with" in memory.text()
+
+    run(scenario)
+
+def test_practice_flow(run):
+    async def scenario(tutor, client):
+        session_id = await new_session(client)
+        base = f"/sessions/{session_id}/practice"
+        assert (await client.post(f"{base}/hint")).status == 409
+        assert (await client.post(f"{base}/question", json={"period": 12})).status == 400
+
+        response = await client.post(f"{base}/question", json={"period": 3})
+        question = await response.json()
+        assert response.status == 200
+        assert len(question["options"]) == 4
+        assert (await (await client.post(f"{base}/hint")).json())["hint"]
+
+        assert (await client.post(f"{base}/answer", json={"answer": "E"})).status == 400
+        result = await (await client.post(f"{base}/answer", json={"answer": "A"})).json()
+        assert result["correct_answer"] in "ABCD"
+        assert result["correct"] == (result["correct_answer"] == "A")
+        assert result["feedback"]
+        assert (await client.post(f"{base}/answer", json={"answer": "A"})).status == 409
+
+        await memory_settled(tutor)
+        response = await client.get(f"/sessions/{session_id}/memory", params={"period": 3})
+        assert (await response.json())["memory"]
+
+    run(scenario)
+
+def test_websocket_streams_tokens(run):
+    async def scenario(tutor, client):
+        session_id = await new_session(client)
+        async with client.ws_connect(f"/sessions/{session_id}/ws") as ws:
+            await ws.send_str("not json")
+            assert (await ws.receive_json())["type"] == "error"
+            await ws.send_json({"question": "Why did the Federalists support the Constitution?"})
+            tokens = []
+            while True:
+                message = await ws.receive_json()
+                if message["type"] != "token":
+                    break
+                tokens.append(message["content"])
+        assert message["type"] == "done"
+        assert len(tokens) > 1
+        assert "".join(tokens).strip() == message["response"]
+
+    run(scenario)
+
+def test_health_and_metrics(run):
+    async def scenario(tutor, client):
+        session_id = await new_session(client, "grace")
+        await client.post(f"/sessions/{session_id}/chat", json={"question": "What was containment?"})
+        health = await (await client.get("/health")).json()
+        assert (health["status"], health["sessions"], health["students"]) == ("ok", 1, 1)
+        metrics = await (await client.get("/metrics")).text()
+        assert 'llm_calls_total{purpose="Main chat response"' in metrics
+        assert "tutor_sessions 1" in metrics
+        assert len((await (await client.get("/periods")).json())["periods"]) == 9
+
+    run(scenario)
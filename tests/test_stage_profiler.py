@@ -0,0 +1,44 @@
+import json
+import threading
+from stage_profiler import StageProfiler, percentile
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([3.0, 1.0, 2.0, 4.0], 0.5) == 2.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 0.95) == 4.0
+
+def test_disabled_profiler_records_nothing(tmp_path):
+    profiler = StageProfiler(str(tmp_path / "spans.jsonl"), enabled=False)
+    with profiler.span("turn"):
+        pass
+    assert profiler.report() == []
+    assert not (tmp_path / "spans.jsonl").exists()
+
+def test_span_tree_follows_work_to_other_threads(tmp_path):
+    log_file = tmp_path / "spans.jsonl"
+    profiler = StageProfiler(str(log_file), enabled=True)
+    with profiler.span("turn"):
+        with profiler.span("retrieve", local=True):
+            pass
+        worker = threading.Thread(target=profiler.wrap("memory", lambda: None))
+        worker.start()
+        worker.join()
+
+    [tree] = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert tree["name"] == "turn"
+    assert [child["name"] for child in tree["children"]] == ["retrieve", "memory"]
+    assert tree["children"][1]["thread"] != tree["thread"]
+    assert {row["stage"]: row["count"] for row in profiler.report()} == {"turn": 1, "retrieve": 1, "memory": 1}
+    profiler.enabled = False
+
+def test_local_stages_are_cprofiled(tmp_path):
+    profiler = StageProfiler("", enabled=True, cprofile_dir=str(tmp_path / "prof"))
+
+    @profiler.stage("pack context", local=True)
+    def pack():
+        return sum(range(1000))
+
+    pack()
+    pack()
+    assert [p.rsplit("/", 1)[-1] for p in profiler.dump_cprofiles()] == ["pack_context.prof"]
+    profiler.enabled = False